@@ -0,0 +1,192 @@
+"""Polygon-weighted areal aggregation of gridded data.
+
+Each grid cell is weighted by the fraction of it covered by a polygon
+(computed exactly by intersecting cell boxes with the polygon) times the
+cell's area. For geographic grids the cell area is the exact area on a
+sphere, which scales with cos(latitude). The weights are stored as a sparse
+(polygon, cell) matrix, so every time step is reduced with one sparse matrix
+multiplication over a (time, cell) view, and the weights can be cached on
+disk for repeated runs.
+"""
+import pyproj
+import shapely
+import xarray as xr
+import numpy as np
+import scipy.sparse
+from pathlib import Path
+from typing import (
+    Optional,
+    Tuple,
+    Union,
+)
+from xarray_data_accessor.caching import get_or_build_sparse
+from xarray_data_accessor.resampling import (
+    _get_cell_bounds,
+    get_cell_areas,
+)
+from xarray_data_accessor.shared_types import ShapefileInput
+from xarray_data_accessor.spatial_index import _hash_arrays
+from xarray_data_accessor import utility_functions
+
+
+def _get_grid_axes(
+    xarray_dataset: xr.Dataset,
+    xy_coords: Optional[Tuple[str, str]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the 1-D x and y cell centers of a dataset."""
+    if not xy_coords:
+        xy_coords = (
+            xarray_dataset.attrs['x_dim'],
+            xarray_dataset.attrs['y_dim'],
+        )
+    xs = np.asarray(xarray_dataset[xy_coords[0]].values, dtype='float64')
+    ys = np.asarray(xarray_dataset[xy_coords[1]].values, dtype='float64')
+    if xs.ndim != 1 or ys.ndim != 1:
+        raise ValueError(
+            'Areal aggregation requires 1-D x and y coordinates!',
+        )
+    return xs, ys
+
+
+def get_polygon_weights(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    polygons: np.ndarray,
+    area_weights: Optional[np.ndarray] = None,
+) -> scipy.sparse.csr_matrix:
+    """Returns a sparse (polygon, cell) areal averaging weight matrix.
+
+    Arguments:
+        xs: The x cell centers.
+        ys: The y cell centers.
+        polygons: An array of shapely geometries in the grid's CRS.
+        area_weights: A (y, x) array of cell areas. If None, all cells
+            are weighted equally.
+
+    Returns:
+        A scipy.sparse.csr_matrix with cells flattened in (y, x) order.
+            Each row sums to 1 (or 0 if the polygon misses the grid).
+    """
+    x_lower, x_upper = _get_cell_bounds(xs)
+    y_lower, y_upper = _get_cell_bounds(ys)
+
+    # one box per cell in (y, x) order
+    boxes = shapely.box(
+        np.tile(np.minimum(x_lower, x_upper), len(ys)),
+        np.repeat(np.minimum(y_lower, y_upper), len(xs)),
+        np.tile(np.maximum(x_lower, x_upper), len(ys)),
+        np.repeat(np.maximum(y_lower, y_upper), len(xs)),
+    )
+    box_areas = shapely.area(boxes)
+    if area_weights is None:
+        area_weights = np.ones(len(boxes))
+    area_weights = np.asarray(area_weights, dtype='float64').reshape(-1)
+
+    # only intersect the cells whose boxes touch each polygon
+    tree = shapely.STRtree(boxes)
+    polygon_idxs, cells = tree.query(polygons, predicate='intersects')
+    coverage = shapely.area(
+        shapely.intersection(boxes[cells], polygons[polygon_idxs]),
+    ) / box_areas[cells]
+
+    weights = scipy.sparse.csr_matrix(
+        (coverage * area_weights[cells], (polygon_idxs, cells)),
+        shape=(len(polygons), len(boxes)),
+    )
+    weights.eliminate_zeros()
+
+    # normalize each polygon's weights to sum to 1
+    row_sums = np.asarray(weights.sum(axis=1)).reshape(-1)
+    row_sums[row_sums == 0] = 1
+    return (scipy.sparse.diags(1 / row_sums) @ weights).tocsr()
+
+
+def get_areal_weights(
+    xarray_dataset: xr.Dataset,
+    shapefile: ShapefileInput,
+    dissolve: bool = False,
+    xy_coords: Optional[Tuple[str, str]] = None,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> Tuple[scipy.sparse.csr_matrix, np.ndarray]:
+    """Returns polygon-weighted averaging weights for a dataset's grid.
+
+    Arguments:
+        xarray_dataset: The dataset whose grid is aggregated.
+        shapefile: A shapefile path or GeoDataFrame of polygons
+            (i.e., the one used with get_bounding_box(shapefile=...)).
+        dissolve: If True, all polygons are merged into one.
+        xy_coords: The x and y coordinate names (default is from attrs).
+        cache_dir: A directory to cache weights in.
+
+    Returns:
+        A tuple with the sparse (polygon, cell) weight matrix [0] (see
+            get_polygon_weights()), and each polygon's representative
+            (x, y) point in the dataset's CRS [1].
+    """
+    xs, ys = _get_grid_axes(xarray_dataset, xy_coords=xy_coords)
+    epsg = int(xarray_dataset.attrs.get('EPSG', 4326))
+
+    # get the polygons in the dataset's CRS
+    geo_df = utility_functions._read_shapefile(shapefile)
+    if geo_df.crs.to_epsg() != epsg:
+        geo_df = geo_df.to_crs(epsg)
+    polygons = np.asarray(geo_df.geometry.values, dtype=object)
+    if dissolve:
+        polygons = np.array([shapely.union_all(polygons)], dtype=object)
+    points = shapely.get_coordinates(shapely.point_on_surface(polygons))
+
+    spherical = pyproj.CRS.from_epsg(epsg).is_geographic
+
+    def get_weights() -> scipy.sparse.csr_matrix:
+        return get_polygon_weights(
+            xs,
+            ys,
+            polygons,
+            area_weights=get_cell_areas(xs, ys, spherical=spherical),
+        )
+
+    weight_matrix = get_or_build_sparse(
+        cache_dir,
+        {
+            'grid': _hash_arrays(xs, ys),
+            'polygons': shapely.to_wkb(polygons, hex=True).tolist(),
+            'epsg': epsg,
+            'spherical': spherical,
+        },
+        get_weights,
+        metadata={'n_polygons': len(polygons)},
+    )
+    return weight_matrix, points
+
+
+def aggregate_to_polygons(
+    data_array: xr.DataArray,
+    weights: scipy.sparse.csr_matrix,
+    xy_dims: Optional[Tuple[str, str]] = None,
+) -> np.ndarray:
+    """Returns the (time, polygon) areal averages of a data array.
+
+    Only the cells covered by a polygon are read (with one pointwise isel).
+
+    Arguments:
+        data_array: A (time, y, x) data array.
+        weights: A (polygon, cell) weight matrix (see get_areal_weights()).
+        xy_dims: The x and y dimension names (default is from attrs).
+
+    Returns:
+        A 2-D (time, polygon) array.
+    """
+    if not xy_dims:
+        xy_dims = (data_array.attrs['x_dim'], data_array.attrs['y_dim'])
+    x_dim, y_dim = xy_dims
+    cell_x_idxs, cell_y_idxs, cell_weights = utility_functions._get_weighted_cells(
+        weights,
+        (data_array.sizes[y_dim], data_array.sizes[x_dim]),
+    )
+    return utility_functions._extract_points(
+        data_array,
+        cell_x_idxs,
+        cell_y_idxs,
+        xy_dims,
+        point_cells=cell_weights,
+    )
@@ -0,0 +1,380 @@
+"""Persistent on-disk caching of data accessor responses.
+
+Cached files are content-addressed: each entry is named by a hash of the
+request that produced it, so identical requests resolve to the same file.
+The cache directory can be shared between processes (i.e., dask workers).
+Each entry can have a JSON metadata sidecar file storing when (and from what
+request) it was created.
+"""
+import io
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import xarray as xr
+import numpy as np
+import scipy.sparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Union,
+)
+
+
+class FileCache:
+    """A size limited on-disk file cache with least-recently-used eviction.
+
+    The last access time of each entry is tracked via its file modification
+    time, which is refreshed on every cache hit.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        size_limit_mb: Optional[int] = None,
+        suffix: Optional[str] = None,
+    ) -> None:
+        """Initializes the cache (creating the directory if necessary).
+
+        Arguments:
+            cache_dir: The directory to store cached files in.
+            size_limit_mb: The maximum cache size in megabytes. If None,
+                the cache is never evicted.
+            suffix: The file suffix of cached files (default is .nc).
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.size_limit_mb = size_limit_mb
+
+        if not suffix:
+            suffix = '.nc'
+        if not suffix.startswith('.'):
+            suffix = f'.{suffix}'
+        self.suffix = suffix
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """Returns a canonical hash of a request dictionary."""
+        request_str = json.dumps(
+            request,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(request_str.encode('utf-8')).hexdigest()
+
+    def get_path(self, key: str) -> Path:
+        """Returns the path a cache entry is (or would be) stored at."""
+        return self.cache_dir / f'{key}{self.suffix}'
+
+    def get_metadata_path(self, key: str) -> Path:
+        """Returns the path of an entry's metadata sidecar file."""
+        return self.cache_dir / f'{key}.json'
+
+    def get_metadata(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the metadata stored with a cache entry (if any)."""
+        metadata_path = self.get_metadata_path(key)
+        try:
+            with open(metadata_path, 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def get(
+        self,
+        key: str,
+        max_age: Optional[timedelta] = None,
+    ) -> Optional[Path]:
+        """Returns the path of a cached file, or None if it is not cached.
+
+        Arguments:
+            key: The cache key.
+            max_age: If provided, entries created longer ago than max_age
+                are treated as expired and deleted.
+        """
+        path = self.get_path(key)
+        if not path.exists():
+            return None
+
+        # expire the entry if necessary
+        if max_age is not None:
+            metadata = self.get_metadata(key)
+            if metadata is None or 'created' not in metadata:
+                created = datetime.fromtimestamp(path.stat().st_ctime)
+            else:
+                created = datetime.fromisoformat(metadata['created'])
+            if datetime.now() - created > max_age:
+                logging.info(f'Cache entry {key} has expired.')
+                self._delete_entry(path)
+                return None
+
+        # mark the entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process in the meantime
+            return None
+        return path
+
+    def get_dataset(
+        self,
+        key: str,
+        max_age: Optional[timedelta] = None,
+    ) -> Optional[xr.Dataset]:
+        """Returns a cached dataset loaded into memory, or None."""
+        path = self.get(key, max_age=max_age)
+        if path is None:
+            return None
+        with xr.open_dataset(path, engine='h5netcdf') as ds:
+            return ds.load()
+
+    def open_dataset(
+        self,
+        key: str,
+        max_age: Optional[timedelta] = None,
+        **kwargs,
+    ) -> Optional[xr.Dataset]:
+        """Lazily opens a cached dataset, or returns None.
+
+        Arguments:
+            key: The cache key.
+            max_age: See get().
+            kwargs: Passed to xarray.open_dataset() (i.e., chunks, engine).
+        """
+        path = self.get(key, max_age=max_age)
+        if path is None:
+            return None
+        return xr.open_dataset(path, **kwargs)
+
+    def put_dataset(
+        self,
+        key: str,
+        ds: xr.Dataset,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Path:
+        """Writes a dataset to the cache and returns its path."""
+        # write to a temporary file first so readers never see partial files
+        temp_path = self._get_temp_path()
+        try:
+            ds.to_netcdf(temp_path, engine='h5netcdf')
+            path = self.get_path(key)
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+        self._write_metadata(key, metadata)
+        self.evict(keep=[key])
+        return path
+
+    def put_bytes(
+        self,
+        key: str,
+        data: bytes,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Path:
+        """Writes raw bytes to the cache and returns the entry path."""
+        temp_path = self._get_temp_path()
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(data)
+            path = self.put_file(key, temp_path, metadata=metadata)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        return path
+
+    def put_file(
+        self,
+        key: str,
+        file_path: Union[str, Path],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Path:
+        """Moves an existing file into the cache and returns its new path."""
+        path = self.get_path(key)
+        os.replace(file_path, path)
+        self._write_metadata(key, metadata)
+        self.evict(keep=[key])
+        return path
+
+    def _write_metadata(
+        self,
+        key: str,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if metadata is None:
+            metadata = {}
+        metadata = dict(metadata, created=datetime.now().isoformat())
+        with open(self.get_metadata_path(key), 'w') as file:
+            json.dump(metadata, file, default=str)
+
+    def _delete_entry(self, path: Path) -> None:
+        key = path.name[:-len(self.suffix)]
+        for p in [path, self.get_metadata_path(key)]:
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _get_temp_path(self) -> Path:
+        file_descriptor, temp_path = tempfile.mkstemp(
+            dir=self.cache_dir,
+            prefix='.temp_',
+            suffix=self.suffix,
+        )
+        os.close(file_descriptor)
+        return Path(temp_path)
+
+    def _entries(self) -> List[Path]:
+        return [
+            p for p in self.cache_dir.glob(f'*{self.suffix}')
+            if not p.name.startswith('.')
+        ]
+
+    @property
+    def size_mb(self) -> float:
+        """Returns the total size of all cache entries in megabytes."""
+        size = 0
+        for path in self._entries():
+            try:
+                size += path.stat().st_size
+            except FileNotFoundError:
+                continue
+        return size / 1e6
+
+    def evict(
+        self,
+        keep: Optional[List[str]] = None,
+    ) -> List[Path]:
+        """Deletes least recently used entries until the size limit is met.
+
+        Arguments:
+            keep: Keys that should not be evicted (i.e., a fresh entry).
+
+        Returns:
+            A list of the deleted file paths.
+        """
+        if self.size_limit_mb is None:
+            return []
+        if keep is None:
+            keep = []
+        keep_paths = [self.get_path(k) for k in keep]
+
+        # sort entries from least to most recently used
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(key=lambda x: x[0])
+
+        total_size = sum(e[1] for e in entries)
+        size_limit = self.size_limit_mb * 1e6
+
+        deleted = []
+        for _, size, path in entries:
+            if total_size <= size_limit:
+                break
+            if path in keep_paths:
+                continue
+            self._delete_entry(path)
+            total_size -= size
+            deleted.append(path)
+
+        if len(deleted) > 0:
+            logging.info(
+                f'Evicted {len(deleted)} entries from cache @ {self.cache_dir}',
+            )
+        return deleted
+
+    def clear(self) -> None:
+        """Deletes all cache entries."""
+        for path in self._entries():
+            self._delete_entry(path)
+
+
+def _get_or_build(
+    cache_dir: Optional[Union[str, Path]],
+    key_parts: Dict[str, Any],
+    build_fn: Callable[[], Any],
+    dump_fn: Callable[[io.BytesIO, Any], None],
+    load_fn: Callable[[Path], Any],
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """Loads a cached .npz entry, or builds it and caches it."""
+    if cache_dir is None:
+        return build_fn()
+
+    cache = FileCache(cache_dir, suffix='.npz')
+    key = cache.make_key(key_parts)
+    path = cache.get(key)
+    if path is not None:
+        try:
+            return load_fn(path)
+        except Exception as e:
+            logging.warning(f'Exception hit!: {e}')
+
+    result = build_fn()
+    buffer = io.BytesIO()
+    dump_fn(buffer, result)
+    cache.put_bytes(key, buffer.getvalue(), metadata=metadata)
+    return result
+
+
+def get_or_build_sparse(
+    cache_dir: Optional[Union[str, Path]],
+    key_parts: Dict[str, Any],
+    build_fn: Callable[[], scipy.sparse.spmatrix],
+    metadata: Optional[Dict[str, Any]] = None,
+) -> scipy.sparse.csr_matrix:
+    """Returns a cached sparse matrix (i.e., weights), building it if needed.
+
+    Arguments:
+        cache_dir: The cache directory. If None, build_fn() is always called.
+        key_parts: A dict of everything the matrix depends on (see
+            FileCache.make_key()).
+        build_fn: Builds the matrix on a cache miss.
+        metadata: Metadata to store with a new cache entry.
+
+    Returns:
+        A scipy.sparse.csr_matrix.
+    """
+    return _get_or_build(
+        cache_dir,
+        key_parts,
+        lambda: build_fn().tocsr(),
+        scipy.sparse.save_npz,
+        lambda path: scipy.sparse.load_npz(path).tocsr(),
+        metadata=metadata,
+    )
+
+
+def get_or_build_arrays(
+    cache_dir: Optional[Union[str, Path]],
+    key_parts: Dict[str, Any],
+    build_fn: Callable[[], Dict[str, np.ndarray]],
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, np.ndarray]:
+    """Returns a cached dict of named arrays, building it if needed.
+
+    See get_or_build_sparse() for arguments.
+    """
+    def load(path: Path) -> Dict[str, np.ndarray]:
+        with np.load(path) as cached:
+            return {name: cached[name] for name in cached.files}
+
+    return _get_or_build(
+        cache_dir,
+        key_parts,
+        build_fn,
+        lambda buffer, arrays: np.savez(buffer, **arrays),
+        load,
+        metadata=metadata,
+    )
@@ -29,7 +29,15 @@ from xarray_data_accessor.shared_types import (
 from xarray_data_accessor.data_accessors.factory import (
     DataAccessorFactory,
 )
+from xarray_data_accessor.session import (
+    DataAccessSession,
+)
 from xarray_data_accessor import utility_functions
+from xarray_data_accessor.resampling import (
+    Regridder,
+    chunked_spatial_resample,
+    integer_factor_resample,
+)
 
 
 def get_xarray_dataset(
@@ -47,6 +55,7 @@ def get_xarray_dataset(
     resample_factor: Optional[int] = None,
     xy_resolution_factors: Optional[ResolutionTuple] = None,
     resample_method: Optional[str] = None,
+    session: Optional[DataAccessSession] = None,
     **kwargs,
 ) -> xr.Dataset:
     """
@@ -73,6 +82,8 @@ def get_xarray_dataset(
         :param combine_aois: If True, combines all AOIs into one.
         :param resample_factor: The factor to resample the data by.
         :param xy_resolution_factors: The X,Y dimension factors to resample the data by.
+        :param session: A DataAccessSession whose data accessors, executors,
+            and caches are reused across calls (default is none).
         :param kwargs: Additional keyword arguments to pass to
             the underlying data accessor.get_data() function.
 
@@ -85,6 +96,10 @@ def get_xarray_dataset(
             f"Data accessor '{data_accessor_name}' does not exist. "
             f"Please choose from {DataAccessorFactory.data_accessor_names()}.",
         )
+    elif session is not None:
+        data_accessor = session.get_data_accessor(
+            data_accessor_name,
+        )
     else:
         data_accessor = DataAccessorFactory.get_data_accessor(
             data_accessor_name,
@@ -260,9 +275,18 @@ def spatial_resample(
     resolution_factor: Optional[Union[int, float]] = None,
     xy_resolution_factors: Optional[ResolutionTuple] = None,
     resample_method: Optional[str] = None,
+    time_block_size: int = 24,
+    max_workers: Optional[int] = None,
+    zarr_store: Optional[str] = None,
+    weights_cache_dir: Optional[Union[str, Path]] = None,
+    use_fast_paths: bool = True,
 ) -> xr.Dataset:
     """Spatially resamples an xarray dataset.
 
+    The destination grid is computed once, then blocks of time steps are
+    reprojected independently (on a thread pool) into the output, so memory
+    use is bounded by the block size rather than the dataset size.
+
     Arguments:
         :param resolution_factor: the number of times FINER to make the
             dataset (applied to both dimensions).
@@ -273,11 +297,26 @@ def spatial_resample(
             NOTE: The default is 'nearest'. Do not use any averaging resample
             methods when working with a categorical raster!
             Bilinear resampling is the default.
+        :param time_block_size: The number of time steps resampled per task.
+        :param max_workers: The number of resampling threads.
+        :param zarr_store: If provided, the output is written to this Zarr
+            store (and returned lazily) instead of being held in memory.
+        :param weights_cache_dir: If provided, resampling uses a Regridder
+            (sparse weights built once per grid pair and cached here) for
+            the nearest, bilinear, and conservative methods.
+            NOTE: resample_method='conservative' always uses a Regridder.
+                It is first-order conservative (area weighted, with exact
+                spherical areas for geographic CRSs), so it preserves
+                totals of accumulated variables like precipitation.
+        :param use_fast_paths: If True, integer refinement factors (i.e., 2)
+            and their inverses (i.e., 0.5 to coarsen) use vectorized lazy
+            paths: repeats (nearest/average/conservative), separable linear
+            interpolation (bilinear), or block reductions when coarsening
+            (average/sum/min/max/med). Ignored if weights_cache_dir is set.
 
     Returns:
         The resampled xarray dataset.
     """
-    # TODO: switch to xarray.interp() This works but overflows memory for large datasets.
     # verify all required inputs are present
     if xarray_dataset is None:
         raise ValueError(
@@ -290,7 +329,7 @@ def spatial_resample(
         )
 
     # verify the resample methods
-    real_methods = vars(Resampling)['_member_names_']
+    real_methods = vars(Resampling)['_member_names_'] + ['conservative']
     if resample_method is None:
         resample_method = 'bilinear'
     elif resample_method not in real_methods:
@@ -302,6 +341,20 @@ def spatial_resample(
     if xy_resolution_factors is None:
         xy_resolution_factors = (resolution_factor, resolution_factor)
 
+    # integer factors do not need a reprojection
+    if use_fast_paths and weights_cache_dir is None:
+        resampled = integer_factor_resample(
+            xarray_dataset,
+            xy_resolution_factors,
+            resample_method,
+        )
+        if resampled is not None:
+            if zarr_store is not None:
+                resampled.to_zarr(zarr_store, mode='w')
+                resampled = xr.open_zarr(zarr_store)
+            logging.info(f'Resampled dataset info: {resampled.dims}')
+            return resampled
+
     x_dim = xarray_dataset.attrs['x_dim']
     y_dim = xarray_dataset.attrs['y_dim']
 
@@ -316,27 +369,37 @@ def spatial_resample(
     # set our resampling arguments
     width = int(len(xarray_dataset.x) * xy_resolution_factors[0])
     height = int(len(xarray_dataset.y) * xy_resolution_factors[1])
-    crs = xarray_dataset.rio.crs
-
-    # chunk in a way that will speed up the resampling
-    xarray_dataset = xarray_dataset.chunk(
-        {'time': 1, 'x': 100, 'y': 100},
-    )
 
-    # resample and return the adjusted dataset
+    # resample one time block at a time and return the adjusted dataset
     logging.info(
         f'Resampling to height={height}, width={width}. datetime={datetime.now()}',
     )
-    xarray_dataset = utility_functions._resample_slice(
-        data=xarray_dataset,
-        resample_dict={
-            'height': height,
-            'width': width,
-            'resampling_method': resample_method,
-            'crs': crs,
-            'index': 1,
-        },
-    )[-1]
+    use_regridder = resample_method == 'conservative' or (
+        weights_cache_dir is not None and resample_method in Regridder.methods
+    )
+    if use_regridder:
+        xarray_dataset = Regridder.from_dataset(
+            xarray_dataset,
+            width=width,
+            height=height,
+            method=resample_method,
+            cache_dir=weights_cache_dir,
+        ).regrid(
+            xarray_dataset,
+            time_block_size=time_block_size,
+            max_workers=max_workers,
+            zarr_store=zarr_store,
+        )
+    else:
+        xarray_dataset = chunked_spatial_resample(
+            xarray_dataset,
+            width=width,
+            height=height,
+            resample_method=resample_method,
+            time_block_size=time_block_size,
+            max_workers=max_workers,
+            zarr_store=zarr_store,
+        )
 
     if renamed:
         xarray_dataset = xarray_dataset.rename(
@@ -0,0 +1,272 @@
+"""Assembles per-request responses into preallocated output arrays.
+
+Rather than collecting every response, concatenating them per variable,
+and merging the results (holding several copies of the data at once), the
+output time index is computed from the request plan and one array (or Zarr
+array) is allocated per variable. Each response is written into its slice
+as soon as it arrives and can then be dropped. Lazy (dask backed) responses
+are read one time chunk at a time.
+"""
+import logging
+import xarray as xr
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+
+def get_hourly_time_index(
+    start_dt: datetime,
+    end_dt: datetime,
+    specific_hours: Optional[List[int]] = None,
+) -> pd.DatetimeIndex:
+    """Returns the hourly time steps between start_dt and end_dt (inclusive).
+
+    Arguments:
+        start_dt: The first datetime.
+        end_dt: The last datetime.
+        specific_hours: If provided, only these hours of each day are kept.
+
+    Returns:
+        A pandas DatetimeIndex.
+    """
+    times = pd.date_range(
+        pd.Timestamp(start_dt).ceil('h'),
+        pd.Timestamp(end_dt),
+        freq='h',
+    )
+    if specific_hours is not None:
+        times = times[times.hour.isin(specific_hours)]
+    return times
+
+
+def _get_runs(idxs: np.ndarray) -> List[Tuple[slice, slice]]:
+    """Splits sorted indices into (source, output) slices of consecutive runs."""
+    breaks = np.flatnonzero(np.diff(idxs) != 1) + 1
+    starts = np.concatenate([[0], breaks])
+    stops = np.concatenate([breaks, [len(idxs)]])
+    return [
+        (slice(i, j), slice(idxs[i], idxs[j - 1] + 1))
+        for i, j in zip(starts, stops)
+    ]
+
+
+class DatasetAssembler:
+    """Writes responses into one preallocated output array per variable.
+
+    The spatial coordinates are taken from the first response, since every
+    request of a get_data() call shares the same bounding box. Time steps
+    that never arrive (i.e., a failed request) are left as NaN.
+    """
+
+    def __init__(
+        self,
+        times: pd.DatetimeIndex,
+        time_dim: str = 'time',
+        y_dim: str = 'latitude',
+        x_dim: str = 'longitude',
+        zarr_store: Optional[str] = None,
+        keep_integer_dtypes: bool = False,
+    ) -> None:
+        """Initializes the assembler.
+
+        Arguments:
+            times: The output time index (see get_hourly_time_index()).
+            time_dim: The name of the time dimension.
+            y_dim: The name of the y dimension.
+            x_dim: The name of the x dimension.
+            zarr_store: If provided, outputs are written to regions of a Zarr
+                store at this path instead of being held in memory.
+            keep_integer_dtypes: If True, integer responses with a _FillValue
+                attribute keep their dtype (missing values are _FillValue).
+                Otherwise outputs are floats with NaN for missing values.
+        """
+        self.times = pd.DatetimeIndex(times)
+        self.dims = (time_dim, y_dim, x_dim)
+        self.zarr_store = zarr_store
+        self.keep_integer_dtypes = keep_integer_dtypes
+
+        self._y_coords: Optional[pd.Index] = None
+        self._x_coords: Optional[pd.Index] = None
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._attrs: Dict[str, dict] = {}
+
+    @property
+    def variables(self) -> List[str]:
+        """Returns the variables that have received data."""
+        return list(self._attrs.keys())
+
+    def _allocate(
+        self,
+        variable: str,
+        data_array: xr.DataArray,
+    ) -> None:
+        """Allocates the output for a variable on its first response."""
+        time_dim, y_dim, x_dim = self.dims
+        if self._y_coords is None:
+            self._y_coords = pd.Index(data_array[y_dim].values)
+            self._x_coords = pd.Index(data_array[x_dim].values)
+        shape = (len(self.times), len(self._y_coords), len(self._x_coords))
+        dtype = np.promote_types(data_array.dtype, np.float32)
+        fill_value = np.nan
+        self._attrs[variable] = dict(data_array.attrs)
+        if (
+            self.keep_integer_dtypes
+            and np.issubdtype(data_array.dtype, np.integer)
+            and '_FillValue' in self._attrs[variable]
+        ):
+            dtype = data_array.dtype
+            fill_value = self._attrs[variable]['_FillValue']
+
+        if self.zarr_store is None:
+            self._arrays[variable] = np.full(shape, fill_value, dtype=dtype)
+            return
+
+        # write a lazy template so the store only holds metadata until filled
+        import dask.array as da
+        template = xr.Dataset(
+            {
+                variable: (
+                    self.dims,
+                    da.full(shape, fill_value, dtype=dtype),
+                    self._attrs[variable],
+                ),
+            },
+            coords={
+                time_dim: self.times,
+                y_dim: self._y_coords,
+                x_dim: self._x_coords,
+            },
+        )
+        template.to_zarr(
+            self.zarr_store,
+            mode='a' if len(self._attrs) > 1 else 'w',
+            compute=False,
+        )
+
+    def _get_indices(
+        self,
+        index: pd.Index,
+        values: np.ndarray,
+        dim: str,
+    ) -> np.ndarray:
+        idxs = index.get_indexer(values)
+        if (idxs < 0).any():
+            raise ValueError(
+                f'Response {dim} coordinates do not match the output grid!',
+            )
+        return idxs
+
+    def add(
+        self,
+        variable: str,
+        ds: xr.Dataset,
+    ) -> None:
+        """Writes a response for a variable into its place in the output.
+
+        Time steps outside the output time index are ignored, so responses
+        covering whole days/months are cropped here.
+        """
+        time_dim, y_dim, x_dim = self.dims
+        data_array = ds[variable]
+        if variable not in self._attrs:
+            self._allocate(variable, data_array)
+
+        # find the output positions of the response time steps
+        time_idxs = self.times.get_indexer(
+            pd.DatetimeIndex(data_array[time_dim].values),
+        )
+        keep = np.flatnonzero(time_idxs >= 0)
+        if len(keep) == 0:
+            logging.info(f'No requested time steps in a {variable} response.')
+            return
+        if len(keep) < len(time_idxs):
+            data_array = data_array.isel({time_dim: keep})
+        time_idxs = time_idxs[keep]
+
+        y_idxs = self._get_indices(self._y_coords, data_array[y_dim].values, y_dim)
+        x_idxs = self._get_indices(self._x_coords, data_array[x_dim].values, x_dim)
+
+        # sort along each dim so the output is written in contiguous runs
+        # NOTE: this is lazy for dask backed responses
+        all_idxs = {time_dim: time_idxs, y_dim: y_idxs, x_dim: x_idxs}
+        for dim, idxs in all_idxs.items():
+            if not (np.diff(idxs) > 0).all():
+                order = np.argsort(idxs)
+                data_array = data_array.isel({dim: order})
+                all_idxs[dim] = idxs[order]
+        time_idxs, y_idxs, x_idxs = all_idxs.values()
+
+        # read lazy responses one time chunk at a time (bounding memory)
+        if data_array.chunks:
+            block_sizes = data_array.chunksizes[time_dim]
+        else:
+            block_sizes = (len(time_idxs),)
+        block_stops = np.cumsum(block_sizes)
+        for start, stop in zip(block_stops - block_sizes, block_stops):
+            values = data_array.isel(
+                {time_dim: slice(start, stop)},
+            ).transpose(*self.dims).values
+            for t_src, t_out in _get_runs(time_idxs[start:stop]):
+                for y_src, y_out in _get_runs(y_idxs):
+                    for x_src, x_out in _get_runs(x_idxs):
+                        self._write(
+                            variable,
+                            values[t_src, y_src, x_src],
+                            (t_out, y_out, x_out),
+                        )
+            del values
+
+    def _write(
+        self,
+        variable: str,
+        values: np.ndarray,
+        region: Tuple[slice, slice, slice],
+    ) -> None:
+        """Writes values into a region of a variable's output."""
+        if self.zarr_store is None:
+            self._arrays[variable][region] = values
+            return
+
+        xr.Dataset(
+            {variable: (self.dims, values)},
+        ).to_zarr(
+            self.zarr_store,
+            region=dict(zip(self.dims, region)),
+        )
+
+    def get_dataset(
+        self,
+        variable: str,
+    ) -> Optional[xr.Dataset]:
+        """Returns the assembled dataset of a variable (None if no data)."""
+        if variable not in self._attrs:
+            return None
+
+        if self.zarr_store is not None:
+            # integer outputs keep _FillValue as an attribute (not NaN)
+            return xr.open_zarr(
+                self.zarr_store,
+                mask_and_scale=not self.keep_integer_dtypes,
+            )[[variable]]
+
+        time_dim, y_dim, x_dim = self.dims
+        return xr.Dataset(
+            {
+                variable: (
+                    self.dims,
+                    self._arrays[variable],
+                    self._attrs[variable],
+                ),
+            },
+            coords={
+                time_dim: self.times,
+                y_dim: self._y_coords,
+                x_dim: self._x_coords,
+            },
+        )
@@ -22,10 +22,23 @@ class AttrsDict(TypedDict):
 
 class DataAccessorBase(abc.ABC):
 
+    # set by a DataAccessSession that owns the accessor (see session.py)
+    _data_access_session = None
+
     @abc.abstractmethod
     def __init__(self) -> None:
         raise NotImplementedError
 
+    def __getstate__(self) -> dict:
+        # session executors/clients can't be sent to worker processes
+        state = self.__dict__.copy()
+        state.pop('_data_access_session', None)
+        return state
+
+    def close(self) -> None:
+        """Releases persistent resources (i.e., HTTP sessions)."""
+        pass
+
     @abc.abstractclassmethod
     def supported_datasets(cls) -> List[str]:
         """Returns all datasets that can be accessed."""""
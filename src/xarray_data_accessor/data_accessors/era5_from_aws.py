@@ -2,34 +2,52 @@
 
 Info: https://github.com/planet-os/notebooks/blob/master/aws/era5-pds.md
 """
+import asyncio
 import logging
 import warnings
 import multiprocessing
 import fsspec
 import xarray as xr
 import numpy as np
+import pandas as pd
 from datetime import datetime
 from typing import (
     Union,
     List,
     Dict,
     Optional,
+    Callable,
     TypedDict,
 )
 from numbers import Number
 from xarray_data_accessor.multi_threading import (
-    get_multithread,
+    run_coroutine,
+)
+from xarray_data_accessor.caching import (
+    FileCache,
+)
+from xarray_data_accessor.reference_index import (
+    build_reference_index,
+    get_reference_index,
+    open_async_filesystem,
+    open_reference_dataset,
+    read_window_async,
 )
 from xarray_data_accessor.data_accessors.shared_functions import (
     combine_variables,
     apply_kwargs,
+    get_cache,
+    get_executor,
     write_crs,
     crop_data,
-    crop_time_dimension,
 )
 from xarray_data_accessor.shared_types import (
     BoundingBoxDict,
 )
+from xarray_data_accessor.data_accessors.assembly import (
+    DatasetAssembler,
+    get_hourly_time_index,
+)
 from xarray_data_accessor.data_accessors.base import (
     DataAccessorBase,
     AttrsDict,
@@ -59,11 +77,22 @@ CDS_TO_AWS_NAMES_CROSSWALK = {
     'total_precipitation': 'precipitation_amount_1hour_Accumulation',
 }
 
+# the era5-pds bucket stores global 0.25 degree grids
+AWS_GRID_RESOLUTION = 0.25
+AWS_GRID_SHAPE = (721, 1440)  # (lat, lon)
+
 
 class AWSKwargsDict(TypedDict):
     """kwargs for AWSDataAccessor get_data() method."""
     use_dask: bool
     thread_limit: int
+    cache_dir: str
+    cache_size_limit_mb: int
+    reference_index_dir: str
+    use_asyncio: bool
+    max_concurrent_requests: int
+    specific_hours: List[int]
+    zarr_store: str
 
 
 class AWSRequestDict(TypedDict):
@@ -72,6 +101,9 @@ class AWSRequestDict(TypedDict):
     aws_endpoint: str
     index: int
     bbox: BoundingBoxDict
+    start_dt: datetime
+    end_dt: datetime
+    specific_hours: Optional[List[int]]
 
 
 class AWSResponseDict(AWSRequestDict):
@@ -93,6 +125,16 @@ class AWSDataAccessor(DataAccessorBase):
         # set default kwargs
         self.thread_limit: int = multiprocessing.cpu_count() - 1
         self.use_dask: bool = True
+        self.cache_dir: str = None
+        self.cache_size_limit_mb: int = 10000
+        self.reference_index_dir: str = None
+        self.use_asyncio: bool = False
+        self.max_concurrent_requests: int = 256
+        self.specific_hours: List[int] = None
+        self.zarr_store: str = None
+
+        # month-tile cache (set up in get_data() if cache_dir is provided)
+        self._cache: FileCache = None
 
     @classmethod
     def supported_datasets(cls) -> List[str]:
@@ -171,6 +213,19 @@ class AWSDataAccessor(DataAccessorBase):
         Main data getter function.
 
         NOTE: AWS multithreading is best handled across months.
+        NOTE: If kwarg reference_index_dir is provided, monthly files are
+            opened lazily from byte-range reference indexes (see
+            reference_index.py) and only bbox intersecting chunks are read.
+        NOTE: If kwarg use_asyncio=True, all months are read in this process
+            with up to max_concurrent_requests concurrent ranged GETs
+            (no dask workers are started).
+        NOTE: Each month is sliced to start_dt/end_dt (and kwarg
+            specific_hours) before any data is read, so short time windows
+            only transfer the hours they need. Cached month tiles always
+            store the full month.
+        NOTE: Months are written into one preallocated array per variable
+            as they arrive (or into regions of a Zarr store at kwarg
+            zarr_store), so peak memory stays close to the output size.
         """
         # check dataset compatibility
         if dataset_name not in self.supported_datasets():
@@ -184,6 +239,16 @@ class AWSDataAccessor(DataAccessorBase):
         # parse kwargs
         self._parse_kwargs(kwargs)
 
+        # set up the local month-tile cache if desired
+        if self.cache_dir:
+            self._cache = get_cache(
+                self,
+                self.cache_dir,
+                size_limit_mb=self.cache_size_limit_mb,
+            )
+        else:
+            self._cache = None
+
         # make a dictionary to store all data
         all_data_dict = {}
 
@@ -198,8 +263,65 @@ class AWSDataAccessor(DataAccessorBase):
             bbox,
         )
 
+        # preallocate the output and write each month into place on arrival
+        assembler = DatasetAssembler(
+            get_hourly_time_index(start_dt, end_dt, self.specific_hours),
+            zarr_store=self.zarr_store,
+        )
+
+        def on_response(aws_response_dict: AWSResponseDict) -> None:
+            assembler.add(
+                aws_response_dict['variable'],
+                aws_response_dict['dataset'],
+            )
+
+        logging.info(
+            f'Reading {len(aws_request_dicts)} data months from S3 bucket.',
+        )
+        if self.use_asyncio:
+            run_coroutine(
+                self._get_aws_data_async(
+                    aws_request_dicts,
+                    on_response=on_response,
+                ),
+            )
+        else:
+            self._get_aws_data_multithread(
+                aws_request_dicts,
+                on_response=on_response,
+            )
+
+        all_data_dict = {}
+        for variable in variables:
+            ds = assembler.get_dataset(variable)
+            if ds is not None:
+                ds = write_crs(
+                    ds,
+                    known_epsg=4326,
+                )
+            all_data_dict[variable] = ds
+
+        # return the combined data
+        return combine_variables(
+            all_data_dict,
+            self.attrs_dict,
+        )
+
+    # AWS specific methods #####################################################
+
+    def _get_aws_data_multithread(
+        self,
+        aws_request_dicts: List[AWSRequestDict],
+        on_response: Optional[Callable[[AWSResponseDict], None]] = None,
+    ) -> List[AWSResponseDict]:
+        """Reads each request on a dask/concurrent.futures worker.
+
+        If on_response is provided, each response is passed to it as soon as
+        it arrives instead of being returned.
+        """
         # set up multithreading client
-        client, as_completed_func = get_multithread(
+        client, as_completed_func = get_executor(
+            self,
             use_dask=self.use_dask,
             n_workers=self.thread_limit,
             threads_per_worker=1,
@@ -207,80 +329,70 @@ class AWSDataAccessor(DataAccessorBase):
             close_existing_client=False,
         )
 
-        # init dictionary to store data sorted by variable
-        data_dicts = {}
-        for variable in variables:
-            data_dicts[variable] = {}
-
-        # init a dictionary to store outputs
-        all_data_dict = {}
-
+        aws_response_dicts = []
         with client as executor:
-            logging.info(
-                f'Reading {len(aws_request_dicts)} data months from S3 bucket.',
-            )
             # map all our input dicts to our data getter function
             futures = {
                 executor.submit(self._get_aws_data, arg): arg for arg in aws_request_dicts
             }
-            # add outputs to data_dicts
             for future in as_completed_func(futures):
                 try:
                     aws_response_dict = future.result()
-                    var = aws_response_dict['variable']
-                    index = aws_response_dict['index']
-                    ds = aws_response_dict['dataset']
-                    ds = crop_time_dimension(
-                        ds,
-                        start_dt,
-                        end_dt,
-                    )
-                    data_dicts[var][index] = ds
+                    if on_response is not None:
+                        on_response(aws_response_dict)
+                    else:
+                        aws_response_dicts.append(aws_response_dict)
                 except Exception as e:
                     logging.warning(
                         f'Exception hit!: {e}',
                     )
+        return aws_response_dicts
 
-        for variable in variables:
-            var_dict = data_dicts[variable]
-
-            # reconstruct each variable into a DataArray
-            keys = list(var_dict.keys())
-            keys.sort()
-            datasets = []
-            for key in keys:
-                datasets.append(var_dict[key])
-
-            # only concat if necessary
-            if len(datasets) > 1:
-                ds = xr.concat(
-                    datasets,
-                    dim='time',
-                )
-            else:
-                ds = datasets[0]
-
-            # drop every variable except the one we want (works for aws)
-            for var in ds.data_vars:
-                if var != variable:
-                    ds = ds.drop_vars(var)
+    async def _get_aws_data_async(
+        self,
+        aws_request_dicts: List[AWSRequestDict],
+        on_response: Optional[Callable[[AWSResponseDict], None]] = None,
+    ) -> List[AWSResponseDict]:
+        """Reads all requests concurrently within one event loop.
 
-            all_data_dict[variable] = ds.rename(
-                {list(ds.data_vars)[0]: variable},
+        If on_response is provided, each response is passed to it as soon as
+        it is read instead of being returned.
+        """
+        if len(aws_request_dicts) == 0:
+            return []
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        async def fetch(
+            aws_request_dict: AWSRequestDict,
+        ) -> Optional[AWSResponseDict]:
+            aws_response_dict = await self._fetch_aws_data(
+                aws_request_dict,
+                fs,
+                semaphore,
             )
-
-            all_data_dict[variable] = write_crs(
-                all_data_dict[variable],
-                known_epsg=4326,
+            if on_response is None:
+                return aws_response_dict
+            on_response(aws_response_dict)
+
+        async with open_async_filesystem(
+            aws_request_dicts[0]['aws_endpoint'],
+        ) as fs:
+            results = await asyncio.gather(
+                *[
+                    fetch(arg) for arg in aws_request_dicts
+                ],
+                return_exceptions=True,
             )
 
-        # return the combined data
-        return combine_variables(
-            all_data_dict,
-            self.attrs_dict,
-        )
-
-    # AWS specific methods #####################################################
+        aws_response_dicts = []
+        for result in results:
+            if isinstance(result, Exception):
+                logging.warning(
+                    f'Exception hit!: {result}',
+                )
+            elif on_response is None:
+                aws_response_dicts.append(result)
+        return aws_response_dicts
 
     @staticmethod
     def _rename_dimensions(dataset: xr.Dataset) -> xr.Dataset:
@@ -341,22 +453,121 @@ class AWSDataAccessor(DataAccessorBase):
                             'aws_endpoint': endpoint,
                             'index': count,
                             'bbox': bbox,
+                            'start_dt': start_dt,
+                            'end_dt': end_dt,
+                            'specific_hours': self.specific_hours,
                         },
                     )
                     count += 1
         return aws_request_dicts
 
+    @staticmethod
+    def _get_grid_window(
+        bbox: BoundingBoxDict,
+    ) -> Dict[str, List[int]]:
+        """Returns the (inclusive) grid index window a bbox is cropped to.
+
+        NOTE: This mirrors crop_data() on the shifted era5-pds grid, where
+            longitudes run from -180 and latitudes run from 90 -> -90.
+        """
+        n_lat, n_lon = AWS_GRID_SHAPE
+        x_idxs = np.clip(
+            np.round(
+                (np.array([bbox['west'], bbox['east']]) + 180) /
+                AWS_GRID_RESOLUTION,
+            ).astype(int),
+            0,
+            n_lon - 1,
+        )
+        y_idxs = np.clip(
+            np.round(
+                (90 - np.array([bbox['north'], bbox['south']])) /
+                AWS_GRID_RESOLUTION,
+            ).astype(int),
+            0,
+            n_lat - 1,
+        )
+        return {
+            'x': [int(x_idxs.min()), int(x_idxs.max())],
+            'y': [int(y_idxs.min()), int(y_idxs.max())],
+        }
+
+    @staticmethod
+    def _get_time_indices(
+        times: np.ndarray,
+        aws_request_dict: AWSRequestDict,
+    ) -> np.ndarray:
+        """Returns the indices of times within a request's time window."""
+        times = pd.DatetimeIndex(times)
+        mask = (
+            (times >= aws_request_dict['start_dt']) &
+            (times <= aws_request_dict['end_dt'])
+        )
+        specific_hours = aws_request_dict.get('specific_hours', None)
+        if specific_hours is not None:
+            mask &= times.hour.isin(specific_hours)
+        return np.flatnonzero(mask)
+
+    def _select_times(
+        self,
+        dataset: xr.Dataset,
+        aws_request_dict: AWSRequestDict,
+    ) -> xr.Dataset:
+        """Lazily selects the requested times from a (renamed) month."""
+        if 'start_dt' not in aws_request_dict:
+            return dataset
+        return dataset.isel(
+            time=self._get_time_indices(
+                dataset['time'].values,
+                aws_request_dict,
+            ),
+        )
+
+    def _get_cache_key(
+        self,
+        aws_request_dict: AWSRequestDict,
+    ) -> str:
+        """Returns the month-tile cache key for a request."""
+        return self._cache.make_key(
+            {
+                'variable': aws_request_dict['variable'],
+                'aws_endpoint': aws_request_dict['aws_endpoint'],
+                'grid_window': self._get_grid_window(aws_request_dict['bbox']),
+            },
+        )
+
     def _get_aws_data(
         self,
         aws_request_dict: AWSRequestDict,
     ) -> AWSResponseDict:
-        # read data from the s3 bucket
         endpoint = aws_request_dict['aws_endpoint']
+
+        # check the local cache before reading from the s3 bucket
+        cache_key = None
+        if self._cache is not None:
+            cache_key = self._get_cache_key(aws_request_dict)
+            cached_ds = self._cache.get_dataset(cache_key)
+            if cached_ds is not None:
+                logging.info(f'Reading endpoint from cache: {endpoint}')
+                aws_request_dict['dataset'] = self._select_times(
+                    cached_ds,
+                    aws_request_dict,
+                )
+                return aws_request_dict
+
+        # read data from the s3 bucket
         logging.info(f'Accessing endpoint: {endpoint}')
-        aws_request_dict['dataset'] = xr.open_dataset(
-            fsspec.open(endpoint).open(),
-            engine='h5netcdf',
-        )
+        if self.reference_index_dir:
+            # lazily read only the HDF5 chunks that are cropped to
+            aws_request_dict['dataset'] = open_reference_dataset(
+                get_reference_index(endpoint, self.reference_index_dir),
+                variables=[aws_request_dict['variable']],
+            )
+        else:
+            aws_request_dict['dataset'] = xr.open_dataset(
+                fsspec.open(endpoint).open(),
+                engine='h5netcdf',
+            )
 
         # adjust to switch to standard lat/lon
         aws_request_dict['dataset']['lon'] = aws_request_dict['dataset']['lon'] - 180
@@ -373,4 +584,121 @@ class AWSDataAccessor(DataAccessorBase):
             aws_request_dict['dataset'],
         )
 
+        # store the cropped month in the cache
+        if cache_key is not None:
+            aws_request_dict['dataset'] = aws_request_dict['dataset'].load()
+            self._cache.put_dataset(
+                cache_key,
+                aws_request_dict['dataset'],
+            )
+
+        # select times before anything else is read or returned
+        aws_request_dict['dataset'] = self._select_times(
+            aws_request_dict['dataset'],
+            aws_request_dict,
+        )
+        return aws_request_dict
+
+    async def _fetch_aws_data(
+        self,
+        aws_request_dict: AWSRequestDict,
+        fs: fsspec.asyn.AsyncFileSystem,
+        semaphore: asyncio.Semaphore,
+    ) -> AWSResponseDict:
+        """Async version of _get_aws_data() reading only the bbox window."""
+        endpoint = aws_request_dict['aws_endpoint']
+        variable = aws_request_dict['variable']
+
+        # check the local cache before reading from the s3 bucket
+        cache_key = None
+        if self._cache is not None:
+            cache_key = self._get_cache_key(aws_request_dict)
+            cached_ds = await asyncio.to_thread(
+                self._cache.get_dataset,
+                cache_key,
+            )
+            if cached_ds is not None:
+                logging.info(f'Reading endpoint from cache: {endpoint}')
+                aws_request_dict['dataset'] = self._select_times(
+                    cached_ds,
+                    aws_request_dict,
+                )
+                return aws_request_dict
+
+        # get the chunk byte ranges of the file
+        logging.info(f'Accessing endpoint: {endpoint}')
+        if self.reference_index_dir:
+            reference_index = await asyncio.to_thread(
+                get_reference_index,
+                endpoint,
+                self.reference_index_dir,
+            )
+        else:
+            reference_index = await asyncio.to_thread(
+                build_reference_index,
+                endpoint,
+            )
+
+        # read the grid window crop_data() would return (on the shifted grid)
+        grid_window = self._get_grid_window(aws_request_dict['bbox'])
+        window = {
+            'lon': slice(grid_window['x'][0], grid_window['x'][1] + 1),
+            'lat': slice(grid_window['y'][0], grid_window['y'][1] + 1),
+        }
+        ds = open_reference_dataset(
+            reference_index,
+            variables=[variable],
+        )
+
+        # only read the requested time span (full months are cached)
+        time_dim = [d for d in list(ds.coords) if 'time' in d][0]
+        time_idxs = None
+        if cache_key is None and 'start_dt' in aws_request_dict:
+            time_idxs = self._get_time_indices(
+                ds[time_dim].values,
+                aws_request_dict,
+            )
+            if len(time_idxs) > 0:
+                window[time_dim] = slice(time_idxs[0], time_idxs[-1] + 1)
+                time_idxs = time_idxs - time_idxs[0]
+            else:
+                window[time_dim] = slice(0, 0)
+
+        data = await read_window_async(
+            reference_index,
+            variable,
+            window,
+            fs,
+            semaphore,
+        )
+
+        # decode the window and attach it to the (lazy) coordinates
+        var_ref = reference_index['variables'][variable]
+        ds = ds.isel(window)
+        ds[variable] = xr.decode_cf(
+            xr.Dataset({variable: (var_ref['dims'], data, var_ref['attrs'])}),
+        )[variable]
+
+        # adjust to switch to standard lat/lon
+        ds['lon'] = ds['lon'] - 180
+        ds.attrs['EPSG'] = 4326
+        aws_request_dict['dataset'] = self._rename_dimensions(ds)
+
+        # store the cropped month in the cache
+        if cache_key is not None:
+            await asyncio.to_thread(
+                self._cache.put_dataset,
+                cache_key,
+                aws_request_dict['dataset'],
+            )
+            aws_request_dict['dataset'] = self._select_times(
+                aws_request_dict['dataset'],
+                aws_request_dict,
+            )
+        elif time_idxs is not None and len(time_idxs) > 0:
+            # drop hours within the span that were not requested
+            aws_request_dict['dataset'] = aws_request_dict['dataset'].isel(
+                time=time_idxs,
+            )
+
         return aws_request_dict
@@ -1,13 +1,16 @@
 import logging
 import warnings
-import multiprocessing
+import os
+import time
+import math
 import tempfile
+import zipfile
+import multiprocessing
 import cdsapi
 import xarray as xr
 import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
-from urllib.request import urlopen
 from typing import (
     Tuple,
     Dict,
@@ -17,18 +20,23 @@ from typing import (
     TypedDict,
 )
 from numbers import Number
-from xarray_data_accessor.multi_threading import (
-    get_multithread,
+from xarray_data_accessor.caching import (
+    FileCache,
 )
 from xarray_data_accessor.data_accessors.shared_functions import (
     combine_variables,
     apply_kwargs,
+    get_cache,
+    get_executor,
     write_crs,
-    crop_time_dimension,
 )
 from xarray_data_accessor.shared_types import (
     BoundingBoxDict,
 )
+from xarray_data_accessor.data_accessors.assembly import (
+    DatasetAssembler,
+    get_hourly_time_index,
+)
 from xarray_data_accessor.data_accessors.base import (
     DataAccessorBase,
     AttrsDict,
@@ -42,8 +50,29 @@ from xarray_data_accessor.info.era5 import (
     MISSING_HOURLY_VARIABLES,
     PRESSURE_LEVEL_VARIABLES,
     ERA5_LAND_VARIABLES,
+    CDS_SHORT_NAMES,
 )
 
+# ERA5T (preliminary) data can be revised for ~3 months after release
+ERA5T_REVISION_MONTHS = 3
+
+# min/max seconds between polls of queued CDS requests
+CDS_POLL_INTERVAL_RANGE = (1, 30)
+
+# CDS request states that are not final (any other state is finished)
+ACTIVE_REQUEST_STATES = ('accepted', 'queued', 'running')
+
+# request keys whose value order does not change the response
+# NOTE: area [N, W, S, E] and grid are ordered, so they are not sorted
+UNORDERED_REQUEST_KEYS = [
+    'variable',
+    'year',
+    'month',
+    'day',
+    'time',
+    'pressure_level',
+]
+
 
 class CDSKwargsDict(TypedDict):
     """kwargs for CDSDataAccessor get_data() method."""
@@ -51,13 +80,21 @@ class CDSKwargsDict(TypedDict):
     thread_limit: int
     file_format: str
     specific_hours: List[int]
+    cache_dir: str
+    cache_size_limit_mb: int
+    era5t_cache_expiry_days: int
+    max_requests_in_flight: int
+    field_limit: int
+    scratch_dir: str
+    time_chunk_size: int
+    zarr_store: str
 
 
 class CDSInputDict(TypedDict):
     """Input dictionary for CDS API request"""
     product_type: str
     format: str
-    variable: str
+    variable: Union[str, List[str]]
     year: Union[str, List[str]]
     month: Union[str, List[str]]
     day: Optional[Union[str, List[str]]]
@@ -90,6 +127,20 @@ class CDSDataAccessor(DataAccessorBase):
         self.use_dask: bool = True
         self.file_format: str = 'netcdf'
         self.specific_hours: List[int] = None
+        self.cache_dir: str = None
+        self.cache_size_limit_mb: int = 10000
+        self.era5t_cache_expiry_days: int = None
+        self.max_requests_in_flight: int = 10
+        self.field_limit: int = 120000
+        self.scratch_dir: str = None
+        self.time_chunk_size: int = 168
+        self.zarr_store: str = None
+
+        # request result cache (set up in get_data() if cache_dir is provided)
+        self._cache: FileCache = None
+
+        # managed scratch directory for uncached downloads (see get_data())
+        self._scratch_tempdir: tempfile.TemporaryDirectory = None
 
     @classmethod
     def supported_datasets(cls) -> List[str]:
@@ -164,7 +215,13 @@ class CDSDataAccessor(DataAccessorBase):
         Main data getter function.
 
         NOTE: CDS multithreading is best handled across time, but total
-            observations limits must be considered.
+            observations limits must be considered. Requests are queued
+            without blocking (see _run_request_pipeline()).
+        NOTE: Responses are written into one preallocated array per variable
+            (or into regions of a Zarr store at kwarg zarr_store), so peak
+            memory stays close to the output size.
+        NOTE: Uncached downloads go to a temporary directory (inside kwarg
+            scratch_dir if provided) that is deleted before returning.
         """
         # check dataset compatibility
         if dataset_name not in self.supported_datasets():
@@ -178,114 +235,108 @@ class CDSDataAccessor(DataAccessorBase):
         # parse kwargs
         self._parse_kwargs(kwargs)
 
-        # make time dict w/ CDS API formatting
-        time_dicts = self._get_time_dicts(
-            start_dt,
-            end_dt,
-            specific_hours=self.specific_hours,
-        )
-
-        client, as_completed_func = get_multithread(
-            use_dask=self.use_dask,
-            n_workers=self.thread_limit,
-            threads_per_worker=1,
-            processes=True,
-            close_existing_client=False,
-        )
+        # set up the local request cache if desired
+        if self.cache_dir:
+            self._cache = get_cache(
+                self,
+                self.cache_dir,
+                size_limit_mb=self.cache_size_limit_mb,
+                suffix=self.file_format_dict[self.file_format],
+            )
+        else:
+            self._cache = None
 
         # make a dictionary to store all data
         all_data_dict = {}
 
-        with client as executor:
-            for variable in variables:
-                # check if variable is supported
-                if not variable in self.dataset_variables()[self.dataset_name]:
-                    warnings.warn(
-                        message=(
-                            f'Variable={variable} cannot be found for CDS'
-                        ),
-                    )
-                    continue
-                else:
-                    logging.info(f'Getting {variable} from CDS API')
-
-                # store futures
-                var_dict = {}
-                input_dicts = []
-                for i, time_dict in enumerate(time_dicts):
-                    input_dicts.append(
-                        dict(
-                            time_dict,
-                            **{
-                                'product_type': 'reanalysis',
-                                'variable': variable,
-                                'format': self.file_format,
-                                'grid': [0.25, 0.25],
-                                'area': [
-                                    bbox['south'],
-                                    bbox['west'],
-                                    bbox['north'],
-                                    bbox['east'],
-                                ],
-                                'index': i,
-                            }
-                        ),
-                    )
+        # check if variables are supported
+        supported_variables = []
+        for variable in variables:
+            if not variable in self.dataset_variables()[self.dataset_name]:
+                warnings.warn(
+                    message=(
+                        f'Variable={variable} cannot be found for CDS'
+                    ),
+                )
+            else:
+                logging.info(f'Getting {variable} from CDS API')
+                supported_variables.append(variable)
 
-                # only send 10 at once to prevent being throttled
-                batches = list(range((len(input_dicts) // 10) + 1))
-                batches = [b + 1 for b in batches]
-                for j, batch in enumerate(batches):
-                    if j == 0:
-                        start_i = 0
-                    else:
-                        start_i = int(batches[j - 1] * 10)
-                    if batch == batches[-1]:
-                        end_i = None
-                    else:
-                        end_i = int(batch * 10)
-
-                    futures = {
-                        executor.submit(
-                            self._get_api_response,
-                            arg,
-                        ): arg for arg in input_dicts[start_i:end_i]
+        # pack all variables/times into as few requests as possible
+        request_plan = self._get_request_plan(
+            supported_variables,
+            start_dt,
+            end_dt,
+            specific_hours=self.specific_hours,
+        )
+        input_dicts = []
+        for request_dict in request_plan:
+            input_dicts.append(
+                dict(
+                    request_dict,
+                    **{
+                        'product_type': 'reanalysis',
+                        'format': self.file_format,
+                        'grid': [0.25, 0.25],
+                        'area': [
+                            bbox['south'],
+                            bbox['west'],
+                            bbox['north'],
+                            bbox['east'],
+                        ],
+                        'index': len(input_dicts),
                     }
-                    for future in as_completed_func(futures):
-                        try:
-                            index, ds = future.result()
-                            var_dict[index] = ds
-                        except Exception as e:
-                            logging.warning(
-                                f'Exception hit!: {e}',
-                            )
-
-                # reconstruct each variable into a DataArray
-                keys = list(var_dict.keys())
-                keys.sort()
-                datasets = []
-                for key in keys:
-                    datasets.append(var_dict[key])
-                ds = xr.concat(
-                    datasets,
-                    dim='time',
-                )
+                ),
+            )
+        request_variables = {
+            d['index']: d['variable'] for d in input_dicts
+        }
 
-                # crop by time
-                ds = crop_time_dimension(
-                    ds,
-                    start_dt,
-                    end_dt,
-                )
+        # write each response into its place in the preallocated output
+        specific_hours = None
+        if self.specific_hours is not None:
+            specific_hours = [
+                int(h[:2]) for h in self._get_hours_list(self.specific_hours)
+            ]
+        assembler = DatasetAssembler(
+            get_hourly_time_index(start_dt, end_dt, specific_hours),
+            zarr_store=self.zarr_store,
+        )
+        try:
+            # only send requests that are not already cached
+            responses = {}
+            input_dicts = self._read_cached_responses(
+                input_dicts,
+                responses,
+            )
+            responses.update(
+                self._run_request_pipeline(input_dicts),
+            )
 
-                all_data_dict[variable] = ds.rename(
-                    {list(ds.data_vars)[0]: variable},
+            for index in sorted(responses.keys()):
+                response = responses.pop(index)
+                split_dict = self._split_response(
+                    response,
+                    request_variables[index],
                 )
-
-                all_data_dict[variable] = write_crs(
-                    all_data_dict[variable],
+                for variable, var_ds in split_dict.items():
+                    assembler.add(variable, var_ds)
+
+                # the response is now copied, so its scratch file can go
+                self._release_response(response)
+        finally:
+            for response in responses.values():
+                response.close()
+            self._cleanup_scratch_dir()
+
+        for variable in supported_variables:
+            ds = assembler.get_dataset(variable)
+            if ds is not None:
+                ds = write_crs(
+                    ds,
                     known_epsg=4326,
                 )
+            all_data_dict[variable] = ds
 
         # return the combined data
         return combine_variables(
@@ -299,7 +350,7 @@ class CDSDataAccessor(DataAccessorBase):
         """Returns a CDS API client."""
         if self._client is None:
             try:
-                self._client = cdsapi.Client()
+                self._client = cdsapi.Client(wait_until_complete=False)
             except Exception as e:
                 warnings.warn(
                     message=(
@@ -311,6 +362,15 @@ class CDSDataAccessor(DataAccessorBase):
                 raise e
         return self._client
 
+    def close(self) -> None:
+        """Closes the CDS API client's HTTP session (if one was made)."""
+        self._cleanup_scratch_dir()
+        if self._client is not None:
+            session = getattr(self._client, 'session', None)
+            if session is not None:
+                session.close()
+            self._client = None
+
     @staticmethod
     def _possible_variables(
         dataset_name: str,
@@ -352,35 +412,6 @@ class CDSDataAccessor(DataAccessorBase):
                 )
                 return 'netcdf'
 
-    @staticmethod
-    def _get_years_list(
-        start_dt: datetime,
-        stop_dt: datetime,
-    ) -> List[str]:
-        return [str(i) for i in range(start_dt.year, stop_dt.year + 1)]
-
-    @staticmethod
-    def _get_months_list(
-        start_dt: datetime,
-        stop_dt: datetime,
-    ) -> List[str]:
-        if len(range(start_dt.year, stop_dt.year + 1)) > 1:
-            return ['{0:0=2d}'.format(m) for m in range(1, 13)]
-        else:
-            months = [m for m in range(start_dt.month, stop_dt.month + 1)]
-            return ['{0:0=2d}'.format(m) for m in months if m <= 12]
-
-    @staticmethod
-    def _get_days_list(
-        start_dt: datetime,
-        stop_dt: datetime,
-    ) -> List[str]:
-        if len(range(start_dt.month, stop_dt.month + 1)) > 1:
-            return ['{0:0=2d}'.format(d) for d in range(1, 32)]
-        else:
-            days = [d for d in range(start_dt.day, stop_dt.day + 1)]
-            return ['{0:0=2d}'.format(d) for d in days if d <= 31]
-
     def _get_hours_list(
         self,
         specific_hours: Optional[List[int]] = None,
@@ -403,100 +434,485 @@ class CDSDataAccessor(DataAccessorBase):
 
         return ['{0:0=2d}:00'.format(h) for h in specific_hours]
 
-    def _get_time_dicts(
+    @staticmethod
+    def _get_month_units(
+        start_dt: datetime,
+        end_dt: datetime,
+    ) -> List[Tuple[str, str, List[str]]]:
+        """Returns (year, month, days) tuples covering the time range.
+
+        NOTE: Fully covered months request days 01-31 so that they can be
+            combined into one request (CDS ignores invalid dates).
+        """
+        month_units = []
+        month_starts = pd.date_range(
+            datetime(start_dt.year, start_dt.month, 1),
+            end_dt,
+            freq='MS',
+        )
+        for month_start in month_starts:
+            last_day = month_start.days_in_month
+            first_day = 1
+            if (month_start.year, month_start.month) == (start_dt.year, start_dt.month):
+                first_day = start_dt.day
+            if (month_start.year, month_start.month) == (end_dt.year, end_dt.month):
+                last_day = end_dt.day
+
+            if first_day == 1 and last_day == month_start.days_in_month:
+                days = range(1, 32)
+            else:
+                days = range(first_day, last_day + 1)
+
+            month_units.append(
+                (
+                    str(month_start.year),
+                    '{0:0=2d}'.format(month_start.month),
+                    ['{0:0=2d}'.format(d) for d in days],
+                ),
+            )
+        return month_units
+
+    def _get_variable_groups(
+        self,
+        variables: List[str],
+        fields_per_variable: int,
+    ) -> List[List[str]]:
+        """Splits variables into evenly sized groups that fit the field limit.
+
+        Only variables with known NetCDF short names are grouped, since the
+        responses must be split by variable again.
+        """
+        groupable = [v for v in variables if v in CDS_SHORT_NAMES]
+        max_group_size = max(1, self.field_limit // fields_per_variable)
+
+        variable_groups = []
+        if len(groupable) > 0:
+            n_groups = math.ceil(len(groupable) / max_group_size)
+            group_size = math.ceil(len(groupable) / n_groups)
+            for i in range(0, len(groupable), group_size):
+                variable_groups.append(groupable[i:i + group_size])
+
+        for variable in variables:
+            if variable not in groupable:
+                variable_groups.append([variable])
+        return variable_groups
+
+    def _get_request_plan(
         self,
+        variables: List[str],
         start_dt: datetime,
         end_dt: datetime,
         specific_hours: Optional[List[int]] = None,
     ) -> List[Dict[str, List[str]]]:
-        """Gets monthly time dictionaries for batch processing"""
-        # store time_dicts for each API call
-        time_dicts = []
+        """Packs variables, days, and hours into the fewest requests possible.
 
-        # get list of years
-        years = self._get_years_list(start_dt, end_dt)
+        The number of fields in a request is the product of its variables,
+        years, months, days, and hours. Each request is kept under
+        self.field_limit by first grouping variables, then combining
+        consecutive months of the same year, and only splitting months
+        into day chunks when a single month is too large.
 
-        for year in years:
-            if int(year) == start_dt.year:
-                s_dt = start_dt
-            else:
-                s_dt = pd.to_datetime(f'1/1/{year}')
-            if int(year) == end_dt.year:
-                e_dt = end_dt
-            else:
-                e_dt = pd.to_datetime(f'12/31/{year}')
+        Returns:
+            A list of request dictionaries in time order for each variable
+                group, with keys: year, month, day, time, variable.
+        """
+        hours = self._get_hours_list(specific_hours)
+        month_units = self._get_month_units(start_dt, end_dt)
+        if len(month_units) == 0 or len(variables) == 0:
+            return []
+
+        max_days = max(len(days) for _, _, days in month_units)
+        variable_groups = self._get_variable_groups(
+            variables,
+            fields_per_variable=max_days * len(hours),
+        )
 
-            # get list of months
-            months = self._get_months_list(s_dt, e_dt)
+        request_plan = []
+        for variable_group in variable_groups:
+            fields_per_day = len(variable_group) * len(hours)
+            block = None
+            for year, month, days in month_units:
+                month_fields = fields_per_day * len(days)
+
+                # add to the current block if possible
+                if (
+                    block is not None
+                    and block['year'] == [year]
+                    and block['day'] == days
+                    and month_fields * (len(block['month']) + 1) <= self.field_limit
+                ):
+                    block['month'].append(month)
+                    continue
 
-            for month in months:
-                if start_dt.year == int(year) and start_dt.month == int(month):
-                    s_dt = start_dt
+                if block is not None:
+                    request_plan.append(block)
+                    block = None
+
+                # split a month into chunks of days if it is too large
+                if month_fields > self.field_limit:
+                    chunk_size = max(1, self.field_limit // fields_per_day)
+                    for i in range(0, len(days), chunk_size):
+                        request_plan.append(
+                            {
+                                'year': [year],
+                                'month': [month],
+                                'day': days[i:i + chunk_size],
+                                'time': hours,
+                                'variable': list(variable_group),
+                            },
+                        )
                 else:
-                    s_dt = pd.to_datetime(f'{month}/1/{year}')
-                if end_dt.year == int(year) and end_dt.month == int(month):
-                    e_dt = end_dt
+                    block = {
+                        'year': [year],
+                        'month': [month],
+                        'day': days,
+                        'time': hours,
+                        'variable': list(variable_group),
+                    }
+            if block is not None:
+                request_plan.append(block)
+
+        logging.info(
+            f'Packed {len(variables)} variables into {len(request_plan)} '
+            f'CDS requests (field_limit={self.field_limit}).',
+        )
+        return request_plan
+
+    @staticmethod
+    def _split_response(
+        ds: xr.Dataset,
+        variables: List[str],
+    ) -> Dict[str, xr.Dataset]:
+        """Splits a (multi-variable) response into one dataset per variable."""
+        if len(variables) == 1:
+            return {
+                variables[0]: ds.rename(
+                    {list(ds.data_vars)[0]: variables[0]},
+                ),
+            }
+
+        out_dict = {}
+        for variable in variables:
+            short_name = CDS_SHORT_NAMES[variable]
+            if short_name not in ds.data_vars:
+                warnings.warn(
+                    f'Variable={variable} ({short_name}) is missing from a '
+                    f'CDS response.',
+                )
+                continue
+            out_dict[variable] = ds[[short_name]].rename(
+                {short_name: variable},
+            )
+        return out_dict
+
+    def _run_request_pipeline(
+        self,
+        input_dicts: List[CDSInputDict],
+    ) -> Dict[int, xr.Dataset]:
+        """Submits CDS requests without blocking and downloads results when ready.
+
+        Up to self.max_requests_in_flight requests are queued at once. Their
+        states are polled, and each completed result is downloaded in a
+        thread pool while its slot is refilled with the next pending request.
+
+        Returns:
+            A dictionary with request indices as keys and datasets as values.
+        """
+        responses = {}
+        if len(input_dicts) == 0:
+            return responses
+
+        logging.info(
+            f'Submitting {len(input_dicts)} requests to the CDS API '
+            f'(max {self.max_requests_in_flight} in flight).',
+        )
+
+        # downloads are pure I/O, so threads are used
+        client, as_completed_func = get_executor(
+            self,
+            use_dask=False,
+            n_workers=max(self.thread_limit, 1),
+            processes=False,
+        )
+
+        pending = list(reversed(input_dicts))
+        in_flight = {}
+        downloads = {}
+        poll_interval = CDS_POLL_INTERVAL_RANGE[0]
+
+        with client as executor:
+            while len(pending) > 0 or len(in_flight) > 0:
+                # refill free request slots
+                while len(pending) > 0 and len(in_flight) < self.max_requests_in_flight:
+                    input_dict = pending.pop()
+                    try:
+                        in_flight[input_dict['index']] = (
+                            input_dict,
+                            self._submit_request(input_dict),
+                        )
+                    except Exception as e:
+                        logging.warning(
+                            f'Exception hit!: {e}',
+                        )
+
+                # check the state of all queued requests
+                state_changed = False
+                for index, (input_dict, result) in list(in_flight.items()):
+                    try:
+                        state = self._poll_request(result)
+                    except Exception as e:
+                        logging.warning(
+                            f'Exception hit!: {e}',
+                        )
+                        in_flight.pop(index)
+                        continue
+
+                    if state == 'completed':
+                        in_flight.pop(index)
+                        downloads[
+                            executor.submit(
+                                self._get_api_response,
+                                input_dict,
+                                result,
+                            )
+                        ] = index
+                        state_changed = True
+                    elif state not in ACTIVE_REQUEST_STATES:
+                        # failed, rejected (i.e., too large), dismissed, ...
+                        in_flight.pop(index)
+                        logging.warning(
+                            f'CDS request {index} {state}: '
+                            f'{result.reply.get("error", None)}',
+                        )
+                        state_changed = True
+
+                # back off while nothing is changing
+                if state_changed:
+                    poll_interval = CDS_POLL_INTERVAL_RANGE[0]
                 else:
-                    e_dt = (
-                        pd.to_datetime(
-                            f'{int(month) + 1}/1/{year}',
-                        ) - timedelta(days=1)
+                    poll_interval = min(
+                        poll_interval * 1.5,
+                        CDS_POLL_INTERVAL_RANGE[1],
                     )
+                if len(in_flight) > 0:
+                    time.sleep(poll_interval)
+
+            # wait for the remaining downloads
+            for future in as_completed_func(downloads):
+                try:
+                    index, ds = future.result()
+                    responses[index] = ds
+                except Exception as e:
+                    logging.warning(
+                        f'Exception hit!: {e}',
+                    )
+        return responses
 
-                days = self._get_days_list(s_dt, e_dt)
-
-                # get weekly chunks of days for API calls
-                days_lists = []
-                sub_days = []
-                for day in days:
-                    if len(sub_days) < 7:
-                        sub_days.append(day)
-                    else:
-                        days_lists.append(sub_days)
-                        sub_days = [day]
-                if len(sub_days) > 0:
-                    if len(days_lists) == 0:
-                        days_lists.append(sub_days)
-                    days_lists[-1].extend(sub_days)
-
-                # add to list of dictionaries
-                for day_list in days_lists:
-                    time_dict = {}
-                    time_dict['year'] = [year]
-                    time_dict['month'] = [month]
-                    time_dict['day'] = day_list
-                    time_dicts.append(time_dict)
-
-        # add hours if necessary to each time dict
-        hours = self._get_hours_list(specific_hours)
-        for i, time_dict in enumerate(time_dicts):
-            time_dicts[i]['time'] = hours
-        return time_dicts
+    def _submit_request(
+        self,
+        input_dict: CDSInputDict,
+    ) -> cdsapi.api.Result:
+        """Queues a request on the CDS without waiting for it to complete."""
+        request = {k: v for k, v in input_dict.items() if k != 'index'}
+        return self.client.retrieve(
+            self.dataset_name,
+            request,
+        )
+
+    @staticmethod
+    def _poll_request(
+        result: cdsapi.api.Result,
+    ) -> str:
+        """Updates and returns the state of a queued request."""
+        if result.reply['state'] in ACTIVE_REQUEST_STATES:
+            result.update()
+        return result.reply['state']
 
     def _get_api_response(
         self,
         input_dict: CDSInputDict,
+        result: cdsapi.api.Result,
     ) -> Tuple[int, xr.Dataset]:
-        """Separated out as a function to support multithreading"""
-        # set up temporary file output
-        temp_file = Path(
-            tempfile.TemporaryFile(
-                dir=Path.cwd(),
-                prefix='temp_data',
-                suffix=self.file_format_dict[self.file_format],
-            ).name,
-        ).name
+        """Downloads a completed request. Separated out to support multithreading
 
-        # remove index from input dict
-        index = input_dict.pop('index')
+        The result is downloaded to a scratch file (moved into the cache if
+        enabled) and opened lazily with dask.
+        """
+        index = input_dict['index']
+
+        # the client streams the result to the scratch file
+        file_path = self._get_scratch_file_path()
+        logging.info(f'Downloading CDS request {index} to {file_path}')
+        result.download(str(file_path))
+
+        # move the file into the cache
+        if self._cache is not None:
+            file_path = self._cache.put_file(
+                self._get_cache_key(input_dict),
+                file_path,
+                metadata={
+                    'dataset_name': self.dataset_name,
+                    'request': {
+                        k: v for k, v in input_dict.items() if k != 'index'
+                    },
+                },
+            )
+        return (index, self._open_response(file_path))
 
-        # get the data
-        output = self.client.retrieve(
-            self.dataset_name,
-            input_dict,
-            temp_file,
+    def _get_scratch_dir(self) -> Path:
+        """Returns the managed scratch directory (created on first use).
+
+        NOTE: The directory (inside self.scratch_dir, or the system temp
+            directory) is deleted by _cleanup_scratch_dir().
+        """
+        if self._scratch_tempdir is None:
+            if self.scratch_dir:
+                Path(self.scratch_dir).mkdir(parents=True, exist_ok=True)
+            self._scratch_tempdir = tempfile.TemporaryDirectory(
+                prefix='cds_scratch_',
+                dir=self.scratch_dir,
+                ignore_cleanup_errors=True,
+            )
+        return Path(self._scratch_tempdir.name)
+
+    def _cleanup_scratch_dir(self) -> None:
+        """Deletes the managed scratch directory and any files left in it."""
+        if self._scratch_tempdir is not None:
+            self._scratch_tempdir.cleanup()
+            self._scratch_tempdir = None
+
+    def _get_scratch_file_path(self) -> Path:
+        """Returns a new file path in the managed scratch directory."""
+        file_descriptor, file_path = tempfile.mkstemp(
+            dir=self._get_scratch_dir(),
+            prefix='temp_data',
+            suffix=self.file_format_dict[self.file_format],
+        )
+        os.close(file_descriptor)
+        return Path(file_path)
+
+    def _release_response(
+        self,
+        ds: xr.Dataset,
+    ) -> None:
+        """Closes an assembled response and deletes it if it is a scratch file."""
+        ds.close()
+        source = ds.encoding.get('source', None)
+        if source is None or self._scratch_tempdir is None:
+            return
+        source = Path(source)
+        if source.parent == Path(self._scratch_tempdir.name):
+            try:
+                source.unlink()
+            except OSError as e:
+                logging.warning(f'Exception hit!: {e}')
+
+    def _open_response(
+        self,
+        file_path: Path,
+    ) -> xr.Dataset:
+        """Lazily opens a downloaded response with dask chunks.
+
+        Requests mixing instantaneous and accumulated variables are returned
+        by the CDS as a zip with one file per stepType. Its members are
+        extracted to the scratch directory and merged.
+        """
+        open_kwargs = {
+            'chunks': {'time': self.time_chunk_size},
+        }
+        if self.file_format == 'grib':
+            open_kwargs['engine'] = 'cfgrib'
+        if not zipfile.is_zipfile(file_path):
+            return xr.open_dataset(file_path, **open_kwargs)
+
+        extract_dir = Path(
+            tempfile.mkdtemp(
+                dir=self._get_scratch_dir(),
+                prefix=f'{Path(file_path).stem}_',
+            ),
         )
+        with zipfile.ZipFile(file_path) as zip_file:
+            member_paths = [
+                Path(zip_file.extract(member, extract_dir))
+                for member in sorted(zip_file.namelist())
+                if not member.endswith('/')
+            ]
+        datasets = [xr.open_dataset(p, **open_kwargs) for p in member_paths]
+        ds = xr.merge(
+            datasets,
+            compat='override',
+            combine_attrs='drop_conflicts',
+        )
+
+        # closing the merged dataset closes every member file
+        def close() -> None:
+            for member_ds in datasets:
+                member_ds.close()
+        ds.set_close(close)
+        return ds
+
+    def _get_cache_key(
+        self,
+        input_dict: CDSInputDict,
+    ) -> str:
+        """Returns the cache key of a (normalized) CDS request."""
+        request = {
+            k: v for k, v in input_dict.items() if k != 'index'
+        }
+        for k, v in request.items():
+            if not isinstance(v, (list, tuple)):
+                continue
+            if k in UNORDERED_REQUEST_KEYS:
+                request[k] = sorted(str(i) for i in v)
+            else:
+                request[k] = list(v)
+        request['dataset_name'] = self.dataset_name
+        return self._cache.make_key(request)
 
-        # open dataset in xarray
-        with urlopen(output.location) as output:
-            return (index, xr.open_dataset(output.read()))
+    @staticmethod
+    def _is_era5t_request(
+        input_dict: CDSInputDict,
+    ) -> bool:
+        """Checks if a request includes months that ERA5T may still revise."""
+        now = datetime.now()
+        cutoff = now.year * 12 + now.month - ERA5T_REVISION_MONTHS
+        for year in input_dict['year']:
+            for month in input_dict['month']:
+                if int(year) * 12 + int(month) >= cutoff:
+                    return True
+        return False
+
+    def _read_cached_responses(
+        self,
+        input_dicts: List[CDSInputDict],
+        var_dict: Dict[int, xr.Dataset],
+    ) -> List[CDSInputDict]:
+        """Adds cached responses to var_dict and returns uncached requests."""
+        if self._cache is None:
+            return input_dicts
+
+        uncached_dicts = []
+        for input_dict in input_dicts:
+            max_age = None
+            if (
+                self.era5t_cache_expiry_days is not None
+                and self._is_era5t_request(input_dict)
+            ):
+                max_age = timedelta(days=self.era5t_cache_expiry_days)
+
+            cached_path = self._cache.get(
+                self._get_cache_key(input_dict),
+                max_age=max_age,
+            )
+            if cached_path is None:
+                uncached_dicts.append(input_dict)
+            else:
+                var_dict[input_dict['index']] = self._open_response(
+                    cached_path,
+                )
+
+        logging.info(
+            f'{len(input_dicts) - len(uncached_dicts)} of {len(input_dicts)} '
+            f'requests were read from the cache.',
+        )
+        return uncached_dicts
@@ -18,9 +18,6 @@ from typing import (
     TypedDict,
 )
 from numbers import Number
-from xarray_data_accessor.multi_threading import (
-    get_multithread,
-)
 from xarray_data_accessor.shared_types import (
     BoundingBoxDict,
 )
@@ -30,6 +27,7 @@ from xarray_data_accessor.data_accessors.base import (
 )
 from xarray_data_accessor.data_accessors.shared_functions import (
     apply_kwargs,
+    get_executor,
     write_crs,
     convert_crs,
     crop_data,
@@ -196,7 +194,8 @@ class NASA_LPDAAC_Accessor(DataAccessorBase):
 
         # if there are multiple granules, download them in parallel
         else:
-            client, as_completed_func = get_multithread(
+            client, as_completed_func = get_executor(
+                self,
                 use_dask=self.use_dask,
                 n_workers=self.thread_limit,
                 threads_per_worker=1,
@@ -220,9 +219,6 @@ class NASA_LPDAAC_Accessor(DataAccessorBase):
                             f'Exception hit!: {e}',
                         )
 
-            # close client
-            client.close()
-
             # merge datasets
             xarray_dataset = xr.merge(data)
 
@@ -262,6 +258,12 @@ class NASA_LPDAAC_Accessor(DataAccessorBase):
             self._session.auth = self._auth_tuple
         return self._session
 
+    def close(self) -> None:
+        """Closes the requests session (if one was made)."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
     @staticmethod
     def _get_link_identifier(
         dataset_name: str,
@@ -1,19 +1,29 @@
 import logging
 import warnings
+from contextlib import nullcontext
 import rioxarray
 import pyproj
 import xarray as xr
 import numpy as np
 from datetime import datetime
 from typing import (
+    Callable,
+    ContextManager,
     Tuple,
     Dict,
     TypedDict,
     Union,
     Any,
     Optional,
+    get_origin,
 )
 from numbers import Number
+from xarray_data_accessor.caching import (
+    FileCache,
+)
+from xarray_data_accessor.multi_threading import (
+    get_multithread,
+)
 from xarray_data_accessor.utility_functions import (
     _convert_bbox,
 )
@@ -53,7 +63,14 @@ def apply_kwargs(
             warnings.warn(
                 f'Kwarg: {key} is allowed valid for {accessor_object.__name__}.',
             )
-        elif not isinstance(value, accessor_kwargs_dict[key]):
+            continue
+
+        # check generics (i.e., List[int]) against their origin type
+        expected_type = get_origin(accessor_kwargs_dict[key])
+        if expected_type is None:
+            expected_type = accessor_kwargs_dict[key]
+
+        if not isinstance(value, expected_type):
             warnings.warn(
                 f'Kwarg: {key} should be of type {accessor_kwargs_dict[key]}.',
             )
@@ -61,6 +78,47 @@ def apply_kwargs(
             setattr(accessor_object, key, value)
 
 
+def get_executor(
+    accessor_object: DataAccessorBase,
+    **kwargs,
+) -> Tuple[ContextManager, Callable]:
+    """Gets an executor for an accessor (see get_multithread() for kwargs).
+
+    If the accessor belongs to a DataAccessSession, the session's warm
+    executor is returned and is not closed when its context exits.
+
+    Returns:
+        A tuple with your executer context [0], and the as_completed()
+            function [1].
+    """
+    session = accessor_object._data_access_session
+    if session is None:
+        return get_multithread(**kwargs)
+    executor, as_completed_func = session.get_executor(**kwargs)
+    return (nullcontext(executor), as_completed_func)
+
+
+def get_cache(
+    accessor_object: DataAccessorBase,
+    cache_dir: str,
+    size_limit_mb: Optional[int] = None,
+    suffix: Optional[str] = None,
+) -> FileCache:
+    """Gets a FileCache, reusing the accessor's DataAccessSession cache."""
+    session = accessor_object._data_access_session
+    if session is None:
+        return FileCache(
+            cache_dir,
+            size_limit_mb=size_limit_mb,
+            suffix=suffix,
+        )
+    return session.get_cache(
+        cache_dir,
+        size_limit_mb=size_limit_mb,
+        suffix=suffix,
+    )
+
+
 def combine_variables(
     dataset_dict: Dict[str, xr.Dataset],
     attrs_dict: Dict[str, Union[str, Number]],
@@ -189,13 +247,13 @@ def crop_data(
         ds[y_dim].values - y_bounds.reshape(-1, 1),
     ).argmin(axis=1)
 
-    # return the sliced dataset
+    # return the sliced dataset (a view, no data is copied)
     return ds.isel(
         {
             x_dim: slice(nearest_x_idxs.min(), nearest_x_idxs.max() + 1),
             y_dim: slice(nearest_y_idxs.min(), nearest_y_idxs.max() + 1),
         },
-    ).copy()
+    )
 
 
 def crop_time_dimension(
@@ -204,9 +262,12 @@ def crop_time_dimension(
     end_dt: datetime,
     time_dim_name: Optional[str] = None,
 ) -> xr.Dataset:
-    """Crops the time dimension to the start and end datetimes."""
+    """Crops the time dimension to the start and end datetimes.
+
+    NOTE: The returned dataset is a view, no data is copied.
+    """
     if time_dim_name is None:
         time_dim_name = 'time'
     return ds.sel(
         {time_dim_name: slice(start_dt, end_dt)},
-    ).copy(deep=True)
+    )
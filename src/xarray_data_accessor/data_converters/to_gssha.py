@@ -1,11 +1,20 @@
+import io
 import warnings
 import logging
 import pandas as pd
 import numpy as np
 import xarray as xr
+import scipy.sparse
 from xarray_data_accessor import utility_functions
+from xarray_data_accessor.multi_threading import get_multithread
+from xarray_data_accessor.spatial_index import get_nearest_cells
+from xarray_data_accessor.areal_aggregation import (
+    get_areal_weights,
+    aggregate_to_polygons,
+)
 from xarray_data_accessor.shared_types import (
     BoundingBoxDict,
+    ShapefileInput,
     TimeInput,
 )
 from xarray_data_accessor.info.gssha import (
@@ -86,31 +95,128 @@ def _write_ascii_file(
     file_path: Path,
     hot_start: Optional[bool] = False,
 ) -> None:
-    """Writes the text content to the file path."""
+    """Writes the text content to the file path.
+
+    The text is validated as ASCII in memory, so invalid files are never
+    written (and files are not re-read after writing).
+    """
+    try:
+        data = text_content.encode('ascii')
+    except UnicodeEncodeError as e:
+        raise ValueError(
+            f'Something went wrong - Text for {file_path} is not valid ASCII: {e}',
+        )
+
+    with open(file_path, f'{OPEN_MODES[hot_start]}b') as file:
+        file.write(data)
 
-    with open(
-        file_path,
-        OPEN_MODES[hot_start],
-        encoding='ascii',
-    ) as file:
-        file.write(text_content)
 
-    # validate the ASCII file
+def _read_last_line(
+    file_path: Path,
+    block_size: int = 4096,
+) -> Optional[str]:
+    """Reads the last non-empty line of a file by seeking from its end.
+
+    Only the tail of the file is read, so this is cheap for multi-year files.
+    """
     if not file_path.exists():
-        raise FileNotFoundError(f'File {file_path} was not created!')
-
-    with open(
-        file_path,
-        'r',
-        encoding='ascii',
-        errors='ignore',
-    ) as file:
-        try:
-            file.read().encode('ascii')
-        except UnicodeDecodeError:
-            raise UnicodeDecodeError(
-                f'Something went wrong - File {file_path} is not a valid ASCII file.',
-            )
+        return None
+    with open(file_path, 'rb') as file:
+        end = file.seek(0, io.SEEK_END)
+        tail = b''
+        position = end
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            file.seek(position)
+            tail = file.read(read_size) + tail
+            lines = tail.strip().splitlines()
+
+            # the first line may be partial unless the start is reached
+            if len(lines) > 1 or (lines and position == 0):
+                return lines[-1].decode('ascii')
+    return None
+
+
+def _get_last_time(
+    file_path: Path,
+    time_token: int = 0,
+) -> Optional[pd.Timestamp]:
+    """Gets the timestamp of the last row written to an ASCII file.
+
+    Arguments:
+        file_path: The existing file (i.e., a WES or precipitation file).
+        time_token: The index of the first 'YYYY MM DD HH MM' row token.
+
+    Returns:
+        The last timestamp, or None if the file is missing or has no rows.
+    """
+    last_line = _read_last_line(file_path)
+    if not last_line:
+        return None
+    try:
+        return pd.to_datetime(
+            ' '.join(last_line.split()[time_token:time_token + 5]),
+            format='%Y %m %d %H %M',
+        )
+    except ValueError:
+        return None
+
+
+def _write_ascii_chunk(
+    file: io.BufferedWriter,
+    text_content: str,
+    file_path: Path,
+) -> None:
+    """Validates a chunk of text as ASCII and writes it to an open file."""
+    try:
+        file.write(text_content.encode('ascii'))
+    except UnicodeEncodeError as e:
+        raise ValueError(
+            f'Something went wrong - Text for {file_path} is not valid ASCII: {e}',
+        )
+
+
+def _format_rows(
+    row_labels: np.ndarray,
+    values: np.ndarray,
+    row_format: str,
+) -> str:
+    """Formats (row label, values...) rows in one vectorized pass.
+
+    Arguments:
+        row_labels: A 1-D array of row labels (i.e., time strings).
+        values: A 2-D (row, col) array.
+        row_format: A printf style format for one full row.
+
+    Returns:
+        The formatted rows, each ending in a newline.
+    """
+    rows = np.empty((values.shape[0], values.shape[1] + 1), dtype=object)
+    rows[:, 0] = row_labels
+    rows[:, 1:] = values
+    buffer = io.StringIO()
+    np.savetxt(buffer, rows, fmt=row_format)
+    return buffer.getvalue()
+
+
+def _format_grass_grid(
+    values: np.ndarray,
+    float_format: str = '%s',
+) -> str:
+    """Formats a 2-D array as GRASS ASCII rows (space separated values).
+
+    Arguments:
+        values: A 2-D (row, col) array.
+        float_format: A printf style format applied to every value. The
+            default (%s) writes the shortest round-trip representation.
+
+    Returns:
+        The formatted rows, each ending in a newline.
+    """
+    buffer = io.StringIO()
+    np.savetxt(buffer, values, fmt=float_format, delimiter=' ')
+    return buffer.getvalue()
 
 
 def _write_precip_coords(
@@ -149,10 +255,12 @@ def _write_precip_coords(
     # get the number of "gages"
     num_gages = len(easting)
 
-    output = f'NRGAG {num_gages}\n'
-    for i, (easting, northing) in enumerate(coordinates):
-        output += f'COORD {easting} {northing} "Center of precipitation pixel #{i+1}"\n'
-    return output
+    lines = [f'NRGAG {num_gages}\n']
+    lines.extend(
+        f'COORD {easting} {northing} "Center of precipitation pixel #{i+1}"\n'
+        for i, (easting, northing) in enumerate(coordinates)
+    )
+    return ''.join(lines)
 
 
 def _prepare_dataset(
@@ -238,6 +346,137 @@ def _prep_nodata(
     return xarray_dataset
 
 
+def _get_hmet_matrices(
+    xarray_dataset: xr.Dataset,
+    variable_to_hmet: Dict[str, str],
+    how: Optional[HMETAggregationFunctions] = None,
+    station_xys: Optional[List[Tuple[float, float]]] = None,
+    areal_weights: Optional[scipy.sparse.csr_matrix] = None,
+) -> np.ndarray:
+    """Builds (station, time, HMET variable) WES values in one read.
+
+    Arguments:
+        xarray_dataset: A prepared dataset (see _prepare_dataset()).
+        variable_to_hmet: A dict mapping variable names to HMET variables.
+        how: The spatial aggregation (if station_xys is None).
+        station_xys: The (x, y) of each station (in dataset units). Each
+            station takes the values of its nearest grid cell.
+        areal_weights: A sparse (polygon, cell) weight matrix (see
+            areal_aggregation.get_areal_weights()). If provided, each
+            polygon is a station holding its areal averages.
+
+    Returns:
+        An object array with one (time, HMET variable) matrix per station
+            (or a single aggregated matrix). Columns keep their dtypes.
+    """
+    x_dim = xarray_dataset.attrs['x_dim']
+    y_dim = xarray_dataset.attrs['y_dim']
+    hmet_to_variable: Dict[str, str] = dict(
+        zip(
+            variable_to_hmet.values(),
+            variable_to_hmet.keys(),
+        ),
+    )
+    if not how:
+        how = 'mean'
+
+    # find each station's grid cell once (reading shared cells once)
+    point_cells = None
+    if station_xys is not None:
+        station_xs, station_ys = np.array(station_xys, dtype='float64').T
+        x_idxs, y_idxs = get_nearest_cells(
+            xarray_dataset,
+            station_xs,
+            station_ys,
+            points_epsg=None,
+        )
+        cell_x_idxs, cell_y_idxs, point_cells = utility_functions._get_unique_cells(
+            x_idxs,
+            y_idxs,
+        )
+
+    if areal_weights is not None:
+        cell_x_idxs, cell_y_idxs, point_cells = utility_functions._get_weighted_cells(
+            areal_weights,
+            (xarray_dataset.sizes[y_dim], xarray_dataset.sizes[x_dim]),
+        )
+        n_stations = areal_weights.shape[0]
+    else:
+        n_stations = 1 if station_xys is None else len(station_xys)
+    n_times = xarray_dataset.sizes['time']
+    matrices = np.empty(
+        (n_stations, n_times, len(HMETVariables)),
+        dtype=object,
+    )
+    for i, hmet_variable in enumerate(HMETVariables.keys()):
+        if hmet_variable not in hmet_to_variable.keys():
+            matrices[:, :, i] = HMETVariables[hmet_variable].nodata_value
+            continue
+
+        data_array = xarray_dataset[hmet_to_variable[hmet_variable]]
+        if point_cells is None:
+            # (time, 1) aggregated over the grid
+            values = getattr(data_array, how)(dim=[y_dim, x_dim]).values
+            values = values.reshape(-1, 1)
+        else:
+            # (time, station) from one pointwise read of the used cells
+            values = utility_functions._extract_points(
+                data_array,
+                cell_x_idxs,
+                cell_y_idxs,
+                (x_dim, y_dim),
+                point_cells=point_cells,
+            )
+        matrices[:, :, i] = values.T
+    return matrices
+
+
+def _write_hmet_wes(
+    times: np.ndarray,
+    matrix: np.ndarray,
+    file_path: Path,
+    hot_start: Optional[bool] = False,
+    float_format: str = '%s',
+) -> Path:
+    """Writes a (time, HMET variable) matrix as a WES file in one pass.
+
+    On hot start, only rows after the file's last timestamp are appended.
+    """
+    times = pd.DatetimeIndex(times)
+    if hot_start:
+        last_time = _get_last_time(file_path)
+        if last_time is not None:
+            is_new = times > last_time
+            times, matrix = times[is_new], matrix[is_new]
+            if len(times) == 0:
+                logging.info(f'No new time steps for {file_path}.')
+                return file_path
+
+    time_strs = times.strftime('%Y %m %d %H %M').to_numpy()
+    row_format = ' '.join(['%s'] + [float_format] * matrix.shape[1])
+    _write_ascii_file(
+        text_content=_format_rows(time_strs, matrix, row_format),
+        file_path=file_path,
+        hot_start=hot_start,
+    )
+    return file_path
+
+
+def _drop_written_times(
+    xarray_dataset: xr.Dataset,
+    file_paths: List[Path],
+) -> xr.Dataset:
+    """Drops time steps already written to every file (for hot starts)."""
+    last_times = [_get_last_time(file_path) for file_path in file_paths]
+    if not last_times or any(t is None for t in last_times):
+        return xarray_dataset
+    return xarray_dataset.isel(
+        time=np.flatnonzero(
+            pd.DatetimeIndex(xarray_dataset.time.values) > min(last_times),
+        ),
+    )
+
+
 class ConvertToGSSHA:
     """Converts xarray datasets to GSSHA input files."""
 
@@ -252,9 +491,21 @@ class ConvertToGSSHA:
         file_name: Optional[str] = None,
         file_suffix: Optional[str] = None,
         hot_start: Optional[bool] = False,
+        float_format: str = '%.6f',
+        time_block_size: int = 8760,
+        shapefile: Optional[ShapefileInput] = None,
+        weights_cache_dir: Optional[Union[str, Path]] = None,
     ) -> Path:
         """Creates a GSSHA precipitation input file from an xarray dataset.
 
+        Rows are rendered from a (time, gage) array one block of time steps
+        at a time and streamed to the file, so writing is linear in the
+        number of time steps.
+
+        By default each grid cell is a gage. If a shapefile is provided,
+        each polygon is a gage (at a point inside it) holding the polygon's
+        area-weighted average.
+
         For more information on the GSSHA precipitation input file format, see:
             https://www.gsshawiki.com/Precipitation_Input
 
@@ -267,8 +518,15 @@ class ConvertToGSSHA:
             file_dir: The directory to save the file to.
             file_name: The name of the file to save.
             file_suffix: The file suffix to use.
-            hot_start: If true data is appended to the end of the file.
-                Otherwise, the file is overwritten.
+            hot_start: If true only time steps after the last one in the
+                file are appended (as new events, named with a _YYYYMMDDHH
+                suffix of their first time step). Otherwise, the file is
+                overwritten.
+            float_format: A printf style format for precipitation values.
+            time_block_size: The number of time steps rendered at once.
+            shapefile: A shapefile path or GeoDataFrame of polygons to use
+                as areal gages.
+            weights_cache_dir: A directory to cache areal weights in.
 
         Returns:
             The path of the output precipitation ASCII input file.
@@ -294,27 +552,42 @@ class ConvertToGSSHA:
         x_dim: str = xarray_dataset.attrs['x_dim']
         y_dim: str = xarray_dataset.attrs['y_dim']
 
-        # get coordinates
-        # TODO: figure out projection and units
-        data_df = (
-            xarray_dataset[precipitation_variable]
-            .to_dataframe()
-            .reset_index()
-            .sort_values(
-                by=[
-                    x_dim,
-                    'time',
-                ],
+        data_array: xr.DataArray = xarray_dataset[precipitation_variable]
+        if shapefile is not None:
+            # polygons are gages, averaged with a (polygon, cell) matmul
+            areal_weights, gage_xys = get_areal_weights(
+                xarray_dataset,
+                shapefile,
+                cache_dir=weights_cache_dir,
             )
-        )
-        ts1: datetime = data_df['time'].unique()[0]
+            gage_xs, gage_ys = gage_xys[:, 0], gage_xys[:, 1]
+        else:
+            # gages are ordered by x (ascending), then y (as in the dataset)
+            # TODO: figure out projection and units
+            data_array = data_array.sortby(x_dim).transpose('time', x_dim, y_dim)
+            n_x: int = data_array.sizes[x_dim]
+            n_y: int = data_array.sizes[y_dim]
+            gage_xs = np.repeat(data_array[x_dim].values, n_y)
+            gage_ys = np.tile(data_array[y_dim].values, n_x)
         coordinates_header: str = _write_precip_coords(
-            easting=data_df.loc[data_df.time == ts1, x_dim].to_numpy(),
-            northing=data_df.loc[data_df.time == ts1, y_dim].to_numpy(),
+            easting=gage_xs,
+            northing=gage_ys,
             input_epsg=xarray_dataset.attrs.get('EPSG', None),
             output_epsg=output_epsg,
         )
 
+        def read_block(time_idxs: np.ndarray) -> np.ndarray:
+            # returns a (time, gage) array
+            if shapefile is not None:
+                return aggregate_to_polygons(
+                    data_array.isel(time=time_idxs),
+                    areal_weights,
+                    xy_dims=(x_dim, y_dim),
+                )
+            return data_array.isel(
+                time=time_idxs,
+            ).values.reshape(len(time_idxs), -1)
+
         # get events
         if not event_intervals:
             event_intervals: List[EventIntervals] = [
@@ -325,39 +598,59 @@ class ConvertToGSSHA:
                 ),
             ]
 
-        # write events data to file
-        event_strings: List[str] = []
-        for event in event_intervals:
-            event_string: str = f'EVENT {event["name"]}\n'
-            sub_df = data_df.loc[
-                data_df.time.between(
-                    event['start'],
-                    event['end'],
-                )
-            ]
-            event_string += f'NRPDS {len(sub_df)}\n'
-            event_string += coordinates_header
-            for t in sub_df.time.unique():
-                time_str: str = t.strftime('%Y %m %d %H %M')
-                data_string = (
-                    sub_df.loc[sub_df.time == t][precipitation_variable]
-                    .T
-                    .to_string(index=False, header=False)
-                )
-                data_string = ' '.join(data_string.split())
-                event_string += f'{precipitation_type} {time_str} {data_string}\n'
-            event_strings.append(event_string)
+        # on hot start, skip time steps that are already written
+        times = pd.DatetimeIndex(data_array.time.values)
+        last_time: Optional[pd.Timestamp] = None
+        if hot_start:
+            last_time = _get_last_time(file_path, time_token=1)
+        if last_time is not None:
+            data_array = data_array.isel(time=np.flatnonzero(times > last_time))
+            times = pd.DatetimeIndex(data_array.time.values)
+            if len(times) == 0:
+                logging.info(f'No new time steps for {file_path}.')
+                return file_path
+
+        # one row format for all (time, gage) rows
+        time_strs: np.ndarray = times.strftime('%Y %m %d %H %M').to_numpy()
+        row_format: str = ' '.join(
+            [f'{precipitation_type} %s'] + [float_format] * len(gage_xs),
+        )
 
-        # join the events
-        ascii_text: str = '\n'.join(event_strings)
-        del event_strings
+        # stream each event to the file, time_block_size rows at a time
+        with open(file_path, f'{OPEN_MODES[hot_start]}b') as file:
+            separate: bool = file.tell() > 0
+            for event in event_intervals:
+                time_idxs: np.ndarray = np.flatnonzero(
+                    (times >= pd.Timestamp(event['start']))
+                    & (times <= pd.Timestamp(event['end'])),
+                )
+                if last_time is not None and len(time_idxs) == 0:
+                    continue
+                event_header: str = '\n' if separate else ''
+                separate = True
+
+                # appended events are named by their first time step
+                event_name: str = event['name']
+                if last_time is not None:
+                    event_name += f'_{times[time_idxs[0]].strftime("%Y%m%d%H")}'
+                event_header += f'EVENT {event_name}\n'
+                event_header += f'NRPDS {len(time_idxs)}\n'
+                event_header += coordinates_header
+                _write_ascii_chunk(file, event_header, file_path)
+
+                for j in range(0, len(time_idxs), time_block_size):
+                    block_idxs = time_idxs[j:j + time_block_size]
+                    values: np.ndarray = read_block(block_idxs)
+                    _write_ascii_chunk(
+                        file,
+                        _format_rows(
+                            time_strs[block_idxs],
+                            values,
+                            row_format,
+                        ),
+                        file_path,
+                    )
 
-        # write the ASCII file
-        _write_ascii_file(
-            text_content=ascii_text,
-            file_path=file_path,
-            hot_start=hot_start,
-        )
         logging.info(f'Precipitation ASCII file saved @ {file_path}.')
         return file_path
 
@@ -372,9 +665,18 @@ class ConvertToGSSHA:
         file_dir: Optional[Union[str, Path]] = None,
         file_name: Optional[str] = None,
         file_suffix: Optional[str] = None,
+        float_format: str = '%s',
+        time_block_size: int = 24,
+        max_workers: Optional[int] = None,
+        hot_start: Optional[bool] = False,
     ) -> List[Path]:
         """Creates a HMET GRASS ASCII input file from an xarray dataset.
 
+        Time steps are read one block at a time. Each 2-D slice is formatted
+        with a vectorized formatter and files are written concurrently from
+        a thread pool. For dask backed datasets, the next block is computed
+        while the current block is being written.
+
         For more information on the GRASS ASCII input file format, see:
             https://grasswiki.osgeo.org/wiki/GRASS_ASCII_raster_format
 
@@ -392,9 +694,15 @@ class ConvertToGSSHA:
                 NOTE: The file name is automatically generated.
             file_name: The name of the file to save (default is set for HMET variables).
             file_suffix: The file suffix to use.
+            float_format: A printf style format for values (i.e., %.3f).
+                The default writes each value's shortest representation.
+            time_block_size: The number of time steps read at once.
+            max_workers: The number of file writing threads.
+            hot_start: If true, time steps whose files already exist are
+                skipped. Otherwise, existing files are overwritten.
 
         Returns:
-            The path of the directory containing all GRASS ASCII input files.
+            The paths of all GRASS ASCII input files (including skipped ones).
         """
 
         # prepare the dataset
@@ -440,40 +748,90 @@ class ConvertToGSSHA:
         grass_header += f'rows: {len(xarray_dataset[y_dim].values)}\n'
         grass_header += f'cols: {len(xarray_dataset[x_dim].values)}\n'
 
-        # iterate over time steps
-        file_paths: List[Path] = []
-        for time in xarray_dataset.time.values:
-            data_str = (
-                np.array2string(
-                    xarray_dataset[variable].sel(time=time).values,
-                    max_line_width=100000000,
-                    formatter={'float': lambda x: str(x)},
-                    separator=' ',
-                )
-                .replace('  ', '')
-                .replace('[', '')
-                .replace(']', '')
-                .replace('\n ', '\n')
-            )
-
-            ascii_text = grass_header + data_str
-
-            # get a file path (YYYYMMDDHH_TYPE.asc format)
-            timestamp: str = pd.to_datetime(time).strftime('%Y%m%d%H')
-            file_path: Path = _get_file_path(
+        # get a file path for each time step (YYYYMMDDHH_TYPE.asc format)
+        file_paths: List[Path] = [
+            _get_file_path(
                 file_dir=file_dir,
                 file_name=f'{timestamp}_{file_name}',
                 file_suffix=file_suffix,
             )
+            for timestamp in pd.to_datetime(
+                xarray_dataset.time.values,
+            ).strftime('%Y%m%d%H')
+        ]
+
+        # on hot start, only time steps without a file are read and written
+        write_idxs: np.ndarray = np.arange(len(file_paths))
+        if hot_start:
+            write_idxs = np.array(
+                [i for i, path in enumerate(file_paths) if not path.exists()],
+                dtype='int64',
+            )
+            logging.info(
+                f'Hot start: skipping {len(file_paths) - len(write_idxs)} '
+                f'existing GRASS ASCII files.',
+            )
+        write_paths: List[Path] = [file_paths[i] for i in write_idxs]
 
-            # write the ASCII file
-            file_paths.append(file_path)
+        def write_grid(
+            values: np.ndarray,
+            file_path: Path,
+        ) -> None:
             _write_ascii_file(
-                text_content=ascii_text,
+                text_content=grass_header + _format_grass_grid(
+                    values,
+                    float_format=float_format,
+                ),
                 file_path=file_path,
             )
+
+        def read_block(time_slice: slice) -> np.ndarray:
+            # computes the block if the dataset is dask backed
+            return xarray_dataset[variable].isel(
+                time=write_idxs[time_slice],
+            ).transpose('time', y_dim, x_dim).values
+
+        time_slices = [
+            slice(i, i + time_block_size)
+            for i in range(0, len(write_paths), time_block_size)
+        ]
+        writer, _ = get_multithread(
+            use_dask=False,
+            n_workers=max_workers,
+            processes=False,
+        )
+        reader, _ = get_multithread(
+            use_dask=False,
+            n_workers=1,
+            processes=False,
+        )
+        try:
+            pending = []
+            if time_slices:
+                next_block = reader.submit(read_block, time_slices[0])
+            for i, time_slice in enumerate(time_slices):
+                block = next_block.result()
+
+                # read the next block while this one is written
+                if i + 1 < len(time_slices):
+                    next_block = reader.submit(read_block, time_slices[i + 1])
+
+                # only one block of writes is in flight at a time
+                for future in pending:
+                    future.result()
+                pending = [
+                    writer.submit(write_grid, values, file_path)
+                    for values, file_path in zip(block, write_paths[time_slice])
+                ]
+                del block
+            for future in pending:
+                future.result()
+        finally:
+            reader.shutdown(cancel_futures=True)
+            writer.shutdown()
+
         logging.info(
-            f'{len(file_paths)} GRASS ASCII files saved to {file_dir}.',
+            f'{len(write_paths)} GRASS ASCII files saved to {file_dir}.',
         )
         return file_paths
 
@@ -488,12 +846,17 @@ class ConvertToGSSHA:
         file_suffix: Optional[str] = None,
         hot_start: Optional[bool] = False,
         how: Optional[HMETAggregationFunctions] = None,
-        xy_coords: Optional[Tuple[str, str]] = None,
+        xy_coords: Optional[Tuple[float, float]] = None,
+        float_format: str = '%s',
+        shapefile: Optional[ShapefileInput] = None,
+        weights_cache_dir: Optional[Union[str, Path]] = None,
     ) -> Path:
         """Creates a WES format HMET file from an xarray dataset.
 
         NOTE: This results aggregates the data at each timestep, ignoring
-        any spatial variability.
+        any spatial variability. If a shapefile is provided, values are
+        averaged over its (dissolved) polygons, weighting each cell by its
+        covered fraction and area.
 
         Arguments:
             xarray_dataset: The xarray dataset to convert.
@@ -505,12 +868,18 @@ class ConvertToGSSHA:
                 NOTE: The file name is automatically generated.
             file_name: The name of the file to save.
             file_suffix: The file suffix to use.
-            hot_start: If true data is appended to the end of the file.
-                Otherwise, the file is overwritten.
+            hot_start: If true only time steps after the last one in the
+                file are appended. Otherwise, the file is overwritten.
             how: The method to use to aggregate the data at each time step.
                 Options include: 'mean', 'median', 'min', 'max', 'sum'.
-            xy_coords: The x and y coordinate names to use for aggregation.
+            xy_coords: An (x, y) point to take values from (the nearest
+                grid cell) instead of aggregating.
                 Note that this must be in the same units as the xarray dataset.
+            float_format: A printf style format for values. The default
+                writes each value's shortest representation.
+            shapefile: A shapefile path or GeoDataFrame of watershed
+                polygons to take polygon-weighted averages over.
+            weights_cache_dir: A directory to cache areal weights in.
 
         Returns:
             The path of the output WES ASCII file.
@@ -541,55 +910,121 @@ class ConvertToGSSHA:
             file_suffix=file_suffix,
         )
 
-        # reverse the variable to HMET mapping
-        hmet_to_variable: Dict[str, str] = dict(
-            zip(
-                variable_to_hmet.values(),
-                variable_to_hmet.keys(),
-            ),
-        )
+        # on hot start, only read time steps that are not yet written
+        if hot_start:
+            xarray_dataset = _drop_written_times(xarray_dataset, [file_path])
 
-        # set default aggregation method
-        if not how:
-            how = 'mean'
-
-        # aggregate the data at each time step
-        arrays: Dict[str, np.ndarray] = {}
-        for hmet_variable in HMETVariables.keys():
-
-            if hmet_variable in hmet_to_variable.keys():
-                var = hmet_to_variable[hmet_variable]
-                if xy_coords:
-                    arrays[hmet_variable] = xarray_dataset[var].sel(
-                        x_dim=xy_coords[0],
-                        y_dim=xy_coords[1],
-                        method='nearest',
-                    ).values
-                else:
-                    arrays[hmet_variable] = getattr(xarray_dataset[var], how)(
-                        dim=['latitude', 'longitude'],
-                    ).values
-            else:
-                arrays[hmet_variable] = np.full(
-                    shape=xarray_dataset.time.shape,
-                    fill_value=HMETVariables[hmet_variable].nodata_value,
+        # get the areal weights of the watershed polygons
+        areal_weights = None
+        if shapefile is not None:
+            if how not in [None, 'mean'] or xy_coords:
+                warnings.warn(
+                    'param:how and param:xy_coords are ignored when a '
+                    'shapefile is provided (polygon-weighted means are used).',
                 )
+            areal_weights, _ = get_areal_weights(
+                xarray_dataset,
+                shapefile,
+                dissolve=True,
+                cache_dir=weights_cache_dir,
+            )
 
-        # add the aggregated data to a string
-        data_str = ''
-        for i, time in enumerate(xarray_dataset.time.values):
-            time_str: str = pd.to_datetime(time).strftime('%Y %m %d %H %M')
-            data_str += time_str
-            for data in arrays.values():
-                data_str += f' {data[i]}'
-            data_str += '\n'
+        # aggregate the data at each time step (or take a point's values)
+        matrix = _get_hmet_matrices(
+            xarray_dataset,
+            variable_to_hmet=variable_to_hmet,
+            how=how,
+            station_xys=[xy_coords] if xy_coords else None,
+            areal_weights=areal_weights,
+        )[0]
 
         # write the ASCII file
-        _write_ascii_file(
-            text_content=data_str,
+        _write_hmet_wes(
+            xarray_dataset.time.values,
+            matrix,
             file_path=file_path,
             hot_start=hot_start,
+            float_format=float_format,
         )
 
         logging.info(f'HMET WES ASCII file saved @ {file_path}.')
         return file_path
+
+    @staticmethod
+    def make_gssha_hmet_wes_stations(
+        xarray_dataset: xr.Dataset,
+        stations: Dict[str, Tuple[float, float]],
+        variable_to_hmet: Dict[str, str] = None,
+        start_time: Optional[TimeInput] = None,
+        end_time: Optional[TimeInput] = None,
+        file_dir: Optional[Union[str, Path]] = None,
+        file_name: Optional[str] = None,
+        file_suffix: Optional[str] = None,
+        hot_start: Optional[bool] = False,
+        float_format: str = '%s',
+    ) -> Dict[str, Path]:
+        """Creates one WES format HMET file per station in one pass.
+
+        Each variable is read once for all stations (their nearest grid
+        cells), so many sub-watershed files cost about as much as one.
+
+        Arguments:
+            xarray_dataset: The xarray dataset to convert.
+            stations: A dict mapping station names to (x, y) points.
+                Note that these must be in the same units as the xarray dataset.
+            file_name: The file name prefix (default is hmet_wes). Files are
+                named {file_name}_{station}.
+            See make_gssha_hmet_wes() for the remaining arguments.
+
+        Returns:
+            A dict mapping station names to output WES ASCII file paths.
+        """
+        if not variable_to_hmet:
+            raise ValueError(
+                'A variable to HMET variable names mapping must be provided!',
+            )
+
+        # prepare the dataset
+        xarray_dataset = _prepare_dataset(
+            xarray_dataset=xarray_dataset,
+            variables=list(variable_to_hmet.keys()),
+            variable_to_hmet=variable_to_hmet,
+            start_time=start_time,
+            end_time=end_time,
+        )
+        if not file_name:
+            file_name: str = 'hmet_wes'
+
+        file_paths: Dict[str, Path] = {
+            station: _get_file_path(
+                file_dir=file_dir,
+                file_name=f'{file_name}_{station}',
+                file_suffix=file_suffix,
+            )
+            for station in stations.keys()
+        }
+
+        # on hot start, only read time steps missing from some file
+        if hot_start:
+            xarray_dataset = _drop_written_times(
+                xarray_dataset,
+                list(file_paths.values()),
+            )
+
+        matrices = _get_hmet_matrices(
+            xarray_dataset,
+            variable_to_hmet=variable_to_hmet,
+            station_xys=list(stations.values()),
+        )
+        for station, matrix in zip(stations.keys(), matrices):
+            _write_hmet_wes(
+                xarray_dataset.time.values,
+                matrix,
+                file_path=file_paths[station],
+                hot_start=hot_start,
+                float_format=float_format,
+            )
+        logging.info(
+            f'{len(file_paths)} HMET WES ASCII files saved to {file_dir}.',
+        )
+        return file_paths
@@ -1,8 +1,13 @@
-import itertools
+import logging
 import xarray as xr
 import pandas as pd
+import pyarrow as pa
 import numpy as np
 import xarray_data_accessor.utility_functions as utility_functions
+from xarray_data_accessor.spatial_index import (
+    get_interpolation_weights,
+    get_nearest_cells,
+)
 from xarray_data_accessor.shared_types import (
     CoordsTuple,
     TableInput,
@@ -11,6 +16,7 @@ from pathlib import Path
 from typing import (
     Dict,
     List,
+    Literal,
     Optional,
     Tuple,
     Union,
@@ -21,32 +27,28 @@ class ConvertToTable:
     """Contains functions to convert xarray datasets to tables."""
 
     @staticmethod
-    def points_to_tables(
+    def _get_point_cells(
         xarray_dataset: xr.Dataset,
-        variables: Optional[List[str]] = None,
         coords: Optional[Union[CoordsTuple, List[CoordsTuple]]] = None,
         csv_of_coords: Optional[TableInput] = None,
         coords_id_column: Optional[str] = None,
         xy_columns: Optional[Tuple[str, str]] = None,
-        save_table_dir: Optional[Union[str, Path]] = None,
-        save_table_suffix: Optional[str] = None,
-        save_table_prefix: Optional[str] = None,
-    ) -> Dict[str, Union[pd.DataFrame, Path]]:
-        """
-        Returns:
-            A dictionary with variable names as keys, and dataframes as values
-                if save_table_dir==None, or the output table path as values if
-                save_table_dir is not None.
-        """
-        # init output dictionary
-        out_dict = {}
+        points_epsg: Optional[int] = 4326,
+        xy_coords: Optional[Tuple[str, str]] = None,
+        cell_index_cache_dir: Optional[Union[str, Path]] = None,
+        interpolation: Literal['nearest', 'bilinear', 'idw'] = 'nearest',
+        idw_neighbors: int = 4,
+        idw_power: float = 2.0,
+    ) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """Finds the unique nearest grid cells of a set of points.
 
-        # clean variables input
-        variables = utility_functions._verify_variables(
-            xarray_dataset,
-            variables,
-        )
+        See points_to_tables() for the point matching arguments.
 
+        Returns:
+            A tuple with the point IDs [0], unique cell x indices [1] and
+                y indices [2], and the position of each point's cell [3]
+                (or a sparse (point, cell) weight matrix if interpolating).
+        """
         # get x/y columns
         if xy_columns is None:
             xy_columns = ('lon', 'lat')
@@ -64,67 +66,246 @@ class ConvertToTable:
         point_ys = coords_df[y_col].values
         point_ids = [str(i) for i in coords_df.index.values]
 
-        # get dimension names
-        x_dim = xarray_dataset.attrs['x_dim']
-        y_dim = xarray_dataset.attrs['y_dim']
-
-        # get all coordinates from the dataset
-        ds_xs = xarray_dataset[x_dim].values
-        ds_ys = xarray_dataset[y_dim].values
-
-        # get nearest lat/longs for each sample point
-        nearest_x_idxs = np.abs(ds_xs - point_xs.reshape(-1, 1)).argmin(axis=1)
-        nearest_y_idxs = np.abs(ds_ys - point_ys.reshape(-1, 1)).argmin(axis=1)
+        # get the weights of the cells around each sample point
+        if interpolation != 'nearest':
+            weights = get_interpolation_weights(
+                xarray_dataset,
+                point_xs,
+                point_ys,
+                method=interpolation,
+                points_epsg=points_epsg,
+                xy_coords=xy_coords,
+                idw_neighbors=idw_neighbors,
+                idw_power=idw_power,
+                cache_dir=cell_index_cache_dir,
+            )
+            grid_shape = (
+                xarray_dataset.sizes[xarray_dataset.attrs['y_dim']],
+                xarray_dataset.sizes[xarray_dataset.attrs['x_dim']],
+            )
+            cell_x_idxs, cell_y_idxs, point_weights = (
+                utility_functions._get_weighted_cells(weights, grid_shape)
+            )
+            logging.info(
+                f'{len(point_ids)} points are interpolated from '
+                f'{len(cell_x_idxs)} cells ({interpolation})',
+            )
+            return point_ids, cell_x_idxs, cell_y_idxs, point_weights
 
-        # get a dict with point IDs as keys, and nearest x/y indices as values
-        points_nearest_xy_idxs = dict(
-            zip(
-                point_ids,
-                zip(nearest_x_idxs, nearest_y_idxs),
-            ),
+        # get the nearest grid cell of each sample point
+        nearest_x_idxs, nearest_y_idxs = get_nearest_cells(
+            xarray_dataset,
+            point_xs,
+            point_ys,
+            points_epsg=points_epsg,
+            xy_coords=xy_coords,
+            cache_dir=cell_index_cache_dir,
         )
 
-        # get all x/long to y/lat combos
-        combos = list(
-            itertools.product(
-                range(len(xarray_dataset[x_dim].values)),
-                range(len(xarray_dataset[y_dim].values)),
-            ),
+        # read each grid cell once, even if many points share it
+        cell_x_idxs, cell_y_idxs, point_cells = utility_functions._get_unique_cells(
+            nearest_x_idxs,
+            nearest_y_idxs,
+        )
+        logging.info(
+            f'{len(point_ids)} points fall in {len(cell_x_idxs)} unique cells',
         )
+        return point_ids, cell_x_idxs, cell_y_idxs, point_cells
+
+    @staticmethod
+    def points_to_tables(
+        xarray_dataset: xr.Dataset,
+        variables: Optional[List[str]] = None,
+        coords: Optional[Union[CoordsTuple, List[CoordsTuple]]] = None,
+        csv_of_coords: Optional[TableInput] = None,
+        coords_id_column: Optional[str] = None,
+        xy_columns: Optional[Tuple[str, str]] = None,
+        points_epsg: Optional[int] = 4326,
+        xy_coords: Optional[Tuple[str, str]] = None,
+        cell_index_cache_dir: Optional[Union[str, Path]] = None,
+        interpolation: Literal['nearest', 'bilinear', 'idw'] = 'nearest',
+        idw_neighbors: int = 4,
+        idw_power: float = 2.0,
+        save_table_dir: Optional[Union[str, Path]] = None,
+        save_table_suffix: Optional[str] = None,
+        save_table_prefix: Optional[str] = None,
+        parquet_compression: Optional[str] = 'snappy',
+        use_float32: bool = False,
+        partition_by_year: bool = False,
+        time_batch_size: int = 8760,
+    ) -> Dict[str, Union[pd.DataFrame, Path]]:
+        """
+        NOTE: Parquet tables (the default save_table_suffix) are streamed to
+            disk one time batch (row group) at a time.
 
-        # make sure they are in the right order to reshape!
-        combo_dict = dict(zip(combos, range(len(combos))))
+        Arguments:
+            points_epsg: The EPSG of the point coordinates (default is 4326).
+                Points are transformed to the dataset CRS if they differ.
+            xy_coords: The (possibly 2-D) x/y coordinates to match points to.
+                Default is the x/y dimension coordinates.
+            cell_index_cache_dir: If provided, the point -> cell map (or
+                interpolation weights) is cached here and reused across runs.
+            interpolation: nearest (the nearest cell's value), bilinear (the
+                4 surrounding cells), or idw (inverse distance weighting).
+                Interpolation weights are computed once as a sparse matrix
+                and applied to each time batch with one matmul.
+            idw_neighbors: The number of cells weighted by idw.
+            idw_power: The inverse distance power used by idw.
+            parquet_compression: The parquet compression codec.
+            use_float32: If True, parquet values are stored as float32.
+            partition_by_year: If True, parquet tables are saved as a
+                directory with one year=YYYY partition per year.
+            time_batch_size: The number of time steps per parquet row group.
 
-        # get point id to xy combo index
-        id_to_index = {}
-        for pid, coord in points_nearest_xy_idxs.items():
-            id_to_index[pid] = combo_dict[coord]
+        Returns:
+            A dictionary with variable names as keys, and dataframes as values
+                if save_table_dir==None, or the output table path as values if
+                save_table_dir is not None.
+        """
+        # init output dictionary
+        out_dict = {}
 
-        # clear some memory
-        del (
-            nearest_x_idxs,
-            nearest_y_idxs,
-            point_xs,
-            point_ys,
-            combos,
-            combo_dict,
+        # clean variables input
+        variables = utility_functions._verify_variables(
+            xarray_dataset,
+            variables,
         )
 
-        # prep chunks
-        xarray_dataset = xarray_dataset.chunk(
-            {'time': 10000, x_dim: 10, y_dim: 10},
+        # get the unique grid cells the points fall in
+        (
+            point_ids,
+            cell_x_idxs,
+            cell_y_idxs,
+            point_cells,
+        ) = ConvertToTable._get_point_cells(
+            xarray_dataset,
+            coords=coords,
+            csv_of_coords=csv_of_coords,
+            coords_id_column=coords_id_column,
+            xy_columns=xy_columns,
+            points_epsg=points_epsg,
+            xy_coords=xy_coords,
+            cell_index_cache_dir=cell_index_cache_dir,
+            interpolation=interpolation,
+            idw_neighbors=idw_neighbors,
+            idw_power=idw_power,
         )
+        x_dim = xarray_dataset.attrs['x_dim']
+        y_dim = xarray_dataset.attrs['y_dim']
 
         # get data for each variable
         for variable in variables:
-            out_dict[variable] = utility_functions._get_data_table_vectorized(
+            if save_table_dir and save_table_suffix in [None, '.parquet']:
+                out_dict[variable] = utility_functions._write_points_parquet(
+                    xarray_dataset,
+                    variable,
+                    point_ids,
+                    cell_x_idxs,
+                    cell_y_idxs,
+                    xy_dims=(x_dim, y_dim),
+                    save_table_dir=save_table_dir,
+                    point_cells=point_cells,
+                    save_table_prefix=save_table_prefix,
+                    compression=parquet_compression,
+                    use_float32=use_float32,
+                    partition_by_year=partition_by_year,
+                    time_batch_size=time_batch_size,
+                )
+                continue
+
+            out_dict[variable] = utility_functions._get_points_table(
                 xarray_dataset,
                 variable,
                 point_ids,
-                id_to_index,
+                cell_x_idxs,
+                cell_y_idxs,
                 xy_dims=(x_dim, y_dim),
+                point_cells=point_cells,
                 save_table_dir=save_table_dir,
                 save_table_suffix=save_table_suffix,
                 save_table_prefix=save_table_prefix,
             )
         return out_dict
+
+    @staticmethod
+    def points_to_arrow_table(
+        xarray_dataset: xr.Dataset,
+        variables: Optional[List[str]] = None,
+        coords: Optional[Union[CoordsTuple, List[CoordsTuple]]] = None,
+        csv_of_coords: Optional[TableInput] = None,
+        coords_id_column: Optional[str] = None,
+        xy_columns: Optional[Tuple[str, str]] = None,
+        points_epsg: Optional[int] = 4326,
+        xy_coords: Optional[Tuple[str, str]] = None,
+        cell_index_cache_dir: Optional[Union[str, Path]] = None,
+        interpolation: Literal['nearest', 'bilinear', 'idw'] = 'nearest',
+        idw_neighbors: int = 4,
+        idw_power: float = 2.0,
+    ) -> pa.Table:
+        """Extracts point data into one long (tidy) Arrow table.
+
+        Rows are ordered by time, then point. Columns are datetime, a
+        dictionary encoded point_id, and one float32 column per variable.
+        Columns are built from the extracted numpy arrays without copies
+        (apart from the float32 cast).
+
+        NOTE: See points_to_tables() for the point matching arguments
+            (points_epsg through idw_power).
+
+        Returns:
+            A pyarrow Table.
+        """
+        # clean variables input
+        variables = utility_functions._verify_variables(
+            xarray_dataset,
+            variables,
+        )
+
+        # get the unique grid cells the points fall in
+        (
+            point_ids,
+            cell_x_idxs,
+            cell_y_idxs,
+            point_cells,
+        ) = ConvertToTable._get_point_cells(
+            xarray_dataset,
+            coords=coords,
+            csv_of_coords=csv_of_coords,
+            coords_id_column=coords_id_column,
+            xy_columns=xy_columns,
+            points_epsg=points_epsg,
+            xy_coords=xy_coords,
+            cell_index_cache_dir=cell_index_cache_dir,
+            interpolation=interpolation,
+            idw_neighbors=idw_neighbors,
+            idw_power=idw_power,
+        )
+        xy_dims = (
+            xarray_dataset.attrs['x_dim'],
+            xarray_dataset.attrs['y_dim'],
+        )
+        n_points = len(point_ids)
+        times = xarray_dataset.time.values
+        n_times = len(times)
+
+        # the (time, point) arrays flatten to rows ordered by time then point
+        columns = {
+            'datetime': pa.array(np.repeat(times, n_points)),
+            'point_id': pa.DictionaryArray.from_arrays(
+                pa.array(np.tile(np.arange(n_points, dtype='int32'), n_times)),
+                pa.array(point_ids, type=pa.string()),
+            ),
+        }
+        for variable in variables:
+            data = utility_functions._extract_points(
+                xarray_dataset[variable],
+                cell_x_idxs,
+                cell_y_idxs,
+                xy_dims,
+                point_cells=point_cells,
+            )
+            columns[variable] = pa.array(
+                np.ascontiguousarray(data, dtype='float32').reshape(-1),
+            )
+            del data
+        return pa.table(columns)
@@ -462,3 +462,44 @@ MISSING_HOURLY_VARIABLES = [
     'magnitude_of_turbulent_surface_stress',
     'mean_magnitude_of_turbulent_surface_stress',
 ]
+
+
+# NetCDF short names of SINGLE_LEVEL_VARIABLES (used to split multi-variable
+# CDS responses). Variables missing here are always requested on their own.
+CDS_SHORT_NAMES = {
+    '10m_u_component_of_wind': 'u10',
+    '10m_v_component_of_wind': 'v10',
+    '100m_u_component_of_wind': 'u100',
+    '100m_v_component_of_wind': 'v100',
+    '10m_wind_gust_since_previous_post_processing': 'fg10',
+    '2m_dewpoint_temperature': 'd2m',
+    '2m_temperature': 't2m',
+    'boundary_layer_height': 'blh',
+    'convective_precipitation': 'cp',
+    'evaporation': 'e',
+    'high_cloud_cover': 'hcc',
+    'instantaneous_10m_wind_gust': 'i10fg',
+    'large_scale_precipitation': 'lsp',
+    'low_cloud_cover': 'lcc',
+    'maximum_2m_temperature_since_previous_post_processing': 'mx2t',
+    'mean_sea_level_pressure': 'msl',
+    'mean_wave_direction': 'mwd',
+    'mean_wave_period': 'mwp',
+    'medium_cloud_cover': 'mcc',
+    'minimum_2m_temperature_since_previous_post_processing': 'mn2t',
+    'potential_evaporation': 'pev',
+    'runoff': 'ro',
+    'sea_surface_temperature': 'sst',
+    'skin_temperature': 'skt',
+    'snowfall': 'sf',
+    'surface_latent_heat_flux': 'slhf',
+    'surface_net_solar_radiation': 'ssr',
+    'surface_net_thermal_radiation': 'str',
+    'surface_pressure': 'sp',
+    'surface_sensible_heat_flux': 'sshf',
+    'surface_solar_radiation_downwards': 'ssrd',
+    'surface_thermal_radiation_downwards': 'strd',
+    'total_cloud_cover': 'tcc',
+    'total_column_water_vapour': 'tcwv',
+    'total_precipitation': 'tp',
+}
@@ -1,5 +1,6 @@
+import asyncio
 import warnings
-from typing import Tuple, Optional
+from typing import Any, Coroutine, Tuple, Optional
 
 
 class DaskClass:
@@ -111,3 +112,19 @@ def get_multithread(
         as_completed_func = as_completed
 
     return (client, as_completed_func)
+
+
+def run_coroutine(coroutine: Coroutine) -> Any:
+    """Runs a coroutine to completion and returns its result.
+
+    NOTE: If an event loop is already running (i.e., in Jupyter), the
+        coroutine is run in a new loop on a separate thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
@@ -0,0 +1,555 @@
+"""Byte-range reference indexes for (remote) NetCDF4/HDF5 files.
+
+A reference index records the byte offset and size of every HDF5 chunk
+in a file (similar to a kerchunk reference set). With it, a file can be
+opened as a lazy dask-backed dataset where each dask block reads exactly
+one HDF5 chunk via a ranged GET. Cropping or time slicing then only
+transfers the chunks that intersect the selection.
+
+Indexes are plain JSON dictionaries and are persisted with a FileCache.
+
+read_window_async() reads an index window without dask, issuing all ranged
+GETs concurrently on an async fsspec filesystem (i.e., s3fs).
+"""
+import json
+import zlib
+import asyncio
+import logging
+import itertools
+import fsspec
+import h5py
+import dask.array as da
+import xarray as xr
+import numpy as np
+from dask.base import tokenize
+from contextlib import asynccontextmanager
+from fsspec.asyn import AsyncFileSystem
+from fsspec.implementations.asyn_wrapper import AsyncFileSystemWrapper
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypedDict,
+    Union,
+)
+from xarray_data_accessor.caching import FileCache
+
+# HDF5 filter codes that can be decoded
+HDF5_DEFLATE = 1
+HDF5_SHUFFLE = 2
+HDF5_FLETCHER32 = 3
+
+# attributes used internally by HDF5/netCDF4 that are not kept
+_IGNORED_ATTRS = [
+    'CLASS',
+    'NAME',
+    'DIMENSION_LIST',
+    'REFERENCE_LIST',
+    '_Netcdf4Dimid',
+    '_Netcdf4Coordinates',
+    '_nc3_strict',
+]
+
+
+class ChunkReferenceDict(TypedDict):
+    """Location of one stored HDF5 chunk."""
+    chunk_offset: List[int]
+    byte_offset: int
+    size: int
+    filter_mask: int
+
+
+class VariableReferenceDict(TypedDict):
+    """Stores everything needed to read a variable without HDF5 metadata."""
+    dims: List[str]
+    shape: List[int]
+    dtype: str
+    chunks: List[int]
+    filters: List[int]
+    fill_value: Optional[Union[int, float]]
+    attrs: Dict[str, Any]
+    values: Optional[List[Any]]
+    chunk_refs: List[ChunkReferenceDict]
+
+
+class ReferenceIndexDict(TypedDict):
+    """A reference index for one file."""
+    url: str
+    variables: Dict[str, VariableReferenceDict]
+
+
+def _json_safe(value: Any) -> Any:
+    """Converts HDF5 attribute values to JSON serializable types."""
+    if isinstance(value, (bytes, np.bytes_)):
+        return value.decode('utf-8', errors='ignore')
+    if isinstance(value, np.ndarray):
+        if value.size == 1:
+            return _json_safe(value.reshape(-1)[0])
+        return [_json_safe(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _is_phony_dimension(dset: h5py.Dataset) -> bool:
+    """Checks if an HDF5 dataset is a netCDF dimension without values."""
+    name = _json_safe(dset.attrs.get('NAME', ''))
+    return isinstance(name, str) and name.startswith(
+        'This is a netCDF dimension but not a netCDF variable',
+    )
+
+
+def _get_variable_reference(
+    name: str,
+    dset: h5py.Dataset,
+) -> VariableReferenceDict:
+    """Records the chunk layout and attributes of one HDF5 dataset."""
+    # get dimension names from the attached dimension scales
+    dims = []
+    for i, dim in enumerate(dset.dims):
+        if len(dim) > 0:
+            dims.append(dim[0].name.lstrip('/'))
+        elif dset.ndim == 1:
+            dims.append(name)
+        else:
+            dims.append(f'dim_{i}')
+
+    attrs = {
+        k: _json_safe(v) for k, v in dset.attrs.items()
+        if k not in _IGNORED_ATTRS
+    }
+
+    fill_value = _json_safe(dset.fillvalue)
+    if isinstance(fill_value, float) and np.isnan(fill_value):
+        fill_value = None
+
+    var_ref = VariableReferenceDict(
+        dims=dims,
+        shape=list(dset.shape),
+        dtype=dset.dtype.str,
+        chunks=list(dset.chunks or dset.shape),
+        filters=[],
+        fill_value=fill_value,
+        attrs=attrs,
+        values=None,
+        chunk_refs=[],
+    )
+
+    # small 1D variables (coordinates) are stored inline
+    if dset.ndim <= 1:
+        var_ref['values'] = _json_safe(np.atleast_1d(dset[...]))
+        return var_ref
+
+    plist = dset.id.get_create_plist()
+    var_ref['filters'] = [
+        plist.get_filter(i)[0] for i in range(plist.get_nfilters())
+    ]
+
+    if dset.chunks is None:
+        var_ref['chunk_refs'].append(
+            ChunkReferenceDict(
+                chunk_offset=[0] * dset.ndim,
+                byte_offset=int(dset.id.get_offset()),
+                size=int(dset.id.get_storage_size()),
+                filter_mask=0,
+            ),
+        )
+    else:
+        for i in range(dset.id.get_num_chunks()):
+            info = dset.id.get_chunk_info(i)
+            var_ref['chunk_refs'].append(
+                ChunkReferenceDict(
+                    chunk_offset=list(info.chunk_offset),
+                    byte_offset=int(info.byte_offset),
+                    size=int(info.size),
+                    filter_mask=int(info.filter_mask),
+                ),
+            )
+    return var_ref
+
+
+def build_reference_index(
+    url: str,
+    storage_options: Optional[Dict[str, Any]] = None,
+) -> ReferenceIndexDict:
+    """Builds a reference index by reading only the HDF5 metadata of a file.
+
+    Arguments:
+        url: A fsspec compatible url or local path to a NetCDF4/HDF5 file.
+        storage_options: Passed to fsspec.open().
+
+    Returns:
+        The reference index dictionary.
+    """
+    if storage_options is None:
+        storage_options = {}
+
+    logging.info(f'Building reference index for {url}')
+    variables = {}
+    with fsspec.open(url, 'rb', **storage_options) as file:
+        with h5py.File(file, 'r') as h5_file:
+            for name, dset in h5_file.items():
+                if not isinstance(dset, h5py.Dataset):
+                    continue
+                if _is_phony_dimension(dset):
+                    continue
+                variables[name] = _get_variable_reference(name, dset)
+
+    return ReferenceIndexDict(
+        url=str(url),
+        variables=variables,
+    )
+
+
+def get_reference_index(
+    url: str,
+    index_dir: Union[str, Path],
+    storage_options: Optional[Dict[str, Any]] = None,
+) -> ReferenceIndexDict:
+    """Returns a persisted reference index, building it if necessary.
+
+    Arguments:
+        url: A fsspec compatible url or local path to a NetCDF4/HDF5 file.
+        index_dir: The local directory reference indexes are stored in.
+        storage_options: Passed to fsspec.open().
+
+    Returns:
+        The reference index dictionary.
+    """
+    cache = FileCache(index_dir, suffix='.refs')
+    key = cache.make_key({'url': str(url)})
+    path = cache.get(key)
+    if path is not None:
+        with open(path, 'r') as file:
+            return json.load(file)
+
+    reference_index = build_reference_index(
+        url,
+        storage_options=storage_options,
+    )
+    cache.put_bytes(
+        key,
+        json.dumps(reference_index).encode('utf-8'),
+        metadata={'url': str(url)},
+    )
+    return reference_index
+
+
+def _unshuffle(
+    data: bytes,
+    itemsize: int,
+) -> bytes:
+    """Reverses the HDF5 byte shuffle filter."""
+    n_items = len(data) // itemsize
+    shuffled = np.frombuffer(data, dtype=np.uint8, count=n_items * itemsize)
+    unshuffled = shuffled.reshape(itemsize, n_items).T.tobytes()
+    return unshuffled + data[n_items * itemsize:]
+
+
+def _decode_chunk(
+    data: bytes,
+    var_ref: Dict[str, Any],
+    filter_mask: int,
+) -> np.ndarray:
+    """Decodes the raw bytes of one stored chunk into a full chunk array.
+
+    var_ref only needs the dtype, chunks, and filters keys.
+    """
+    dtype = np.dtype(var_ref['dtype'])
+
+    # undo filters in reverse order, skipping those masked for this chunk
+    filters = var_ref['filters']
+    for i in reversed(range(len(filters))):
+        if filter_mask & (1 << i):
+            continue
+        if filters[i] == HDF5_DEFLATE:
+            data = zlib.decompress(data)
+        elif filters[i] == HDF5_SHUFFLE:
+            data = _unshuffle(data, dtype.itemsize)
+        elif filters[i] == HDF5_FLETCHER32:
+            data = data[:-4]
+        else:
+            raise NotImplementedError(
+                f'HDF5 filter {filters[i]} is not supported!',
+            )
+
+    return np.frombuffer(data, dtype=dtype).reshape(var_ref['chunks'])
+
+
+def _get_fill_value(
+    var_ref: VariableReferenceDict,
+) -> Union[int, float]:
+    """Returns the value of unallocated chunks (matching the dtype)."""
+    fill_value = var_ref['attrs'].get('_FillValue', None)
+    if fill_value is None:
+        fill_value = var_ref['fill_value']
+    if fill_value is None:
+        # NaN only exists for floats (integer HDF5 chunks default to 0)
+        if np.dtype(var_ref['dtype']).kind in 'fc':
+            fill_value = np.nan
+        else:
+            fill_value = 0
+    return fill_value
+
+
+def _read_block(
+    url: str,
+    layout: Dict[str, Any],
+    chunk_ref: Optional[ChunkReferenceDict],
+    block_shape: Tuple[int, ...],
+    storage_options: Optional[Dict[str, Any]] = None,
+) -> np.ndarray:
+    """Reads one chunk via a ranged GET and trims it to the block shape.
+
+    Arguments:
+        layout: The variable's dtype, chunks, filters, and fill_value
+            (see _get_dask_array()).
+    """
+    if chunk_ref is None:
+        # unallocated chunks are filled with the fill value
+        return np.full(block_shape, layout['fill_value'], dtype=layout['dtype'])
+
+    if storage_options is None:
+        storage_options = {}
+    fs, path = fsspec.core.url_to_fs(url, **storage_options)
+    start = chunk_ref['byte_offset']
+    data = fs.cat_file(path, start=start, end=start + chunk_ref['size'])
+
+    chunk = _decode_chunk(data, layout, chunk_ref['filter_mask'])
+    return chunk[tuple(slice(0, s) for s in block_shape)]
+
+
+def _get_dask_array(
+    url: str,
+    name: str,
+    var_ref: VariableReferenceDict,
+    storage_options: Optional[Dict[str, Any]] = None,
+) -> da.Array:
+    """Returns a lazy dask array with one block per HDF5 chunk."""
+    shape = var_ref['shape']
+    chunk_shape = var_ref['chunks']
+
+    # get the dask chunks (the last chunk along a dim may be partial)
+    chunks = []
+    for size, chunk_size in zip(shape, chunk_shape):
+        dim_chunks = [chunk_size] * (size // chunk_size)
+        if size % chunk_size:
+            dim_chunks.append(size % chunk_size)
+        chunks.append(tuple(dim_chunks))
+
+    chunk_refs = {
+        tuple(
+            o // c for o, c in zip(ref['chunk_offset'], chunk_shape)
+        ): ref for ref in var_ref['chunk_refs']
+    }
+
+    # tasks only hold their own chunk reference and the (small) layout,
+    # so the graph size is linear in the number of chunks
+    layout = {
+        'dtype': var_ref['dtype'],
+        'chunks': var_ref['chunks'],
+        'filters': var_ref['filters'],
+        'fill_value': _get_fill_value(var_ref),
+    }
+
+    dask_name = f'refs-{name}-' + tokenize(url, name, var_ref['chunk_refs'])
+    graph = {}
+    for block_index in np.ndindex(*[len(c) for c in chunks]):
+        block_shape = tuple(
+            chunks[i][j] for i, j in enumerate(block_index)
+        )
+        graph[(dask_name,) + block_index] = (
+            _read_block,
+            url,
+            layout,
+            chunk_refs.get(block_index, None),
+            block_shape,
+            storage_options,
+        )
+
+    return da.Array(
+        graph,
+        dask_name,
+        chunks=tuple(chunks),
+        dtype=np.dtype(var_ref['dtype']),
+    )
+
+
+def open_reference_dataset(
+    reference_index: ReferenceIndexDict,
+    variables: Optional[List[str]] = None,
+    storage_options: Optional[Dict[str, Any]] = None,
+) -> xr.Dataset:
+    """Lazily opens a file from its reference index.
+
+    Data is only read (chunk by chunk) once the dataset is computed.
+    Coordinates are stored inline in the index and need no reads.
+
+    Arguments:
+        reference_index: A reference index from get_reference_index().
+        variables: The data variables to include (default is all).
+        storage_options: Passed to the fsspec filesystem.
+
+    Returns:
+        A lazy, CF decoded xarray dataset.
+    """
+    url = reference_index['url']
+    data_vars = {}
+    coords = {}
+    for name, var_ref in reference_index['variables'].items():
+        if var_ref['values'] is not None:
+            values = np.array(
+                var_ref['values'],
+                dtype=var_ref['dtype'],
+            ).reshape(var_ref['shape'])
+            variable = xr.Variable(var_ref['dims'], values, var_ref['attrs'])
+            if var_ref['dims'] == [name]:
+                coords[name] = variable
+            else:
+                data_vars[name] = variable
+            continue
+
+        if variables is not None and name not in variables:
+            continue
+
+        data = _get_dask_array(
+            url,
+            name,
+            var_ref,
+            storage_options=storage_options,
+        )
+        data_vars[name] = xr.Variable(
+            var_ref['dims'],
+            data,
+            var_ref['attrs'],
+        )
+
+    return xr.decode_cf(
+        xr.Dataset(data_vars=data_vars, coords=coords),
+    )
+
+
+@asynccontextmanager
+async def open_async_filesystem(
+    url: str,
+    storage_options: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[AsyncFileSystem]:
+    """Opens an async fsspec filesystem for a url within the running loop.
+
+    Filesystems without a native async implementation (i.e., local files)
+    are wrapped so their blocking calls run in threads.
+    """
+    if storage_options is None:
+        storage_options = {}
+
+    protocol = fsspec.core.split_protocol(url)[0] or 'file'
+    fs_class = fsspec.get_filesystem_class(protocol)
+    session = None
+    if fs_class.async_impl:
+        fs = fs_class(
+            asynchronous=True,
+            skip_instance_cache=True,
+            **storage_options,
+        )
+        # s3fs clients must be created inside the running event loop
+        if hasattr(fs, 'set_session'):
+            session = await fs.set_session()
+    else:
+        fs = AsyncFileSystemWrapper(fs_class(**storage_options))
+    try:
+        yield fs
+    finally:
+        if session is not None:
+            await session.close()
+
+
+async def read_window_async(
+    reference_index: ReferenceIndexDict,
+    name: str,
+    window: Dict[str, slice],
+    fs: AsyncFileSystem,
+    semaphore: asyncio.Semaphore,
+) -> np.ndarray:
+    """Reads a window of a variable with concurrent ranged GETs.
+
+    Only chunks intersecting the window are fetched. Decoding runs in
+    threads so it overlaps with outstanding requests.
+
+    Arguments:
+        reference_index: A reference index from get_reference_index().
+        name: The variable to read.
+        window: Slices (step 1) to read along each dimension (default is
+            the full dimension).
+        fs: An async filesystem from open_async_filesystem().
+        semaphore: Bounds the number of requests in flight.
+
+    Returns:
+        The (undecoded) window as a numpy array.
+    """
+    var_ref = reference_index['variables'][name]
+    chunk_shape = var_ref['chunks']
+    path = fs._strip_protocol(reference_index['url'])
+
+    # get the window bounds and the chunk ranges it intersects
+    bounds = []
+    for dim, size in zip(var_ref['dims'], var_ref['shape']):
+        start, stop, _ = window.get(dim, slice(None)).indices(size)
+        bounds.append((start, stop))
+    block_ranges = [
+        range(start // c, (stop - 1) // c + 1) if stop > start else range(0)
+        for (start, stop), c in zip(bounds, chunk_shape)
+    ]
+
+    chunk_refs = {
+        tuple(
+            o // c for o, c in zip(ref['chunk_offset'], chunk_shape)
+        ): ref for ref in var_ref['chunk_refs']
+    }
+    out_array = np.empty(
+        [stop - start for start, stop in bounds],
+        dtype=var_ref['dtype'],
+    )
+
+    async def read_block(block_index: Tuple[int, ...]) -> None:
+        chunk_ref = chunk_refs.get(block_index, None)
+        origins = [i * c for i, c in zip(block_index, chunk_shape)]
+        if chunk_ref is None:
+            chunk = _read_block(
+                reference_index['url'],
+                var_ref,
+                None,
+                tuple(chunk_shape),
+            )
+        else:
+            start = chunk_ref['byte_offset']
+            async with semaphore:
+                data = await fs._cat_file(
+                    path,
+                    start=start,
+                    end=start + chunk_ref['size'],
+                )
+            chunk = await asyncio.to_thread(
+                _decode_chunk,
+                data,
+                var_ref,
+                chunk_ref['filter_mask'],
+            )
+
+        # copy the intersection of the chunk and the window
+        src_slices = []
+        dst_slices = []
+        for origin, c, (start, stop) in zip(origins, chunk_shape, bounds):
+            lower = max(origin, start)
+            upper = min(origin + c, stop)
+            src_slices.append(slice(lower - origin, upper - origin))
+            dst_slices.append(slice(lower - start, upper - start))
+        out_array[tuple(dst_slices)] = chunk[tuple(src_slices)]
+
+    await asyncio.gather(
+        *[read_block(b) for b in itertools.product(*block_ranges)],
+    )
+    return out_array
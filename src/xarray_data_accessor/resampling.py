@@ -0,0 +1,812 @@
+"""Chunked (out-of-core) spatial resampling of gridded datasets.
+
+The destination grid and transform are computed once. Then each block of
+time steps is read, reprojected with rasterio, and written into its slice of
+the output (an in-memory array, or a Zarr store) independently. Only a few
+blocks per worker thread are held in memory at a time, so large cubes can be
+refined without materializing the whole source or a dask graph of it.
+
+For grids that are resampled repeatedly, a Regridder stores the mapping as a
+sparse (destination cell, source cell) weight matrix that is built once per
+grid pair (and cached on disk), so each time block only costs a matmul.
+
+Integer refinement/coarsening factors have dedicated fast paths that work
+lazily on (dask) arrays without any CRS or transform handling.
+"""
+import io
+import os
+import logging
+import xarray as xr
+import numpy as np
+import pandas as pd
+import rasterio.warp
+import scipy.sparse
+from affine import Affine
+from rasterio.enums import Resampling
+from rioxarray.rioxarray import affine_to_coords
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    wait,
+)
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
+from xarray_data_accessor.caching import get_or_build_sparse
+from xarray_data_accessor.multi_threading import get_multithread
+from xarray_data_accessor.spatial_index import (
+    _get_axis_weights,
+    _hash_arrays,
+)
+from xarray_data_accessor.data_accessors.assembly import DatasetAssembler
+
+# mean earth radius (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+
+def get_destination_grid(
+    xarray_dataset: xr.Dataset,
+    width: int,
+    height: int,
+) -> Tuple[Affine, Affine, Dict[str, np.ndarray]]:
+    """Computes the destination grid of a resampling (matching rioxarray).
+
+    Arguments:
+        xarray_dataset: A dataset with x/y dimensions and a rio CRS.
+        width: The destination width (# of x cells).
+        height: The destination height (# of y cells).
+
+    Returns:
+        A tuple with the source transform [0], destination transform [1],
+            and the destination x/y coordinates [2].
+    """
+    crs = xarray_dataset.rio.crs
+    src_height, src_width = xarray_dataset.rio.shape
+    dst_transform, width, height = rasterio.warp.calculate_default_transform(
+        crs,
+        crs,
+        src_width,
+        src_height,
+        *xarray_dataset.rio.bounds(),
+        dst_width=width,
+        dst_height=height,
+    )
+    return (
+        xarray_dataset.rio.transform(),
+        dst_transform,
+        affine_to_coords(dst_transform, width, height),
+    )
+
+
+def _get_integer_nodata(
+    dtype: np.dtype,
+    nodata: Optional[float] = None,
+) -> int:
+    """Returns the nodata value of an integer array (a dtype extreme if None)."""
+    if nodata is not None and not np.isnan(nodata):
+        return nodata
+    info = np.iinfo(dtype)
+    return info.min if info.min < 0 else info.max
+
+
+def _reproject_block(
+    values: np.ndarray,
+    src_transform: Affine,
+    dst_transform: Affine,
+    crs: object,
+    dst_shape: Tuple[int, int],
+    resampling: Resampling,
+    src_nodata: Optional[float] = None,
+) -> np.ndarray:
+    """Reprojects a (..., y, x) array onto the destination grid.
+
+    Float arrays use NaN as nodata. Integer arrays (i.e., masks or land use
+    codes) keep their dtype and use their nodata value (see
+    _get_integer_nodata()).
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        dtype = values.dtype
+        dst_nodata = _get_integer_nodata(dtype, src_nodata)
+    else:
+        dtype = np.promote_types(values.dtype, np.float32)
+        dst_nodata = np.nan
+    destination = np.full(
+        values.shape[:-2] + tuple(dst_shape),
+        dst_nodata,
+        dtype=dtype,
+    )
+    rasterio.warp.reproject(
+        source=values.astype(dtype, copy=False),
+        destination=destination,
+        src_transform=src_transform,
+        src_crs=crs,
+        src_nodata=src_nodata,
+        dst_transform=dst_transform,
+        dst_crs=crs,
+        dst_nodata=dst_nodata,
+        resampling=resampling,
+    )
+    return destination
+
+
+def _resample_time_blocks(
+    xarray_dataset: xr.Dataset,
+    dst_coords: Dict[str, np.ndarray],
+    block_function: Callable[[np.ndarray, Optional[float]], np.ndarray],
+    time_block_size: int = 24,
+    max_workers: Optional[int] = None,
+    zarr_store: Optional[str] = None,
+) -> xr.Dataset:
+    """Applies a (..., y, x) -> (..., dst y, dst x) function per time block.
+
+    Arguments:
+        xarray_dataset: A dataset with time/x/y dimensions.
+        dst_coords: The destination x/y coordinates.
+        block_function: Maps an array and its nodata value to the
+            destination grid.
+        time_block_size/max_workers/zarr_store: See chunked_spatial_resample().
+
+    Returns:
+        The resampled dataset (with x/y dimensions).
+    """
+    # only (time, y, x) variables are blocked, static grids are done at once
+    spatial_vars = [
+        v for v in xarray_dataset.data_vars
+        if {'x', 'y'}.issubset(xarray_dataset[v].dims)
+    ]
+    time_vars = [v for v in spatial_vars if 'time' in xarray_dataset[v].dims]
+    static_vars = [v for v in spatial_vars if v not in time_vars]
+
+    def get_attrs(
+        data_array: xr.DataArray,
+        values: np.ndarray,
+    ) -> dict:
+        # integer outputs record their nodata value
+        attrs = dict(data_array.attrs)
+        if np.issubdtype(values.dtype, np.integer):
+            attrs['_FillValue'] = _get_integer_nodata(
+                values.dtype,
+                data_array.rio.nodata,
+            )
+        return attrs
+
+    def resample_block(
+        variable: str,
+        time_slice: slice,
+    ) -> Tuple[str, xr.Dataset]:
+        data_array = xarray_dataset[variable].isel(time=time_slice)
+        data_array = data_array.transpose('time', 'y', 'x')
+        values = block_function(data_array.values, data_array.rio.nodata)
+        block_ds = xr.Dataset(
+            {
+                variable: (
+                    ('time', 'y', 'x'),
+                    values,
+                    get_attrs(data_array, values),
+                ),
+            },
+            coords={
+                'time': data_array.time.values,
+                'y': dst_coords['y'],
+                'x': dst_coords['x'],
+            },
+        )
+        return variable, block_ds
+
+    times = pd.DatetimeIndex(xarray_dataset.time.values)
+    assembler = DatasetAssembler(
+        times,
+        y_dim='y',
+        x_dim='x',
+        zarr_store=zarr_store,
+        keep_integer_dtypes=True,
+    )
+    tasks: List[Tuple[str, slice]] = [
+        (variable, slice(i, i + time_block_size))
+        for variable in time_vars
+        for i in range(0, len(times), time_block_size)
+    ]
+    logging.info(
+        f'Resampling {len(tasks)} time blocks to '
+        f'height={len(dst_coords["y"])}, width={len(dst_coords["x"])}',
+    )
+
+    # keep a bounded number of blocks in flight
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+    executor, _ = get_multithread(
+        use_dask=False,
+        n_workers=max_workers,
+        processes=False,
+    )
+    max_pending = 2 * max_workers
+    pending = set()
+    try:
+        for variable, time_slice in tasks:
+            pending.add(executor.submit(resample_block, variable, time_slice))
+            if len(pending) < max_pending:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                assembler.add(*future.result())
+        for future in wait(pending).done:
+            assembler.add(*future.result())
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    out_datasets = [assembler.get_dataset(v) for v in assembler.variables]
+    for variable in static_vars:
+        data_array = xarray_dataset[variable].transpose(..., 'y', 'x')
+        values = block_function(data_array.values, data_array.rio.nodata)
+        out_datasets.append(
+            xr.Dataset(
+                {
+                    variable: (
+                        data_array.dims,
+                        values,
+                        get_attrs(data_array, values),
+                    ),
+                },
+                coords={'y': dst_coords['y'], 'x': dst_coords['x']},
+            ),
+        )
+
+    out_ds = xr.merge(out_datasets, combine_attrs='override')
+    out_ds.attrs = xarray_dataset.attrs
+    return out_ds.rio.write_crs(xarray_dataset.rio.crs)
+
+
+def chunked_spatial_resample(
+    xarray_dataset: xr.Dataset,
+    width: int,
+    height: int,
+    resample_method: str = 'bilinear',
+    time_block_size: int = 24,
+    max_workers: Optional[int] = None,
+    zarr_store: Optional[str] = None,
+) -> xr.Dataset:
+    """Resamples a dataset with x/y dimensions one time block at a time.
+
+    Arguments:
+        xarray_dataset: A dataset with time/x/y dimensions and a rio CRS.
+        width: The destination width (# of x cells).
+        height: The destination height (# of y cells).
+        resample_method: A valid rasterio.enums.Resampling method name.
+        time_block_size: The number of time steps reprojected per task.
+        max_workers: The number of threads (default matches
+            concurrent.futures). At most 2 blocks per thread are in memory.
+        zarr_store: If provided, outputs are written to regions of a Zarr
+            store at this path, and the returned dataset is lazy.
+
+    Returns:
+        The resampled dataset (with x/y dimensions).
+    """
+    crs = xarray_dataset.rio.crs
+    resampling = getattr(Resampling, resample_method)
+    src_transform, dst_transform, dst_coords = get_destination_grid(
+        xarray_dataset,
+        width,
+        height,
+    )
+    dst_shape = (len(dst_coords['y']), len(dst_coords['x']))
+
+    def reproject(
+        values: np.ndarray,
+        nodata: Optional[float],
+    ) -> np.ndarray:
+        return _reproject_block(
+            values,
+            src_transform,
+            dst_transform,
+            crs,
+            dst_shape,
+            resampling,
+            src_nodata=nodata,
+        )
+
+    return _resample_time_blocks(
+        xarray_dataset,
+        dst_coords,
+        reproject,
+        time_block_size=time_block_size,
+        max_workers=max_workers,
+        zarr_store=zarr_store,
+    )
+
+
+def _get_cell_bounds(centers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the lower and upper edge of each cell of a 1-D axis.
+
+    Edges are placed halfway between cell centers (and extrapolated by half
+    a cell at both ends). Axes can be ascending or descending.
+    """
+    centers = np.asarray(centers, dtype='float64')
+    if len(centers) < 2:
+        raise ValueError('Cell bounds require at least 2 cells per axis!')
+    order = np.argsort(centers, kind='stable')
+    sorted_centers = centers[order]
+    mids = (sorted_centers[1:] + sorted_centers[:-1]) / 2
+    edges = np.concatenate(
+        [
+            [2 * sorted_centers[0] - mids[0]],
+            mids,
+            [2 * sorted_centers[-1] - mids[-1]],
+        ],
+    )
+    lower = np.empty_like(centers)
+    upper = np.empty_like(centers)
+    lower[order] = edges[:-1]
+    upper[order] = edges[1:]
+    return lower, upper
+
+
+def _sin_latitude(latitudes: np.ndarray) -> np.ndarray:
+    """Returns sin(latitude), which is proportional to the area south of it."""
+    return np.sin(np.radians(np.clip(latitudes, -90, 90)))
+
+
+def get_cell_areas(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    spherical: bool = False,
+) -> np.ndarray:
+    """Returns the (y, x) cell areas of a rectilinear grid.
+
+    Arguments:
+        xs: The x cell centers (longitudes if spherical).
+        ys: The y cell centers (latitudes if spherical).
+        spherical: If True, exact areas on a sphere are returned in km^2.
+            Otherwise areas are in squared coordinate units.
+
+    Returns:
+        A 2-D array of cell areas.
+    """
+    x_lower, x_upper = _get_cell_bounds(xs)
+    y_lower, y_upper = _get_cell_bounds(ys)
+    widths = np.abs(x_upper - x_lower)
+    heights = np.abs(y_upper - y_lower)
+    if spherical:
+        # the area of a lat/lon cell is R^2 * d(lon) * d(sin(lat))
+        widths = np.radians(widths) * EARTH_RADIUS_KM
+        heights = np.abs(
+            _sin_latitude(y_upper) - _sin_latitude(y_lower),
+        ) * EARTH_RADIUS_KM
+    return np.outer(heights, widths)
+
+
+def _get_axis_matrix(
+    src_centers: np.ndarray,
+    dst_centers: np.ndarray,
+    method: str,
+    measure: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+) -> scipy.sparse.csr_matrix:
+    """Returns sparse (destination, source) weights along one axis.
+
+    For conservative weights, measure maps cell edges to a monotonic
+    coordinate in which overlaps are measured (i.e., sin(latitude) for exact
+    areas on a sphere). By default overlaps are measured in axis units.
+    """
+    n_src = len(src_centers)
+    n_dst = len(dst_centers)
+    dst_centers = np.asarray(dst_centers, dtype='float64')
+
+    if method == 'nearest':
+        lower, upper, fraction = _get_axis_weights(src_centers, dst_centers)
+        cols = np.where(fraction > 0.5, upper, lower)
+        rows = np.arange(n_dst)
+        weights = np.ones(n_dst)
+    elif method == 'bilinear':
+        lower, upper, fraction = _get_axis_weights(src_centers, dst_centers)
+        rows = np.repeat(np.arange(n_dst), 2)
+        cols = np.stack([lower, upper], axis=1).reshape(-1)
+        weights = np.stack([1 - fraction, fraction], axis=1).reshape(-1)
+    elif method == 'conservative':
+        src_lower, src_upper = _get_cell_bounds(src_centers)
+        dst_lower, dst_upper = _get_cell_bounds(dst_centers)
+        if measure is not None:
+            src_lower, src_upper, dst_lower, dst_upper = [
+                measure(edges)
+                for edges in (src_lower, src_upper, dst_lower, dst_upper)
+            ]
+
+        # find the run of (sorted) source cells overlapping each destination
+        order = np.argsort(src_lower, kind='stable')
+        src_lower = src_lower[order]
+        src_upper = src_upper[order]
+        first = np.searchsorted(src_upper, dst_lower, side='right')
+        last = np.searchsorted(src_lower, dst_upper, side='left')
+        counts = np.maximum(last - first, 0)
+        rows = np.repeat(np.arange(n_dst), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts,
+            counts,
+        )
+        sorted_cols = np.repeat(first, counts) + offsets
+
+        # weights are the fraction of each destination cell overlapped
+        overlap = (
+            np.minimum(dst_upper[rows], src_upper[sorted_cols])
+            - np.maximum(dst_lower[rows], src_lower[sorted_cols])
+        )
+        weights = overlap / (dst_upper - dst_lower)[rows]
+        cols = order[sorted_cols]
+    else:
+        raise ValueError(
+            f'Regridding method={method} is invalid! '
+            f'Choose from {list(Regridder.methods)}.',
+        )
+
+    matrix = scipy.sparse.csr_matrix(
+        (weights, (rows, cols)),
+        shape=(n_dst, n_src),
+    )
+    matrix.eliminate_zeros()
+    return matrix
+
+
+class Regridder:
+    """Regrids (..., y, x) arrays with a sparse weight matrix.
+
+    The (destination cell, source cell) weight matrix is built once per
+    (source grid, destination grid, method) and optionally cached on disk.
+    Cells are flattened in (y, x) order. Rectilinear grids are separable, so
+    the matrix is the Kronecker product of one matrix per axis.
+
+    NOTE: conservative weights are the fraction of each destination cell's
+        area covered by each source cell. With spherical=True (lat/lon grids)
+        these are exact areas on the sphere, so area weighted totals (i.e.,
+        of accumulated precipitation) are conserved. Otherwise areas are
+        measured in coordinate units.
+    """
+    methods = ('nearest', 'bilinear', 'conservative')
+
+    def __init__(
+        self,
+        src_xs: np.ndarray,
+        src_ys: np.ndarray,
+        dst_xs: np.ndarray,
+        dst_ys: np.ndarray,
+        method: Literal['nearest', 'bilinear', 'conservative'] = 'bilinear',
+        cache_dir: Optional[Union[str, Path]] = None,
+        spherical: bool = False,
+    ) -> None:
+        """Initializes the regridder (building or loading its weights).
+
+        Arguments:
+            src_xs: The source x cell centers.
+            src_ys: The source y cell centers.
+            dst_xs: The destination x cell centers.
+            dst_ys: The destination y cell centers.
+            method: nearest, bilinear, or conservative (area weighted).
+            cache_dir: If provided, weights are cached here by grid hash.
+            spherical: If True, x/y are longitude/latitude and conservative
+                overlaps are measured as areas on the sphere.
+        """
+        if method not in self.methods:
+            raise ValueError(
+                f'Regridding method={method} is invalid! '
+                f'Choose from {list(self.methods)}.',
+            )
+        self.method = method
+        self.spherical = spherical
+        self.src_shape = (len(src_ys), len(src_xs))
+        self.dst_shape = (len(dst_ys), len(dst_xs))
+        self.dst_coords = {'x': np.asarray(dst_xs), 'y': np.asarray(dst_ys)}
+        self.grid_hash = _hash_arrays(src_xs, src_ys, dst_xs, dst_ys)
+
+        def build_weights() -> scipy.sparse.csr_matrix:
+            logging.info(
+                f'Building {method} regridding weights: '
+                f'{self.src_shape} -> {self.dst_shape}',
+            )
+            return self._build_weights(
+                src_xs,
+                src_ys,
+                dst_xs,
+                dst_ys,
+            )
+
+        self.weights = get_or_build_sparse(
+            cache_dir,
+            {
+                'grid': self.grid_hash,
+                'method': method,
+                'spherical': spherical,
+            },
+            build_weights,
+            metadata={
+                'method': method,
+                'src_shape': self.src_shape,
+                'dst_shape': self.dst_shape,
+            },
+        )
+        self._row_sums = self._get_row_sums()
+
+    def _build_weights(
+        self,
+        src_xs: np.ndarray,
+        src_ys: np.ndarray,
+        dst_xs: np.ndarray,
+        dst_ys: np.ndarray,
+    ) -> scipy.sparse.csr_matrix:
+        """Builds the (destination cell, source cell) weight matrix."""
+        y_matrix = _get_axis_matrix(
+            src_ys,
+            dst_ys,
+            self.method,
+            measure=_sin_latitude if self.spherical else None,
+        )
+        x_matrix = _get_axis_matrix(src_xs, dst_xs, self.method)
+        return scipy.sparse.kron(y_matrix, x_matrix, format='csr')
+
+    def _get_row_sums(self) -> np.ndarray:
+        """Returns the total weight of each destination cell (as a column)."""
+        return np.asarray(self.weights.sum(axis=1)).reshape(-1, 1)
+
+    @classmethod
+    def from_dataset(
+        cls,
+        xarray_dataset: xr.Dataset,
+        width: int,
+        height: int,
+        method: Literal['nearest', 'bilinear', 'conservative'] = 'bilinear',
+        cache_dir: Optional[Union[str, Path]] = None,
+    ) -> 'Regridder':
+        """Returns a regridder onto a width x height version of a grid.
+
+        NOTE: The destination grid matches spatial_resample() outputs, and
+            conservative overlaps of geographic grids are spherical areas.
+        """
+        _, _, dst_coords = get_destination_grid(
+            xarray_dataset,
+            width,
+            height,
+        )
+        return cls(
+            xarray_dataset.x.values,
+            xarray_dataset.y.values,
+            dst_coords['x'],
+            dst_coords['y'],
+            method=method,
+            cache_dir=cache_dir,
+            spherical=bool(
+                xarray_dataset.rio.crs and xarray_dataset.rio.crs.is_geographic
+            ),
+        )
+
+    def regrid_array(
+        self,
+        values: np.ndarray,
+        nodata: Optional[float] = None,
+    ) -> np.ndarray:
+        """Regrids a (..., y, x) array with one sparse matmul.
+
+        Missing (NaN or nodata) source cells are excluded, and the remaining
+        weights of each destination cell are renormalized. Destination cells
+        without any source weight are NaN.
+        """
+        values = np.asarray(values)
+        lead_shape = values.shape[:-2]
+        dtype = np.promote_types(values.dtype, np.float32)
+
+        # regrid a (cells, time) view so all time steps share one matmul
+        flat = values.reshape(-1, self.src_shape[0] * self.src_shape[1]).T
+        valid = np.isfinite(flat)
+        if nodata is not None and not np.isnan(nodata):
+            valid &= flat != nodata
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if valid.all():
+                out = (self.weights @ flat) / self._row_sums
+            else:
+                out = (
+                    (self.weights @ np.where(valid, flat, 0))
+                    / (self.weights @ valid.astype(dtype))
+                )
+        return np.asarray(out, dtype=dtype).T.reshape(
+            lead_shape + self.dst_shape,
+        )
+
+    def regrid(
+        self,
+        xarray_dataset: xr.Dataset,
+        time_block_size: int = 24,
+        max_workers: Optional[int] = None,
+        zarr_store: Optional[str] = None,
+    ) -> xr.Dataset:
+        """Regrids a dataset with x/y dimensions one time block at a time.
+
+        Arguments:
+            xarray_dataset: A dataset with time/x/y dimensions on the
+                source grid.
+            time_block_size/max_workers/zarr_store: See
+                chunked_spatial_resample().
+
+        Returns:
+            The regridded dataset (with x/y dimensions).
+        """
+        return _resample_time_blocks(
+            xarray_dataset,
+            self.dst_coords,
+            self.regrid_array,
+            time_block_size=time_block_size,
+            max_workers=max_workers,
+            zarr_store=zarr_store,
+        )
+
+
+# methods with an integer factor fast path (refine / coarsen)
+REFINE_METHODS = ('nearest', 'bilinear', 'average', 'conservative')
+COARSEN_METHODS = {
+    'average': 'mean',
+    'sum': 'sum',
+    'min': 'min',
+    'max': 'max',
+    'med': 'median',
+}
+
+
+def _get_integer_factor(factor: Union[int, float]) -> Optional[int]:
+    """Returns a signed integer factor (negative to coarsen), or None."""
+    if factor >= 1 and np.isclose(factor, round(factor)):
+        return int(round(factor))
+    if 0 < factor < 1 and np.isclose(1 / factor, round(1 / factor)):
+        return -int(round(1 / factor))
+    return None
+
+
+def _get_refined_centers(
+    centers: np.ndarray,
+    factor: int,
+) -> np.ndarray:
+    """Splits each cell of a 1-D axis into factor equal sub-cells."""
+    lower, upper = _get_cell_bounds(centers)
+    step = ((upper - lower) / factor)[:, None]
+    offsets = (np.arange(factor) + 0.5)[None, :]
+
+    # sub-cells run in the direction of the axis
+    if centers[-1] < centers[0]:
+        return (upper[:, None] - step * offsets).reshape(-1)
+    return (lower[:, None] + step * offsets).reshape(-1)
+
+
+def _apply_axis_matrix(
+    values: np.ndarray,
+    matrix: scipy.sparse.csr_matrix,
+) -> np.ndarray:
+    """Applies (destination, source) weights along the last axis."""
+    lead_shape = values.shape[:-1]
+    flat = values.reshape(-1, values.shape[-1])
+    out = np.asarray((matrix @ flat.T).T)
+    return out.reshape(lead_shape + (matrix.shape[0],))
+
+
+def _refine_axis(
+    xarray_dataset: xr.Dataset,
+    dim: str,
+    factor: int,
+    method: str,
+) -> xr.Dataset:
+    """Refines one dimension by an integer factor (lazily)."""
+    centers = xarray_dataset[dim].values
+    new_centers = _get_refined_centers(centers, factor)
+    new_coord = xr.DataArray(
+        new_centers,
+        dims=dim,
+        attrs=xarray_dataset[dim].attrs,
+    )
+
+    # each sub-cell takes its parent cell's value (a gather, no arithmetic)
+    if method != 'bilinear':
+        return xarray_dataset.isel(
+            {dim: np.repeat(np.arange(len(centers)), factor)},
+        ).assign_coords({dim: new_coord})
+
+    # separable 1-D linear interpolation between cell centers
+    matrix = _get_axis_matrix(centers, new_centers, 'bilinear')
+    out_vars = {}
+    for variable, data_array in xarray_dataset.data_vars.items():
+        if dim not in data_array.dims:
+            out_vars[variable] = data_array
+            continue
+        if data_array.chunks is not None:
+            data_array = data_array.chunk({dim: -1})
+        out_vars[variable] = xr.apply_ufunc(
+            _apply_axis_matrix,
+            data_array,
+            input_core_dims=[[dim]],
+            output_core_dims=[[dim]],
+            exclude_dims={dim},
+            kwargs={'matrix': matrix},
+            dask='parallelized',
+            output_dtypes=[np.promote_types(data_array.dtype, np.float32)],
+            dask_gufunc_kwargs={'output_sizes': {dim: len(new_centers)}},
+            keep_attrs=True,
+        ).transpose(*data_array.dims)
+    return xr.Dataset(
+        out_vars,
+        coords={
+            k: v for k, v in xarray_dataset.coords.items()
+            if dim not in v.dims
+        },
+        attrs=xarray_dataset.attrs,
+    ).assign_coords({dim: new_coord})
+
+
+def integer_factor_resample(
+    xarray_dataset: xr.Dataset,
+    xy_resolution_factors: Tuple[Union[int, float], Union[int, float]],
+    resample_method: str,
+) -> Optional[xr.Dataset]:
+    """Resamples by integer refinement/coarsening factors (lazily).
+
+    Refinement uses np.repeat style gathers (nearest, average, conservative)
+    or separable 1-D linear interpolation (bilinear). Coarsening (factors of
+    1/N) uses xarray block reductions (i.e., coarsen().mean()). Dask backed
+    datasets stay lazy, and no CRS or transform is needed.
+
+    Arguments:
+        xarray_dataset: A dataset with x_dim/y_dim attributes.
+        xy_resolution_factors: The x and y resolution factors.
+        resample_method: A spatial_resample() method.
+
+    Returns:
+        The resampled dataset, or None if there is no fast path for these
+            factors and method.
+    """
+    factors = [_get_integer_factor(f) for f in xy_resolution_factors]
+    if any(f is None for f in factors):
+        return None
+    refine = {
+        dim: f for dim, f in zip(
+            (xarray_dataset.attrs['x_dim'], xarray_dataset.attrs['y_dim']),
+            factors,
+        ) if f > 1
+    }
+    coarsen = {
+        dim: -f for dim, f in zip(
+            (xarray_dataset.attrs['x_dim'], xarray_dataset.attrs['y_dim']),
+            factors,
+        ) if f < -1
+    }
+    if refine and resample_method not in REFINE_METHODS:
+        return None
+    if coarsen and resample_method not in COARSEN_METHODS:
+        return None
+
+    # cell bounds need at least 2 source and destination cells per axis
+    if any(xarray_dataset.sizes[dim] < 2 for dim in refine):
+        return None
+    if any(xarray_dataset.sizes[dim] // f < 2 for dim, f in coarsen.items()):
+        return None
+
+    logging.info(
+        f'Using the integer factor fast path: refine={refine}, '
+        f'coarsen={coarsen}, method={resample_method}',
+    )
+    attrs = xarray_dataset.attrs
+    for dim, factor in refine.items():
+        xarray_dataset = _refine_axis(
+            xarray_dataset,
+            dim,
+            factor,
+            resample_method,
+        )
+    if coarsen:
+        coarsened = xarray_dataset.coarsen(
+            coarsen,
+            boundary='trim',
+            coord_func='mean',
+        )
+        xarray_dataset = getattr(
+            coarsened,
+            COARSEN_METHODS[resample_method],
+        )(keep_attrs=True)
+    xarray_dataset.attrs = attrs
+    return xarray_dataset
@@ -0,0 +1,170 @@
+"""Long-lived sessions that keep data access resources warm across calls.
+
+A DataAccessSession owns the data accessor instances (and with them their
+CDS API client / HTTP sessions), the executors used for multithreading, and
+the on-disk caches. Normally each get_xarray_dataset() call rebuilds all of
+these, which can take longer than the data access itself for small requests.
+
+Example:
+    with DataAccessSession() as session:
+        for start, end in windows:
+            ds = session.get_xarray_dataset(
+                'AWSDataAccessor',
+                'reanalysis-era5-single-levels',
+                '2m_temperature',
+                start_time=start,
+                end_time=end,
+                coordinates=(42.0, -83.0),
+            )
+"""
+import copy
+import logging
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+    Union,
+)
+import xarray as xr
+from xarray_data_accessor.caching import FileCache
+from xarray_data_accessor.multi_threading import get_multithread
+from xarray_data_accessor.data_accessors.base import DataAccessorBase
+from xarray_data_accessor.data_accessors.factory import DataAccessorFactory
+
+
+class DataAccessSession:
+    """Owns executors, data accessors, and caches across many requests.
+
+    NOTE: A session is meant to be used by one thread at a time.
+    NOTE: Accessor kwargs are reset to their defaults before every request,
+        while clients, HTTP sessions, and caches are kept.
+    """
+
+    def __init__(self) -> None:
+        self._accessors: Dict[str, DataAccessorBase] = {}
+        self._accessor_defaults: Dict[str, Dict[str, Any]] = {}
+        self._executors: Dict[Tuple, Tuple[object, Callable]] = {}
+        self._caches: Dict[Tuple, FileCache] = {}
+        self.closed = False
+
+    def __enter__(self) -> 'DataAccessSession':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _check_open(self) -> None:
+        if self.closed:
+            raise RuntimeError('This DataAccessSession has been closed!')
+
+    def get_data_accessor(
+        self,
+        data_accessor_name: str,
+    ) -> DataAccessorBase:
+        """Returns the session's data accessor instance (created once).
+
+        Public attributes (i.e., kwargs) are reset to their defaults.
+        """
+        self._check_open()
+        if data_accessor_name not in self._accessors:
+            accessor = DataAccessorFactory.get_data_accessor(
+                data_accessor_name,
+            )
+            self._accessor_defaults[data_accessor_name] = copy.deepcopy(
+                {
+                    k: v for k, v in vars(accessor).items()
+                    if not k.startswith('_')
+                },
+            )
+            accessor._data_access_session = self
+            self._accessors[data_accessor_name] = accessor
+
+        accessor = self._accessors[data_accessor_name]
+        for key, value in self._accessor_defaults[data_accessor_name].items():
+            setattr(accessor, key, copy.deepcopy(value))
+        return accessor
+
+    def get_executor(
+        self,
+        use_dask: Optional[bool] = True,
+        n_workers: Optional[int] = None,
+        threads_per_worker: Optional[int] = None,
+        processes: Optional[bool] = True,
+        close_existing_client: Optional[bool] = False,
+    ) -> Tuple[object, Callable]:
+        """Returns a warm executor and its as_completed() function.
+
+        Arguments match get_multithread(). Executors are kept open until the
+        session is closed.
+        """
+        self._check_open()
+        key = (use_dask, n_workers, threads_per_worker, processes)
+        if key not in self._executors:
+            logging.info(f'Starting a session executor: {key}')
+            self._executors[key] = get_multithread(
+                use_dask=use_dask,
+                n_workers=n_workers,
+                threads_per_worker=threads_per_worker,
+                processes=processes,
+                close_existing_client=close_existing_client,
+            )
+        return self._executors[key]
+
+    def get_cache(
+        self,
+        cache_dir: Union[str, Path],
+        size_limit_mb: Optional[int] = None,
+        suffix: Optional[str] = None,
+    ) -> FileCache:
+        """Returns the session's FileCache for a directory (created once)."""
+        self._check_open()
+        key = (str(Path(cache_dir).resolve()), size_limit_mb, suffix)
+        if key not in self._caches:
+            self._caches[key] = FileCache(
+                cache_dir,
+                size_limit_mb=size_limit_mb,
+                suffix=suffix,
+            )
+        return self._caches[key]
+
+    def get_xarray_dataset(
+        self,
+        *args,
+        **kwargs,
+    ) -> xr.Dataset:
+        """Calls get_xarray_dataset() using this session's resources."""
+        from xarray_data_accessor.core_functions import get_xarray_dataset
+        return get_xarray_dataset(
+            *args,
+            session=self,
+            **kwargs,
+        )
+
+    def close(self) -> None:
+        """Closes all executors and accessor resources."""
+        if self.closed:
+            return
+        for executor, _ in self._executors.values():
+            try:
+                # dask clients are closed (shutdown() would stop the cluster)
+                if hasattr(executor, 'close'):
+                    executor.close()
+                else:
+                    executor.shutdown()
+            except Exception as e:
+                logging.warning(f'Exception hit!: {e}')
+        for accessor in self._accessors.values():
+            try:
+                accessor.close()
+            except Exception as e:
+                logging.warning(f'Exception hit!: {e}')
+            accessor._data_access_session = None
+
+        self._executors = {}
+        self._accessors = {}
+        self._accessor_defaults = {}
+        self._caches = {}
+        self.closed = True
@@ -0,0 +1,395 @@
+"""Nearest grid cell lookups and interpolation weights for point data.
+
+A scipy cKDTree is built over the dataset's cell center coordinates. 1-D
+x/y axes are indexed separately (one small tree per axis), while 2-D
+coordinate fields (i.e., curvilinear lat/lon grids) are indexed with one tree
+over every cell center. Points can be given in a different CRS than the
+dataset, and the computed point -> cell map can be cached on disk.
+
+Interpolated (bilinear or inverse distance weighted) extraction is expressed
+as a sparse (point, cell) weight matrix, so the weights are computed once and
+every time batch is interpolated with one sparse matrix multiplication.
+"""
+import hashlib
+import xarray as xr
+import numpy as np
+import scipy.sparse
+from scipy.spatial import cKDTree
+from pathlib import Path
+from typing import (
+    Dict,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
+from xarray_data_accessor.caching import (
+    get_or_build_arrays,
+    get_or_build_sparse,
+)
+from xarray_data_accessor.utility_functions import _convert_xy_coordinates
+
+
+def _hash_arrays(*arrays: np.ndarray) -> str:
+    """Returns a sha256 hash of array shapes and values."""
+    sha = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array, dtype='float64')
+        sha.update(str(array.shape).encode('utf-8'))
+        sha.update(array.tobytes())
+    return sha.hexdigest()
+
+
+class NearestCellIndex:
+    """Finds the nearest grid cell (y/x dim indices) of a set of points.
+
+    NOTE: Distances are planar in the dataset's coordinate units.
+    """
+
+    def __init__(
+        self,
+        xarray_dataset: xr.Dataset,
+        xy_coords: Optional[Tuple[str, str]] = None,
+        coords_epsg: Optional[int] = None,
+    ) -> None:
+        """Initializes the index (the tree is built on the first query).
+
+        Arguments:
+            xarray_dataset: A dataset with x_dim/y_dim attributes.
+            xy_coords: The names of the x/y coordinates to search. These can
+                be 1-D axes or 2-D fields over the (y_dim, x_dim) cells.
+                Default is the x/y dimension coordinates.
+            coords_epsg: The EPSG of the searched coordinates. Default is
+                xarray_dataset.attrs['EPSG'] for dimension coordinates, and
+                4326 for 2-D fields (i.e., CF style lat/lon variables).
+        """
+        self.x_dim = xarray_dataset.attrs['x_dim']
+        self.y_dim = xarray_dataset.attrs['y_dim']
+        if xy_coords is None:
+            xy_coords = (self.x_dim, self.y_dim)
+        x_coord, y_coord = xy_coords
+        xs = xarray_dataset[x_coord]
+        ys = xarray_dataset[y_coord]
+
+        if xs.ndim == 1 and ys.ndim == 1:
+            if xs.dims != (self.x_dim,) or ys.dims != (self.y_dim,):
+                raise ValueError(
+                    f'1-D coordinates {xy_coords} must lie along the x/y '
+                    f'dimensions {(self.x_dim, self.y_dim)}!',
+                )
+            self.is_2d = False
+            if coords_epsg is None:
+                coords_epsg = xarray_dataset.attrs.get('EPSG', None)
+            self.xs = xs.values
+            self.ys = ys.values
+        elif xs.ndim <= 2 and ys.ndim <= 2:
+            self.is_2d = True
+            if coords_epsg is None:
+                coords_epsg = 4326
+            xs, ys = xr.broadcast(xs, ys)
+            self.xs = xs.transpose(self.y_dim, self.x_dim).values
+            self.ys = ys.transpose(self.y_dim, self.x_dim).values
+        else:
+            raise ValueError(
+                f'Coordinates {xy_coords} must be 1-D axes or 2-D fields!',
+            )
+        self.coords_epsg = coords_epsg
+        self._trees: Optional[Tuple[cKDTree, ...]] = None
+        self._cell_tree: Optional[cKDTree] = None
+        self._cell_idxs: Optional[np.ndarray] = None
+
+    @property
+    def grid_shape(self) -> Tuple[int, int]:
+        """Returns the (y_dim, x_dim) shape of the grid."""
+        if self.is_2d:
+            return self.xs.shape
+        return (len(self.ys), len(self.xs))
+
+    @property
+    def grid_hash(self) -> str:
+        """Returns a hash identifying the searched grid."""
+        return _hash_arrays(
+            self.xs,
+            self.ys,
+            np.array([self.coords_epsg or 0, self.is_2d]),
+        )
+
+    def _build(self) -> None:
+        """Builds the KD-tree(s) over the cell centers."""
+        if not self.is_2d:
+            self._trees = (
+                cKDTree(self.xs.reshape(-1, 1)),
+                cKDTree(self.ys.reshape(-1, 1)),
+            )
+            return
+        self._trees = (self._get_cell_tree(),)
+
+    def _get_cell_tree(self) -> cKDTree:
+        """Returns a KD-tree over every (flattened) cell center."""
+        if self._cell_tree is not None:
+            return self._cell_tree
+        if self.is_2d:
+            cell_xs, cell_ys = self.xs, self.ys
+        else:
+            cell_xs, cell_ys = np.meshgrid(self.xs, self.ys)
+
+        # cells without coordinates (i.e., off the globe) are never matched
+        cell_xys = np.column_stack([cell_xs.ravel(), cell_ys.ravel()])
+        self._cell_idxs = np.flatnonzero(np.isfinite(cell_xys).all(axis=1))
+        self._cell_tree = cKDTree(cell_xys[self._cell_idxs])
+        return self._cell_tree
+
+    def _transform_points(
+        self,
+        point_xs: np.ndarray,
+        point_ys: np.ndarray,
+        points_epsg: Optional[int],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns float64 point x/y values in the grid CRS."""
+        point_xs = np.asarray(point_xs, dtype='float64').reshape(-1)
+        point_ys = np.asarray(point_ys, dtype='float64').reshape(-1)
+        if self.coords_epsg is not None and points_epsg is not None:
+            point_xs, point_ys = _convert_xy_coordinates(
+                point_xs,
+                point_ys,
+                input_epsg=points_epsg,
+                output_epsg=self.coords_epsg,
+            )
+        return np.asarray(point_xs), np.asarray(point_ys)
+
+    def query(
+        self,
+        point_xs: np.ndarray,
+        point_ys: np.ndarray,
+        points_epsg: Optional[int] = 4326,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the x_dim and y_dim indices of each point's nearest cell.
+
+        Arguments:
+            point_xs: The point x values (i.e., longitudes).
+            point_ys: The point y values (i.e., latitudes).
+            points_epsg: The EPSG of the points. Points are transformed to
+                coords_epsg if they differ.
+
+        Returns:
+            A tuple with the x indices [0] and y indices [1].
+        """
+        if self._trees is None:
+            self._build()
+
+        point_xs, point_ys = self._transform_points(
+            point_xs,
+            point_ys,
+            points_epsg,
+        )
+        point_xs = point_xs.reshape(-1, 1)
+        point_ys = point_ys.reshape(-1, 1)
+
+        if not self.is_2d:
+            _, x_idxs = self._trees[0].query(point_xs)
+            _, y_idxs = self._trees[1].query(point_ys)
+            return x_idxs.astype('int64'), y_idxs.astype('int64')
+
+        _, tree_idxs = self._trees[0].query(np.hstack([point_xs, point_ys]))
+        y_idxs, x_idxs = np.unravel_index(
+            self._cell_idxs[tree_idxs],
+            self.xs.shape,
+        )
+        return x_idxs.astype('int64'), y_idxs.astype('int64')
+
+    def get_weights(
+        self,
+        point_xs: np.ndarray,
+        point_ys: np.ndarray,
+        method: Literal['bilinear', 'idw'] = 'bilinear',
+        points_epsg: Optional[int] = 4326,
+        idw_neighbors: int = 4,
+        idw_power: float = 2.0,
+    ) -> scipy.sparse.csr_matrix:
+        """Returns a sparse (point, cell) interpolation weight matrix.
+
+        Cells are flattened in (y_dim, x_dim) order, and each row sums to 1.
+
+        Arguments:
+            point_xs: The point x values (i.e., longitudes).
+            point_ys: The point y values (i.e., latitudes).
+            method: bilinear (the 4 surrounding cells, 1-D axes only) or
+                idw (inverse distance weighting of the nearest cells).
+            points_epsg: See query().
+            idw_neighbors: The number of cells weighted by idw.
+            idw_power: The inverse distance power used by idw.
+
+        Returns:
+            A scipy.sparse.csr_matrix.
+        """
+        point_xs, point_ys = self._transform_points(
+            point_xs,
+            point_ys,
+            points_epsg,
+        )
+        n_points = len(point_xs)
+        n_y, n_x = self.grid_shape
+
+        if method == 'bilinear':
+            if self.is_2d:
+                raise ValueError(
+                    'Bilinear weights require 1-D x/y coordinates! '
+                    'Use idw for 2-D coordinate fields.',
+                )
+            x0, x1, x_frac = _get_axis_weights(self.xs, point_xs)
+            y0, y1, y_frac = _get_axis_weights(self.ys, point_ys)
+            cells = np.stack(
+                [y0 * n_x + x0, y0 * n_x + x1, y1 * n_x + x0, y1 * n_x + x1],
+                axis=1,
+            )
+            weights = np.stack(
+                [
+                    (1 - y_frac) * (1 - x_frac),
+                    (1 - y_frac) * x_frac,
+                    y_frac * (1 - x_frac),
+                    y_frac * x_frac,
+                ],
+                axis=1,
+            )
+        elif method == 'idw':
+            tree = self._get_cell_tree()
+            k = max(1, min(idw_neighbors, tree.n))
+            distances, tree_idxs = tree.query(
+                np.column_stack([point_xs, point_ys]),
+                k=k,
+            )
+            distances = distances.reshape(n_points, k)
+            cells = self._cell_idxs[tree_idxs.reshape(n_points, k)]
+            with np.errstate(divide='ignore'):
+                weights = 1 / distances ** idw_power
+
+            # points on a cell center take its value
+            exact = distances == 0
+            exact_rows = exact.any(axis=1)
+            weights[exact_rows] = exact[exact_rows]
+            weights /= weights.sum(axis=1, keepdims=True)
+        else:
+            raise ValueError(
+                f'Interpolation method={method} is invalid! '
+                'Choose from [bilinear, idw].',
+            )
+
+        weight_matrix = scipy.sparse.csr_matrix(
+            (
+                weights.reshape(-1),
+                (np.repeat(np.arange(n_points), cells.shape[1]), cells.reshape(-1)),
+            ),
+            shape=(n_points, n_y * n_x),
+        )
+        weight_matrix.eliminate_zeros()
+        return weight_matrix
+
+
+def _get_axis_weights(
+    axis: np.ndarray,
+    values: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the bracketing axis indices and upper weight of each value.
+
+    Values beyond the axis are clamped to its edges. Axes can be ascending
+    or descending (i.e., latitudes).
+    """
+    order = np.argsort(axis, kind='stable')
+    sorted_axis = np.asarray(axis, dtype='float64')[order]
+    if len(sorted_axis) == 1:
+        zeros = np.zeros(len(values), dtype='int64')
+        return order[zeros], order[zeros], np.zeros(len(values))
+
+    i = np.clip(np.searchsorted(sorted_axis, values) - 1, 0, len(sorted_axis) - 2)
+    lower = sorted_axis[i]
+    upper = sorted_axis[i + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(upper > lower, (values - lower) / (upper - lower), 0)
+    return order[i], order[i + 1], np.clip(fraction, 0, 1)
+
+
+def get_nearest_cells(
+    xarray_dataset: xr.Dataset,
+    point_xs: np.ndarray,
+    point_ys: np.ndarray,
+    points_epsg: Optional[int] = 4326,
+    xy_coords: Optional[Tuple[str, str]] = None,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the x_dim and y_dim indices of each point's nearest cell.
+
+    Arguments:
+        xarray_dataset: A dataset with x_dim/y_dim attributes.
+        point_xs: The point x values (i.e., longitudes).
+        point_ys: The point y values (i.e., latitudes).
+        points_epsg: The EPSG of the points (default is 4326).
+        xy_coords: See NearestCellIndex.
+        cache_dir: If provided, the point -> cell map is cached here (keyed
+            by the grid and the points) and reused across runs.
+
+    Returns:
+        A tuple with the x indices [0] and y indices [1].
+    """
+    index = NearestCellIndex(xarray_dataset, xy_coords=xy_coords)
+
+    def get_cells() -> Dict[str, np.ndarray]:
+        x_idxs, y_idxs = index.query(point_xs, point_ys, points_epsg=points_epsg)
+        return {'x_idxs': x_idxs, 'y_idxs': y_idxs}
+
+    cells = get_or_build_arrays(
+        cache_dir,
+        {
+            'grid': index.grid_hash,
+            'points': _hash_arrays(point_xs, point_ys),
+            'points_epsg': points_epsg,
+        },
+        get_cells,
+        metadata={'n_points': len(point_xs), 'points_epsg': points_epsg},
+    )
+    return cells['x_idxs'], cells['y_idxs']
+
+
+def get_interpolation_weights(
+    xarray_dataset: xr.Dataset,
+    point_xs: np.ndarray,
+    point_ys: np.ndarray,
+    method: Literal['bilinear', 'idw'] = 'bilinear',
+    points_epsg: Optional[int] = 4326,
+    xy_coords: Optional[Tuple[str, str]] = None,
+    idw_neighbors: int = 4,
+    idw_power: float = 2.0,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> scipy.sparse.csr_matrix:
+    """Returns a sparse (point, cell) interpolation weight matrix.
+
+    Arguments:
+        See NearestCellIndex.get_weights() and get_nearest_cells().
+
+    Returns:
+        A scipy.sparse.csr_matrix with cells flattened in (y_dim, x_dim) order.
+    """
+    index = NearestCellIndex(xarray_dataset, xy_coords=xy_coords)
+
+    def get_weights() -> scipy.sparse.csr_matrix:
+        return index.get_weights(
+            point_xs,
+            point_ys,
+            method=method,
+            points_epsg=points_epsg,
+            idw_neighbors=idw_neighbors,
+            idw_power=idw_power,
+        )
+
+    return get_or_build_sparse(
+        cache_dir,
+        {
+            'grid': index.grid_hash,
+            'points': _hash_arrays(point_xs, point_ys),
+            'points_epsg': points_epsg,
+            'method': method,
+            'idw_neighbors': idw_neighbors,
+            'idw_power': idw_power,
+        },
+        get_weights,
+        metadata={'n_points': len(point_xs), 'method': method},
+    )
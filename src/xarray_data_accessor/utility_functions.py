@@ -122,28 +122,34 @@ def _bbox_from_coords_csv(
     raise NotImplementedError
 
 
-def _bbox_from_shp(
+def _read_shapefile(
     shapefile: ShapefileInput,
-) -> BoundingBoxDict:
-    """Gets the bounding box from a shapefile."""
+):
+    """Reads a shapefile (or passes through a GeoDataFrame)."""
     # make sure we have geopandas
     if 'gpd' not in dir():
         import geopandas as gpd
 
     if isinstance(shapefile, gpd.GeoDataFrame):
-        geo_df = shapefile
-    else:
-        if isinstance(shapefile, str):
-            shapefile = Path(shapefile)
-        if not shapefile.exists():
-            raise FileNotFoundError(
-                f'Input path {shapefile} is not found.',
-            )
-        if not shapefile.suffix == '.shp':
-            raise ValueError(
-                f'Input path {shapefile} is not a .shp file!',
-            )
-        geo_df = gpd.read_file(shapefile)
+        return shapefile
+    if isinstance(shapefile, str):
+        shapefile = Path(shapefile)
+    if not shapefile.exists():
+        raise FileNotFoundError(
+            f'Input path {shapefile} is not found.',
+        )
+    if not shapefile.suffix == '.shp':
+        raise ValueError(
+            f'Input path {shapefile} is not a .shp file!',
+        )
+    return gpd.read_file(shapefile)
+
+
+def _bbox_from_shp(
+    shapefile: ShapefileInput,
+) -> BoundingBoxDict:
+    """Gets the bounding box from a shapefile."""
+    geo_df = _read_shapefile(shapefile)
 
     # read GeoDataFrame and reproject if necessary
     if geo_df.crs.to_epsg() != 4326:
@@ -362,99 +368,135 @@ def _get_coords_df(
     return coords_df
 
 
-def _get_data_table_vectorized(
+def _get_unique_cells(
+    x_idxs: np.ndarray,
+    y_idxs: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Collapses point cell indices to the unique cells they fall in.
+
+    Returns:
+        A tuple with the unique cell x indices [0], y indices [1], and the
+            position of each point's cell in those arrays [2].
+    """
+    cells, point_cells = np.unique(
+        np.stack([x_idxs, y_idxs], axis=1),
+        axis=0,
+        return_inverse=True,
+    )
+    return cells[:, 0], cells[:, 1], point_cells.reshape(-1)
+
+
+def _get_weighted_cells(
+    weights,
+    grid_shape: Tuple[int, int],
+) -> Tuple[np.ndarray, np.ndarray, object]:
+    """Collapses a sparse (point, grid cell) weight matrix to the used cells.
+
+    Arguments:
+        weights: A scipy.sparse matrix with grid cells flattened in
+            (y_dim, x_dim) order (see spatial_index.get_interpolation_weights()).
+        grid_shape: The (y_dim, x_dim) shape of the grid.
+
+    Returns:
+        A tuple with the used cell x indices [0], y indices [1], and the
+            (point, used cell) weight matrix [2].
+    """
+    weights = weights.tocsr()
+    cells = np.unique(weights.indices)
+    cell_y_idxs, cell_x_idxs = np.unravel_index(cells, grid_shape)
+    return cell_x_idxs, cell_y_idxs, weights[:, cells]
+
+
+def _extract_points(
+    data_array: xr.DataArray,
+    x_idxs: np.ndarray,
+    y_idxs: np.ndarray,
+    xy_dims: Tuple[str, str],
+    point_cells: Optional[np.ndarray] = None,
+    time_slice: Optional[slice] = None,
+) -> np.ndarray:
+    """Reads a (time, point) array at cell indices with one pointwise isel.
+
+    point_cells can also be a sparse (point, cell) weight matrix (see
+    _get_weighted_cells()), in which case points are interpolated.
+    """
+    x_dim, y_dim = xy_dims
+    if time_slice is not None:
+        data_array = data_array.isel(time=time_slice)
+
+    # select all cells at once along a new points dimension
+    data = data_array.isel(
+        {
+            x_dim: xr.DataArray(x_idxs, dims='points'),
+            y_dim: xr.DataArray(y_idxs, dims='points'),
+        },
+    ).transpose('time', 'points').values
+
+    if point_cells is None:
+        return data
+
+    # interpolate all points for the batch with one sparse matmul
+    if hasattr(point_cells, 'tocsr'):
+        return np.asarray(point_cells @ data.T).T
+
+    # scatter each cell's series to the points within it
+    return data[:, point_cells]
+
+
+def _get_points_table(
     xarray_dataset: xr.Dataset,
     variable: str,
     point_ids: List[str],
-    id_to_index: Dict[str, int],
+    x_idxs: np.ndarray,
+    y_idxs: np.ndarray,
     xy_dims: Tuple[str, str],
+    point_cells: Optional[np.ndarray] = None,
     save_table_dir: Optional[Union[str, Path]] = None,
     save_table_suffix: Optional[str] = None,
     save_table_prefix: Optional[str] = None,
-) -> pd.DataFrame:
-
+) -> Union[pd.DataFrame, Path]:
+    """Extracts a (time, point) table of a variable at grid cell indices.
+
+    Uses vectorized pointwise indexing, so only the cells at the points are
+    read (not the whole grid).
+
+    Arguments:
+        xarray_dataset: The dataset to extract from.
+        variable: The variable to extract.
+        point_ids: The point IDs (output columns).
+        x_idxs: The x dimension index of each cell to read.
+        y_idxs: The y dimension index of each cell to read.
+        xy_dims: The x and y dimension names.
+        point_cells: The position of each point's cell in x_idxs/y_idxs
+            (see _get_unique_cells()), or a sparse (point, cell) weight
+            matrix (see _get_weighted_cells()). If None, cells and points
+            align.
+        save_table_dir/suffix/prefix: See _save_dataframe().
+
+    Returns:
+        The table as a dataframe, or the saved table path if save_table_dir
+            is provided.
+    """
     # unpack dimension names
     x_dim, y_dim = xy_dims
     logging.info(
-        f'Extracting {variable} data (vectorized method)',
+        f'Extracting {variable} data (pointwise method)',
     )
 
-    # get batches of max 100 points to avoid memory overflow
-    batch_size = 100
-    start_stops_idxs = list(
-        range(
-            0,
-            len(xarray_dataset.time) + 1,
-            batch_size,
-        ),
+    data = _extract_points(
+        xarray_dataset[variable],
+        x_idxs,
+        y_idxs,
+        xy_dims,
+        point_cells=point_cells,
     )
 
-    # init list to store dataframes
-    out_dfs = []
-
-    for i, num in enumerate(start_stops_idxs):
-        start = num
-        if num != start_stops_idxs[-1]:
-            stop = start_stops_idxs[i + 1]
-        else:
-            stop = None
-        logging.info(
-            f'Processing time slice [{num}:{stop}]. datetime={datetime.now()}',
-        )
-
-        # make a copy of the data for our variable of interest
-        ds = xarray_dataset[variable].isel(
-            time=slice(start, stop),
-        ).load()
-
-        # convert x/y dimensions to integer indexes
-        ds[x_dim] = list(range(len(ds[x_dim].values)))
-        ds[y_dim] = list(range(len(ds[y_dim].values)))
-
-        # "stack" the dataset and convert to a dataframe
-        ds_df = ds.stack(
-            xy_index=(x_dim, y_dim),
-            create_index=False,
-        ).to_dataframe().drop(columns=[x_dim, y_dim]).reset_index()
-        del ds
-
-        # pivot the dataframe to have all point combo ids as columns
-        ds_df = ds_df.pivot(
-            index='time',
-            columns='xy_index',
-            values=variable,
-        )
-        ds_df.index.name = 'datetime'
-
-        # convert the dictionary to a dataframe
-        index_map = pd.DataFrame(
-            list(id_to_index.items()),
-            columns=['key', 'index'],
-        ).set_index('key')
-
-        # get the point indexes to query data with
-        point_indexes = index_map.loc[point_ids].values.flatten()
-        data = ds_df.loc[:, point_indexes].values
-        index = ds_df.index
-        del ds_df
-
-        # create your final dataframe
-        out_dfs.append(
-            pd.DataFrame(
-                columns=point_ids,
-                index=index,
-                data=data,
-            ).sort_index(axis=1).sort_index(axis=0),
-        )
-        del data
-        del index
-        del index_map
-
-    out_df = pd.concat(
-        out_dfs,
-        axis=0,
-    )
-    del out_dfs
+    out_df = pd.DataFrame(
+        columns=point_ids,
+        index=pd.Index(xarray_dataset.time.values, name='datetime'),
+        data=data,
+    ).sort_index(axis=1).sort_index(axis=0)
+    del data
 
     # save to file
     if save_table_dir:
@@ -474,6 +516,141 @@ def _get_data_table_vectorized(
         return out_df
 
 
+def _get_time_batches(
+    times: pd.DatetimeIndex,
+    time_batch_size: int,
+    partition_by_year: bool = False,
+) -> List[Tuple[Optional[int], slice]]:
+    """Splits a time index into (year, slice) batches of time_batch_size.
+
+    If partition_by_year is True, batches never span two years. Otherwise
+    the year is None.
+    """
+    if partition_by_year:
+        years = times.year.values
+        breaks = np.flatnonzero(np.diff(years) != 0) + 1
+        groups = zip(
+            np.concatenate([[0], breaks]),
+            np.concatenate([breaks, [len(times)]]),
+        )
+    else:
+        groups = [(0, len(times))]
+
+    batches = []
+    for start, stop in groups:
+        year = int(times.year[start]) if partition_by_year else None
+        for i in range(start, stop, time_batch_size):
+            batches.append((year, slice(i, min(i + time_batch_size, stop))))
+    return batches
+
+
+def _write_points_parquet(
+    xarray_dataset: xr.Dataset,
+    variable: str,
+    point_ids: List[str],
+    x_idxs: np.ndarray,
+    y_idxs: np.ndarray,
+    xy_dims: Tuple[str, str],
+    save_table_dir: Union[str, Path],
+    point_cells: Optional[np.ndarray] = None,
+    save_table_prefix: Optional[str] = None,
+    compression: Optional[str] = 'snappy',
+    use_float32: bool = False,
+    partition_by_year: bool = False,
+    time_batch_size: int = 8760,
+) -> Path:
+    """Streams a (time, point) table to parquet one time batch at a time.
+
+    Each batch is written as a row group via a pyarrow ParquetWriter, so
+    only one batch is held in memory regardless of the series length.
+
+    Arguments:
+        See _get_points_table() for the extraction arguments.
+        save_table_dir: The directory to save the table in.
+        save_table_prefix: A prefix for the output file name.
+        compression: The parquet compression codec (i.e., snappy, zstd).
+        use_float32: If True, values are stored as float32.
+        partition_by_year: If True, a directory is written with one
+            year=YYYY sub-directory (hive partition) per year.
+        time_batch_size: The number of time steps per row group.
+
+    Returns:
+        The output parquet file (or directory if partition_by_year=True).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if isinstance(save_table_dir, str):
+        save_table_dir = Path(save_table_dir)
+    if not save_table_prefix:
+        save_table_prefix = ''
+    out_path = save_table_dir / f'{save_table_prefix}{variable}'
+    if not partition_by_year:
+        out_path = out_path.with_name(f'{out_path.name}.parquet')
+
+    # sort point columns once (matching the in-memory table layout)
+    order = np.argsort(np.array(point_ids, dtype=str), kind='stable')
+    point_ids = [point_ids[i] for i in order]
+    if point_cells is None:
+        point_cells = order
+    else:
+        point_cells = point_cells[order]
+
+    logging.info(
+        f'Streaming {variable} data to {out_path}, datetime={datetime.now()}',
+    )
+    times = pd.DatetimeIndex(xarray_dataset.time.values)
+    writer = None
+    writer_year = None
+    try:
+        for year, time_slice in _get_time_batches(
+            times,
+            time_batch_size,
+            partition_by_year=partition_by_year,
+        ):
+            data = _extract_points(
+                xarray_dataset[variable],
+                x_idxs,
+                y_idxs,
+                xy_dims,
+                point_cells=point_cells,
+                time_slice=time_slice,
+            )
+            if use_float32:
+                data = data.astype('float32', copy=False)
+            batch_df = pd.DataFrame(
+                columns=point_ids,
+                index=pd.Index(times[time_slice], name='datetime'),
+                data=data,
+            )
+            table = pa.Table.from_pandas(batch_df, preserve_index=True)
+            del data, batch_df
+
+            # start a new file for each year partition
+            if writer is None or year != writer_year:
+                if writer is not None:
+                    writer.close()
+                file_path = out_path
+                if partition_by_year:
+                    file_path = out_path / f'year={year}' / 'part-0.parquet'
+                    file_path.parent.mkdir(parents=True, exist_ok=True)
+                writer = pq.ParquetWriter(
+                    file_path,
+                    table.schema,
+                    compression=compression,
+                )
+                writer_year = year
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    logging.info(
+        f'Data for variable={variable} saved @ {save_table_dir}',
+    )
+    return out_path
+
+
 def _save_dataframe(
     df: pd.DataFrame,
     variable: str,
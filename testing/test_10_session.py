@@ -0,0 +1,72 @@
+"""Tests DataAccessSession resource reuse."""
+import xarray as xr
+import numpy as np
+import pytest
+from xarray_data_accessor import DataAccessSession
+from xarray_data_accessor.data_accessors import era5_from_cds
+
+
+class CompletedResult:
+    """Mimics a completed cdsapi.api.Result."""
+    reply = {'state': 'completed'}
+
+    def update(self) -> None:
+        pass
+
+
+def test_session_accessors() -> None:
+    """Tests that accessors are reused with their kwargs reset."""
+    with DataAccessSession() as session:
+        accessor = session.get_data_accessor('CDSDataAccessor')
+        accessor._parse_kwargs({'field_limit': 10, 'specific_hours': [1]})
+        accessor._client = 'warm client'
+
+        assert session.get_data_accessor('CDSDataAccessor') is accessor
+        assert accessor.field_limit == 120000
+        assert accessor.specific_hours is None
+        assert accessor._client == 'warm client'
+
+        # accessors sent to worker processes leave the session behind
+        assert '_data_access_session' not in accessor.__getstate__()
+        assert accessor._data_access_session is session
+
+    assert session.closed
+    assert accessor._data_access_session is None
+    with pytest.raises(RuntimeError):
+        session.get_data_accessor('CDSDataAccessor')
+
+
+def test_session_executor_and_caches(tmp_path, monkeypatch) -> None:
+    """Tests that executors and caches stay open across requests."""
+    monkeypatch.setattr(era5_from_cds, 'CDS_POLL_INTERVAL_RANGE', (0, 0))
+
+    session = DataAccessSession()
+    executors = []
+    for _ in range(2):
+        accessor = session.get_data_accessor('CDSDataAccessor')
+        monkeypatch.setattr(
+            accessor,
+            '_submit_request',
+            lambda input_dict: CompletedResult(),
+        )
+        monkeypatch.setattr(
+            accessor,
+            '_get_api_response',
+            lambda input_dict, result: (
+                input_dict['index'],
+                xr.Dataset({'a': ('time', np.ones(1))}),
+            ),
+        )
+        responses = accessor._run_request_pipeline(
+            [{'variable': '2m_temperature', 'index': i} for i in range(3)],
+        )
+        assert sorted(responses.keys()) == [0, 1, 2]
+        executors.append(list(session._executors.values())[0][0])
+
+    assert len(session._executors) == 1
+    assert executors[0] is executors[1]
+    assert session.get_cache(tmp_path) is session.get_cache(tmp_path)
+
+    session.close()
+    with pytest.raises(RuntimeError):
+        executors[0].submit(print)
@@ -76,6 +76,7 @@ def test_data_conversion_functions() -> None:
     assert isinstance(ConvertToTable, type)
     table_functions = [
         'points_to_tables',
+        'points_to_arrow_table',
     ]
     for func in table_functions:
         assert func in dir(ConvertToTable)
@@ -90,6 +91,7 @@ def test_data_conversion_functions() -> None:
         'make_gssha_precipitation_input',
         'make_gssha_grass_ascii',
         'make_gssha_hmet_wes',
+        'make_gssha_hmet_wes_stations',
     ]
     for func in gssha_functions:
         assert func in dir(ConvertToGSSHA)
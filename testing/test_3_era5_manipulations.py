@@ -8,6 +8,7 @@ from xarray_data_accessor import (
     ConvertToTable,
 )
 import pytest
+from xarray_data_accessor.resampling import integer_factor_resample
 from rasterio.enums import Resampling
 from typing import (
     List,
@@ -99,6 +100,310 @@ def test_spatial_resample(test_dataset, spatial_resample_methods) -> None:
         assert len(test_dataset_rs2.latitude) == 21
 
 
+def test_chunked_spatial_resample(test_dataset, tmp_path) -> None:
+    """Tests that time blocked resampling matches a whole dataset reproject."""
+    ds = test_dataset.drop_vars('spatial_ref').rio.write_crs(4326)
+    expected = ds.rename({'longitude': 'x', 'latitude': 'y'}).rio.reproject(
+        dst_crs=ds.rio.crs,
+        shape=(21, 38),
+        resampling=Resampling.bilinear,
+        nodata=np.nan,
+    )
+    for zarr_store in [None, str(tmp_path / 'resampled.zarr')]:
+        resampled = xarray_data_accessor.spatial_resample(
+            xarray_dataset=ds,
+            xy_resolution_factors=(2, 3),
+            time_block_size=10,
+            max_workers=2,
+            zarr_store=zarr_store,
+            use_fast_paths=False,
+        )
+        assert resampled.attrs['x_dim'] == 'longitude'
+        np.testing.assert_allclose(
+            resampled.longitude.values,
+            expected.x.values,
+        )
+        for variable in ds.data_vars:
+            np.testing.assert_allclose(
+                resampled[variable].transpose('time', 'latitude', 'longitude').values,
+                expected[variable].values,
+                rtol=1e-6,
+            )
+    assert (tmp_path / 'resampled.zarr').exists()
+
+    # sparse weights are built once per grid pair and reused from disk
+    weights_dir = tmp_path / 'weights'
+    for _ in range(2):
+        resampled = xarray_data_accessor.spatial_resample(
+            xarray_dataset=ds,
+            resolution_factor=2,
+            resample_method='nearest',
+            weights_cache_dir=weights_dir,
+        )
+        np.testing.assert_allclose(
+            resampled['2m_temperature'].values,
+            ds['2m_temperature'].values.repeat(2, axis=1).repeat(2, axis=2),
+        )
+    assert len(list(weights_dir.glob('*.npz'))) == 1
+
+
+def test_integer_spatial_resample(test_dataset, tmp_path) -> None:
+    """Tests that integer (categorical) variables keep their dtype."""
+    ds = test_dataset.drop_vars('spatial_ref').rio.write_crs(4326)
+    codes = (ds['2m_temperature'] * 10 % 7).astype('int16')
+    ds = xr.Dataset(
+        {
+            'land_use': codes,
+            'mask': codes.isel(time=0, drop=True) > 2,
+        },
+        attrs=ds.attrs,
+    ).rio.write_crs(4326)
+    ds['mask'] = ds['mask'].astype('uint8')
+    expected = ds.rename({'longitude': 'x', 'latitude': 'y'}).rio.reproject(
+        dst_crs=ds.rio.crs,
+        shape=(21, 38),
+        resampling=Resampling.nearest,
+    )
+    for zarr_store in [None, str(tmp_path / 'codes.zarr')]:
+        resampled = xarray_data_accessor.spatial_resample(
+            xarray_dataset=ds,
+            xy_resolution_factors=(2, 3),
+            resample_method='nearest',
+            time_block_size=10,
+            zarr_store=zarr_store,
+            use_fast_paths=False,
+        )
+        for variable in ds.data_vars:
+            assert resampled[variable].dtype == ds[variable].dtype
+            np.testing.assert_array_equal(
+                resampled[variable].transpose(
+                    ..., 'latitude', 'longitude',
+                ).values,
+                expected[variable].values,
+            )
+
+
+def test_integer_factor_resample(test_dataset) -> None:
+    """Tests the lazy integer refine/coarsen fast paths."""
+    ds = test_dataset.drop_vars('spatial_ref').rio.write_crs(4326)
+    ds = ds.chunk({'time': 24})
+    values = ds['2m_temperature'].values
+
+    refined = xarray_data_accessor.spatial_resample(
+        xarray_dataset=ds,
+        resolution_factor=2,
+        resample_method='nearest',
+    )
+    assert refined['2m_temperature'].chunks is not None
+    np.testing.assert_array_equal(
+        refined['2m_temperature'].values,
+        values.repeat(2, axis=1).repeat(2, axis=2),
+    )
+
+    # bilinear matches a reprojection wherever the reprojection has data
+    bilinear = xarray_data_accessor.spatial_resample(
+        xarray_dataset=ds,
+        xy_resolution_factors=(2, 3),
+    )
+    assert bilinear['2m_temperature'].chunks is not None
+    expected = xarray_data_accessor.spatial_resample(
+        xarray_dataset=ds,
+        xy_resolution_factors=(2, 3),
+        use_fast_paths=False,
+    )
+    np.testing.assert_allclose(
+        bilinear.longitude.values,
+        expected.longitude.values,
+    )
+    np.testing.assert_allclose(
+        bilinear.latitude.values,
+        expected.latitude.values,
+    )
+    expected_values = expected['2m_temperature'].values
+    has_data = np.isfinite(expected_values)
+    assert has_data.mean() > 0.9
+    np.testing.assert_allclose(
+        bilinear['2m_temperature'].values[has_data],
+        expected_values[has_data],
+        rtol=1e-5,
+    )
+
+    coarsened = xarray_data_accessor.spatial_resample(
+        xarray_dataset=ds,
+        resolution_factor=0.5,
+        resample_method='average',
+    )
+    assert coarsened.sizes['longitude'] == 9
+    assert coarsened.sizes['latitude'] == 3
+    np.testing.assert_allclose(
+        coarsened['2m_temperature'].values,
+        ds['2m_temperature'].coarsen(
+            longitude=2,
+            latitude=2,
+            boundary='trim',
+        ).mean().values,
+    )
+    assert coarsened.attrs['x_dim'] == 'longitude'
+
+
+def test_single_cell_fast_paths(test_dataset) -> None:
+    """Tests that single-cell axes fall back to the general path."""
+    ds = test_dataset.drop_vars('spatial_ref').rio.write_crs(4326)
+
+    # a single source row has no cell bounds to refine
+    assert integer_factor_resample(
+        ds.isel(latitude=[0]),
+        (2, 2),
+        'nearest',
+    ) is None
+
+    # coarsening latitude 7 -> 1 leaves a single destination row
+    assert integer_factor_resample(ds, (1, 0.2), 'average') is None
+    coarsened = xarray_data_accessor.spatial_resample(
+        xarray_dataset=ds,
+        xy_resolution_factors=(1, 0.2),
+        resample_method='average',
+    )
+    expected = xarray_data_accessor.spatial_resample(
+        xarray_dataset=ds,
+        xy_resolution_factors=(1, 0.2),
+        resample_method='average',
+        use_fast_paths=False,
+    )
+    assert coarsened.sizes['latitude'] == 1
+    xr.testing.assert_identical(coarsened, expected)
+
+
+def test_regridder(test_dataset, tmp_path, monkeypatch) -> None:
+    """Tests sparse regridding weights and their on-disk cache."""
+    from xarray_data_accessor.resampling import Regridder
+    ds = test_dataset.drop_vars('spatial_ref').rio.write_crs(4326)
+    values = ds['2m_temperature'].values
+
+    # refining by integer factors
+    nearest = Regridder.from_dataset(
+        ds.rename({'longitude': 'x', 'latitude': 'y'}),
+        width=38,
+        height=21,
+        method='nearest',
+    )
+    repeated = values.repeat(3, axis=1).repeat(2, axis=2)
+    np.testing.assert_allclose(nearest.regrid_array(values), repeated)
+
+    conservative = Regridder.from_dataset(
+        ds.rename({'longitude': 'x', 'latitude': 'y'}),
+        width=38,
+        height=21,
+        method='conservative',
+    )
+    np.testing.assert_allclose(
+        conservative.regrid_array(values),
+        repeated,
+        rtol=1e-6,
+    )
+
+    # bilinear weights match linear interpolation inside the grid
+    dst_xs = np.linspace(-83.3, -79.1, 11)
+    dst_ys = np.linspace(42.8, 41.5, 5)
+    bilinear = Regridder(
+        ds.longitude.values,
+        ds.latitude.values,
+        dst_xs,
+        dst_ys,
+        method='bilinear',
+        cache_dir=tmp_path,
+    )
+    expected = ds['2m_temperature'].interp(
+        longitude=dst_xs,
+        latitude=dst_ys,
+    ).transpose('time', 'latitude', 'longitude').values
+    np.testing.assert_allclose(
+        bilinear.regrid_array(values),
+        expected,
+        rtol=1e-6,
+    )
+
+    # coarsening conservatively averages cells, skipping missing ones
+    grid = np.arange(32, dtype='float64').reshape(1, 4, 8)
+    grid[0, 0, 0] = np.nan
+    coarsen = Regridder(
+        np.arange(8),
+        np.arange(4),
+        np.arange(4) * 2 + 0.5,
+        np.arange(2) * 2 + 0.5,
+        method='conservative',
+    )
+    coarse = coarsen.regrid_array(grid)
+    assert coarse[0, 0, 0] == np.nanmean(grid[0, :2, :2])
+    np.testing.assert_allclose(
+        coarse[0, 1],
+        grid[0, 2:, :].reshape(2, 4, 2).mean(axis=(0, 2)),
+    )
+
+    # cached weights are loaded instead of rebuilt
+    def build_weights(*args, **kwargs):
+        raise AssertionError('Regridding weights should come from the cache!')
+
+    monkeypatch.setattr(Regridder, '_build_weights', build_weights)
+    cached = Regridder(
+        ds.longitude.values,
+        ds.latitude.values,
+        dst_xs,
+        dst_ys,
+        method='bilinear',
+        cache_dir=tmp_path,
+    )
+    assert (cached.weights != bilinear.weights).nnz == 0
+
+
+def test_conservative_regridding(test_dataset) -> None:
+    """Tests that conservative regridding preserves area weighted totals."""
+    from xarray_data_accessor.resampling import Regridder, get_cell_areas
+    ds = test_dataset.drop_vars('spatial_ref').rio.write_crs(4326)
+    src_xs = -83.5 + 0.25 * np.arange(19)
+    src_ys = 43.0 - 0.25 * np.arange(7)
+    values = ds['2m_temperature'].values
+
+    # coarser (unaligned) cells spanning the whole source grid
+    dst_xs = src_xs[0] - 0.125 + 0.95 * (np.arange(5) + 0.5)
+    dst_ys = src_ys[0] + 0.125 - 0.875 * (np.arange(2) + 0.5)
+    regridder = Regridder.from_dataset(
+        ds.rename({'longitude': 'x', 'latitude': 'y'}),
+        width=19,
+        height=7,
+        method='conservative',
+    )
+    assert regridder.spherical
+
+    regridder = Regridder(
+        src_xs,
+        src_ys,
+        dst_xs,
+        dst_ys,
+        method='conservative',
+        spherical=True,
+    )
+    np.testing.assert_allclose(
+        np.asarray(regridder.weights.sum(axis=1)).ravel(),
+        1,
+    )
+    src_areas = get_cell_areas(src_xs, src_ys, spherical=True)
+    dst_areas = get_cell_areas(dst_xs, dst_ys, spherical=True)
+    np.testing.assert_allclose(dst_areas.sum(), src_areas.sum())
+    np.testing.assert_allclose(
+        (regridder.regrid_array(values) * dst_areas).sum(axis=(1, 2)),
+        (values * src_areas).sum(axis=(1, 2)),
+    )
+
+    # spherical weights favour the (larger) southern cells
+    planar = Regridder(src_xs, src_ys, dst_xs, dst_ys, method='conservative')
+    lat_ramp = np.broadcast_to(src_ys[:, None], values.shape[1:])
+    assert (
+        regridder.regrid_array(lat_ramp)[0, 0]
+        < planar.regrid_array(lat_ramp)[0, 0]
+    )
+
+
 def test_temporal_resample(test_dataset, temporal_resample_methods) -> None:
     """Tests temporal resampling."""
 
@@ -161,3 +466,249 @@ def test_to_table(test_dataset, test_dir) -> None:
                 table_df = table_df.set_index('datetime')
             assert len(table_df.index) == len(test_dataset.time.values)
             assert len(table_df.columns) == 3
+
+
+def test_to_table_values(test_dataset) -> None:
+    """Tests that point tables hold the nearest grid cell values."""
+    # the last points share grid cells with the first
+    coords = [
+        (-82.98, 41.63),
+        (-79.43, 42.88),
+        (-83.23, 41.85),
+        (-82.99, 41.62),
+        (-79.44, 42.87),
+    ]
+    tables_dict = ConvertToTable.points_to_tables(
+        xarray_dataset=test_dataset,
+        variables=['2m_temperature'],
+        coords=coords,
+    )
+    table_df = tables_dict['2m_temperature']
+    assert table_df.index.name == 'datetime'
+    for i, (lon, lat) in enumerate(coords):
+        expected = test_dataset['2m_temperature'].sel(
+            longitude=lon,
+            latitude=lat,
+            method='nearest',
+        ).values
+        np.testing.assert_array_equal(table_df[str(i)].values, expected)
+
+
+def test_to_parquet_stream(test_dataset, tmp_path) -> None:
+    """Tests that parquet tables are written in row groups."""
+    import pyarrow.parquet as pq
+    coords = [(-82.98, 41.63), (-79.43, 42.88)]
+    table_df = ConvertToTable.points_to_tables(
+        xarray_dataset=test_dataset,
+        variables=['2m_temperature'],
+        coords=coords,
+    )['2m_temperature']
+
+    table_path = ConvertToTable.points_to_tables(
+        xarray_dataset=test_dataset,
+        variables=['2m_temperature'],
+        coords=coords,
+        save_table_dir=tmp_path,
+        use_float32=True,
+        time_batch_size=24,
+    )['2m_temperature']
+    parquet_file = pq.ParquetFile(table_path)
+    assert parquet_file.metadata.num_row_groups == 4
+    streamed_df = pd.read_parquet(table_path)
+    assert (streamed_df.dtypes == 'float32').all()
+    pd.testing.assert_frame_equal(
+        streamed_df,
+        table_df.astype('float32'),
+        check_freq=False,
+    )
+
+    # year partitions are written as hive style sub-directories
+    table_dir = ConvertToTable.points_to_tables(
+        xarray_dataset=test_dataset.assign_coords(
+            time=test_dataset.time - pd.Timedelta(days=30),
+        ),
+        variables=['2m_temperature'],
+        coords=coords,
+        save_table_dir=tmp_path,
+        save_table_prefix='partitioned_',
+        partition_by_year=True,
+    )['2m_temperature']
+    assert sorted(p.name for p in table_dir.iterdir()) == [
+        'year=2018',
+        'year=2019',
+    ]
+    assert len(pd.read_parquet(table_dir)) == len(test_dataset.time)
+
+
+def test_to_arrow_table(test_dataset) -> None:
+    """Tests the long Arrow table output."""
+    import pyarrow as pa
+    coords = [(-82.98, 41.63), (-79.43, 42.88), (-82.99, 41.62)]
+    table = ConvertToTable.points_to_arrow_table(
+        xarray_dataset=test_dataset,
+        coords=coords,
+    )
+    variables = ['2m_temperature', '100m_u_component_of_wind']
+    assert table.column_names == ['datetime', 'point_id'] + variables
+    assert pa.types.is_dictionary(table.schema.field('point_id').type)
+    assert table.schema.field(variables[0]).type == pa.float32()
+    assert table.num_rows == len(test_dataset.time) * len(coords)
+
+    # compare with the wide tables
+    long_df = table.to_pandas()
+    wide_dict = ConvertToTable.points_to_tables(
+        xarray_dataset=test_dataset,
+        coords=coords,
+    )
+    for variable in variables:
+        wide_df = long_df.pivot(
+            index='datetime',
+            columns='point_id',
+            values=variable,
+        )
+        np.testing.assert_array_equal(
+            wide_df[['0', '1', '2']].values,
+            wide_dict[variable][['0', '1', '2']].values.astype('float32'),
+        )
+
+
+def test_nearest_cells(test_dataset, tmp_path, monkeypatch) -> None:
+    """Tests KD-tree nearest cells for 2-D, projected, and cached grids."""
+    import pyproj
+    from xarray_data_accessor import spatial_index
+    lons = np.array([-82.98, -79.43, -83.23, -80.1])
+    lats = np.array([41.63, 42.88, 41.85, 42.2])
+    x_idxs, y_idxs = spatial_index.get_nearest_cells(test_dataset, lons, lats)
+    expected_xs = np.abs(test_dataset.longitude.values - lons[:, None]).argmin(1)
+    expected_ys = np.abs(test_dataset.latitude.values - lats[:, None]).argmin(1)
+    np.testing.assert_array_equal(x_idxs, expected_xs)
+    np.testing.assert_array_equal(y_idxs, expected_ys)
+
+    # a curvilinear style grid with 2-D lat/lon fields
+    grid_lons, grid_lats = np.meshgrid(
+        test_dataset.longitude.values,
+        test_dataset.latitude.values,
+    )
+    grid_ds = xr.Dataset(
+        coords={
+            'lon': (('y', 'x'), grid_lons),
+            'lat': (('y', 'x'), grid_lats),
+        },
+        attrs={'x_dim': 'x', 'y_dim': 'y', 'EPSG': 3857},
+    )
+    x_idxs, y_idxs = spatial_index.get_nearest_cells(
+        grid_ds,
+        lons,
+        lats,
+        xy_coords=('lon', 'lat'),
+    )
+    np.testing.assert_array_equal(x_idxs, expected_xs)
+    np.testing.assert_array_equal(y_idxs, expected_ys)
+
+    # a projected (web mercator x/y axes are separable) grid
+    transformer = pyproj.Transformer.from_crs(4326, 3857, always_xy=True)
+    proj_xs, _ = transformer.transform(
+        test_dataset.longitude.values.astype('float64'),
+        np.zeros(test_dataset.sizes['longitude']),
+    )
+    _, proj_ys = transformer.transform(
+        np.zeros(test_dataset.sizes['latitude']),
+        test_dataset.latitude.values.astype('float64'),
+    )
+    proj_ds = xr.Dataset(
+        coords={'x': proj_xs, 'y': proj_ys},
+        attrs={'x_dim': 'x', 'y_dim': 'y', 'EPSG': 3857},
+    )
+    x_idxs, y_idxs = spatial_index.get_nearest_cells(
+        proj_ds,
+        lons,
+        lats,
+        points_epsg=4326,
+        cache_dir=tmp_path,
+    )
+    np.testing.assert_array_equal(x_idxs, expected_xs)
+    np.testing.assert_array_equal(y_idxs, expected_ys)
+    assert len(list(tmp_path.glob('*.npz'))) == 1
+
+    # the cached point -> cell map is reused without querying
+    def query(*args, **kwargs):
+        raise AssertionError('The cell index should be read from the cache!')
+
+    monkeypatch.setattr(spatial_index.NearestCellIndex, 'query', query)
+    x_idxs, y_idxs = spatial_index.get_nearest_cells(
+        proj_ds,
+        lons,
+        lats,
+        cache_dir=tmp_path,
+    )
+    np.testing.assert_array_equal(x_idxs, expected_xs)
+    np.testing.assert_array_equal(y_idxs, expected_ys)
+
+
+def test_interpolated_points(test_dataset, tmp_path) -> None:
+    """Tests bilinear and IDW point extraction via sparse weights."""
+    from xarray_data_accessor.spatial_index import get_interpolation_weights
+    coords = [(-82.9, 41.7), (-79.5, 42.8), (-83.23, 41.88)]
+    lons, lats = np.array(coords).T
+    variable = '2m_temperature'
+
+    table_df = ConvertToTable.points_to_tables(
+        xarray_dataset=test_dataset,
+        variables=[variable],
+        coords=coords,
+        interpolation='bilinear',
+    )[variable]
+    expected = test_dataset[variable].interp(
+        longitude=xr.DataArray(lons, dims='points'),
+        latitude=xr.DataArray(lats, dims='points'),
+        method='linear',
+    ).transpose('time', 'points').values
+
+    # the test grid coordinates are float32
+    np.testing.assert_allclose(
+        table_df[['0', '1', '2']].values,
+        expected,
+        rtol=1e-6,
+    )
+
+    # streamed parquet batches give the same values
+    table_path = ConvertToTable.points_to_tables(
+        xarray_dataset=test_dataset,
+        variables=[variable],
+        coords=coords,
+        interpolation='bilinear',
+        save_table_dir=tmp_path,
+        time_batch_size=10,
+    )[variable]
+    np.testing.assert_allclose(
+        pd.read_parquet(table_path)[['0', '1', '2']].values,
+        table_df[['0', '1', '2']].values,
+    )
+
+    # idw weights sum to 1, and a single neighbor is the nearest cell
+    weights = get_interpolation_weights(
+        test_dataset,
+        lons,
+        lats,
+        method='idw',
+        idw_neighbors=4,
+        cache_dir=tmp_path / 'weights',
+    )
+    assert weights.shape == (3, 7 * 19)
+    assert (weights.getnnz(axis=1) == 4).all()
+    np.testing.assert_allclose(np.asarray(weights.sum(axis=1)).ravel(), 1)
+    assert len(list((tmp_path / 'weights').glob('*.npz'))) == 1
+
+    idw_df = ConvertToTable.points_to_tables(
+        xarray_dataset=test_dataset,
+        variables=[variable],
+        coords=coords,
+        interpolation='idw',
+        idw_neighbors=1,
+    )[variable]
+    nearest_df = ConvertToTable.points_to_tables(
+        xarray_dataset=test_dataset,
+        variables=[variable],
+        coords=coords,
+    )[variable]
+    np.testing.assert_allclose(idw_df.values, nearest_df.values)
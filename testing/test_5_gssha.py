@@ -1,6 +1,9 @@
 """Tests conversion to GSSHA format."""
 from xarray_data_accessor.data_converters import ConvertToGSSHA
+from xarray_data_accessor.data_converters import to_gssha
+from xarray_data_accessor import areal_aggregation
 import xarray as xr
+import numpy as np
 import pytest
 from pathlib import Path
 
@@ -32,7 +35,7 @@ def count_lines(filename: Path):
 
 def test_precipitation_input(test_dataset) -> None:
     out_path = ConvertToGSSHA.make_gssha_precipitation_input(
-        test_dataset,
+        test_dataset.isel(time=slice(0, 24)),
         precipitation_variable='2m_temperature',
         precipitation_type='GAGE',
         output_epsg=26915,
@@ -42,7 +45,7 @@ def test_precipitation_input(test_dataset) -> None:
     assert out_path.suffix == '.gag'
     l1 = count_lines(out_path)
 
-    # test the hot start
+    # test the hot start (only new time steps are appended as an event)
     out_path = ConvertToGSSHA.make_gssha_precipitation_input(
         test_dataset,
         precipitation_variable='2m_temperature',
@@ -52,9 +55,60 @@ def test_precipitation_input(test_dataset) -> None:
     )
     l2 = count_lines(out_path)
     assert l1 < l2
+    assert l2 == 2 * l1 + 1 + test_dataset.sizes['time'] - 2 * 24
+    lines = out_path.read_text().splitlines()
+    first_new = test_dataset.time.dt.strftime('%Y%m%d%H').values[24]
+    assert lines[0] == 'EVENT precipitation_event_1'
+    assert lines[l1 + 1] == f'EVENT precipitation_event_1_{first_new}'
+    assert lines[l1 + 2] == f'NRPDS {test_dataset.sizes["time"] - 24}'
+    assert lines[-1].startswith(
+        'GAGE ' + str(test_dataset.time.dt.strftime('%Y %m %d %H %M').values[-1]),
+    )
+
+    # nothing is appended once the file is up to date
+    ConvertToGSSHA.make_gssha_precipitation_input(
+        test_dataset,
+        precipitation_variable='2m_temperature',
+        precipitation_type='GAGE',
+        output_epsg=26915,
+        hot_start=True,
+    )
+    assert count_lines(out_path) == l2
     out_path.unlink()
 
 
+def test_precipitation_values(test_dataset, tmp_path) -> None:
+    """Tests precipitation event rows against the (time, gage) data."""
+    ds = test_dataset.isel(longitude=slice(0, 3), latitude=slice(0, 2))
+    times = ds.time.values
+    out_path = ConvertToGSSHA.make_gssha_precipitation_input(
+        ds,
+        precipitation_variable='2m_temperature',
+        precipitation_type='RADAR',
+        event_intervals=[
+            {'name': 'first', 'start': times[0], 'end': times[4]},
+            {'name': 'second', 'start': times[10], 'end': times[11]},
+        ],
+        file_dir=tmp_path,
+        time_block_size=2,
+    )
+    lines = out_path.read_text().splitlines()
+    assert lines[:3] == ['EVENT first', 'NRPDS 5', 'NRGAG 6']
+    assert lines[9] == 'RADAR 2019 01 30 00 00 257.963367 257.637100 ' \
+        '257.939725 257.787467 258.226588 258.644272'
+    assert lines[14:17] == ['', 'EVENT second', 'NRPDS 2']
+    assert len(lines) == 2 * 9 + 5 + 2 + 1
+
+    # gages are ordered by x, then y
+    expected = ds['2m_temperature'].transpose('time', 'longitude', 'latitude')
+    rows = np.array([line.split()[6:] for line in lines[9:14]], dtype=float)
+    np.testing.assert_allclose(
+        rows,
+        expected.values[:5].reshape(5, -1),
+        atol=1e-6,
+    )
+
+
 def test_to_grass_ascii(test_dataset) -> None:
 
     # test with correct HMET variable
@@ -75,6 +129,48 @@ def test_to_grass_ascii(test_dataset) -> None:
     # test with incorrect HMET variable
 
 
+def test_grass_ascii_values(test_dataset, tmp_path) -> None:
+    """Tests GRASS ASCII contents for numpy and dask backed datasets."""
+    ds = test_dataset.isel(time=slice(0, 5))
+    for i, input_ds in enumerate([ds, ds.chunk({'time': 2})]):
+        file_dir = tmp_path / str(i)
+        file_dir.mkdir()
+        out_list = ConvertToGSSHA.make_gssha_grass_ascii(
+            input_ds,
+            variable='2m_temperature',
+            hmet_variable='Dry Bulb Temperature',
+            file_dir=file_dir,
+            time_block_size=2,
+            max_workers=2,
+        )
+        assert [f.name for f in out_list][:2] == [
+            '2019013000_Temp.asc',
+            '2019013001_Temp.asc',
+        ]
+        for t, file in enumerate(out_list):
+            lines = file.read_text().splitlines()
+            assert lines[4:6] == ['rows: 7', 'cols: 19']
+            np.testing.assert_array_equal(
+                np.loadtxt(lines[6:]),
+                ds['2m_temperature'].isel(time=t).values,
+            )
+
+    # formats are applied to every value
+    out_list = ConvertToGSSHA.make_gssha_grass_ascii(
+        ds.isel(time=[0]),
+        variable='2m_temperature',
+        hmet_variable='Dry Bulb Temperature',
+        file_dir=tmp_path,
+        float_format='%.2f',
+    )
+    assert out_list[0].read_text().splitlines()[6].startswith('257.96 257.94 ')
+
+    # ASCII is validated before anything is written
+    with pytest.raises(ValueError):
+        to_gssha._write_ascii_file('caf\u00e9', tmp_path / 'bad.asc')
+    assert not (tmp_path / 'bad.asc').exists()
+
+
 def test_hmet_wes_ascii(test_dataset) -> None:
 
     out_path = ConvertToGSSHA.make_gssha_hmet_wes(
@@ -88,3 +184,166 @@ def test_hmet_wes_ascii(test_dataset) -> None:
     assert out_path.suffix == '.test'
     assert out_path.name.replace('.test', '') == 'hmet_wes'
     out_path.unlink()
+
+
+def test_hmet_wes_stations(test_dataset, tmp_path) -> None:
+    """Tests that station WES files hold their nearest cell's values."""
+    stations = {
+        'a': (-83.0, 42.0),
+        'b': (-80.1, 42.6),
+    }
+    variable_to_hmet = {'2m_temperature': 'Dry Bulb Temperature'}
+    out_paths = ConvertToGSSHA.make_gssha_hmet_wes_stations(
+        test_dataset,
+        stations,
+        variable_to_hmet=variable_to_hmet,
+        file_dir=tmp_path,
+    )
+    assert list(out_paths.keys()) == ['a', 'b']
+
+    for station, (x, y) in stations.items():
+        assert out_paths[station].name == f'hmet_wes_{station}.asc'
+        rows = np.loadtxt(out_paths[station])
+        assert rows.shape == (test_dataset.sizes['time'], 12)
+        expected = test_dataset['2m_temperature'].sel(
+            longitude=x,
+            latitude=y,
+            method='nearest',
+        ).values
+        np.testing.assert_allclose(rows[:, 9], expected)
+        assert (rows[:, 5] == 99.999).all()
+
+    # a single station matches the multi-station output
+    out_path = ConvertToGSSHA.make_gssha_hmet_wes(
+        test_dataset,
+        variable_to_hmet=variable_to_hmet,
+        file_dir=tmp_path,
+        xy_coords=stations['b'],
+    )
+    assert out_path.read_text() == out_paths['b'].read_text()
+
+
+def test_hot_starts(test_dataset, tmp_path) -> None:
+    """Tests that hot starts only write new time steps."""
+    variable_to_hmet = {'2m_temperature': 'Dry Bulb Temperature'}
+    stations = {'a': (-83.0, 42.0)}
+    expected = ConvertToGSSHA.make_gssha_hmet_wes_stations(
+        test_dataset,
+        stations,
+        variable_to_hmet=variable_to_hmet,
+        file_dir=tmp_path,
+        file_name='expected',
+    )['a'].read_text()
+
+    # WES files are appended to in 6 hour steps
+    times = test_dataset.time.values
+    for i in range(0, len(times), 6):
+        out_path = ConvertToGSSHA.make_gssha_hmet_wes_stations(
+            test_dataset,
+            stations,
+            variable_to_hmet=variable_to_hmet,
+            end_time=times[min(i + 5, len(times) - 1)],
+            file_dir=tmp_path,
+            hot_start=True,
+        )['a']
+    assert out_path.read_text() == expected
+
+    # the last line is found by seeking from the end of the file
+    last_line = expected.splitlines()[-1]
+    assert to_gssha._read_last_line(out_path, block_size=7) == last_line
+    assert to_gssha._read_last_line(tmp_path / 'missing.asc') is None
+    assert to_gssha._get_last_time(out_path) == times[-1]
+
+    # existing GRASS ASCII files are skipped
+    grass_kwargs = dict(
+        variable='2m_temperature',
+        hmet_variable='Dry Bulb Temperature',
+        file_dir=tmp_path,
+        time_block_size=4,
+    )
+    out_list = ConvertToGSSHA.make_gssha_grass_ascii(
+        test_dataset.isel(time=slice(0, 6)),
+        **grass_kwargs,
+    )
+    out_list[0].write_text('kept')
+    out_list = ConvertToGSSHA.make_gssha_grass_ascii(
+        test_dataset.isel(time=slice(0, 12)),
+        hot_start=True,
+        **grass_kwargs,
+    )
+    assert len(out_list) == 12
+    assert all(f.exists() for f in out_list)
+    assert out_list[0].read_text() == 'kept'
+
+
+def test_areal_aggregation(test_dataset, test_dir, tmp_path) -> None:
+    """Tests polygon-weighted averages and their weight cache."""
+    import geopandas as gpd
+    import shapely
+    data_array = test_dataset['2m_temperature']
+    xy_dims = ('longitude', 'latitude')
+
+    # a cell and half of its east neighbor (equal areas) -> 2/3 and 1/3
+    x0, x1 = test_dataset.longitude.values[:2]
+    y0, y1 = test_dataset.latitude.values[:2]
+    dx, dy = abs(x1 - x0), abs(y1 - y0)
+    polygon = shapely.box(x0 - dx / 2, y0 - dy / 2, x0 + dx, y0 + dy / 2)
+    weights, points = areal_aggregation.get_areal_weights(
+        test_dataset,
+        gpd.GeoDataFrame(geometry=[polygon], crs=4326),
+    )
+    assert weights.nnz == 2
+    np.testing.assert_allclose(weights[0, [0, 1]].toarray(), [[2 / 3, 1 / 3]])
+    assert shapely.contains_xy(polygon, *points[0])
+
+    # a polygon covering the grid gives cos(latitude) weighted means
+    geo_df = gpd.GeoDataFrame(geometry=[shapely.box(-90, 30, -70, 50)], crs=4326)
+    weights, _ = areal_aggregation.get_areal_weights(test_dataset, geo_df)
+    np.testing.assert_allclose(
+        areal_aggregation.aggregate_to_polygons(data_array, weights, xy_dims)[:, 0],
+        data_array.weighted(np.cos(np.radians(data_array.latitude))).mean(
+            xy_dims,
+        ).values,
+        rtol=1e-6,
+    )
+
+    # weights are cached
+    shapefile = test_dir / 'LEEM_boundary.shp'
+    cache_dir = tmp_path / 'weights'
+    cache_dir.mkdir()
+    weights, _ = areal_aggregation.get_areal_weights(
+        test_dataset,
+        shapefile,
+        cache_dir=cache_dir,
+    )
+    assert len(list(cache_dir.glob('*.npz'))) == 1
+    cached, _ = areal_aggregation.get_areal_weights(
+        test_dataset,
+        shapefile,
+        cache_dir=cache_dir,
+    )
+    assert (weights != cached).nnz == 0
+    np.testing.assert_allclose(weights.sum(axis=1), 1)
+
+    # WES files and precipitation gages use the polygon averages
+    expected = areal_aggregation.aggregate_to_polygons(data_array, weights, xy_dims)
+    out_path = ConvertToGSSHA.make_gssha_hmet_wes(
+        test_dataset,
+        variable_to_hmet={'2m_temperature': 'Dry Bulb Temperature'},
+        file_dir=tmp_path,
+        shapefile=shapefile,
+        weights_cache_dir=cache_dir,
+    )
+    np.testing.assert_allclose(np.loadtxt(out_path)[:, 9], expected[:, 0])
+
+    out_path = ConvertToGSSHA.make_gssha_precipitation_input(
+        test_dataset,
+        precipitation_variable='2m_temperature',
+        precipitation_type='GAGE',
+        file_dir=tmp_path,
+        shapefile=shapefile,
+    )
+    lines = out_path.read_text().splitlines()
+    assert lines[2] == 'NRGAG 1'
+    rows = np.array([line.split()[6:] for line in lines[4:]], dtype=float)
+    np.testing.assert_allclose(rows, expected, atol=1e-6)
@@ -0,0 +1,182 @@
+"""Tests the on-disk caching used by the data accessors."""
+import os
+import xarray as xr
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+import scipy.sparse
+from xarray_data_accessor.caching import (
+    FileCache,
+    get_or_build_arrays,
+    get_or_build_sparse,
+)
+from xarray_data_accessor import DataAccessorFactory
+
+
+@pytest.fixture
+def test_dir() -> Path:
+    """Gets the test data directory."""
+    TEST_DIR = Path.cwd() / 'testing/test_data'
+    if not TEST_DIR.exists():
+        TEST_DIR = Path.cwd() / 'test_data'
+    return TEST_DIR
+
+
+@pytest.fixture
+def test_dataset(test_dir) -> xr.Dataset:
+    """Gets the test dataset."""
+    test_netcdf = test_dir / 'cds_era5_dataset.nc'
+    with xr.open_dataset(test_netcdf) as ds:
+        return ds[['2m_temperature']].load()
+
+
+def test_cache_keys() -> None:
+    """Tests that cache keys are canonical."""
+    key1 = FileCache.make_key({'variable': 'a', 'month': '01'})
+    key2 = FileCache.make_key({'month': '01', 'variable': 'a'})
+    key3 = FileCache.make_key({'month': '02', 'variable': 'a'})
+    assert key1 == key2
+    assert key1 != key3
+
+
+def test_dataset_cache(test_dataset, tmp_path) -> None:
+    """Tests writing and reading datasets from the cache."""
+    cache = FileCache(tmp_path / 'cache')
+    key = cache.make_key({'variable': '2m_temperature'})
+    assert cache.get(key) is None
+    assert cache.get_dataset(key) is None
+
+    path = cache.put_dataset(key, test_dataset)
+    assert path.exists()
+    assert cache.get(key) == path
+
+    cached_ds = cache.get_dataset(key)
+    np.testing.assert_array_equal(
+        cached_ds['2m_temperature'].values,
+        test_dataset['2m_temperature'].values,
+    )
+
+
+def test_lru_eviction(test_dataset, tmp_path) -> None:
+    """Tests that the least recently used entries are evicted first."""
+    cache = FileCache(tmp_path / 'cache')
+    keys = [cache.make_key({'index': i}) for i in range(3)]
+    for i, key in enumerate(keys):
+        path = cache.put_dataset(key, test_dataset)
+        os.utime(path, (i, i))
+
+    # touch the oldest entry so the second one is evicted instead
+    cache.get(keys[0])
+    entry_size_mb = cache.get_path(keys[0]).stat().st_size / 1e6
+    cache.size_limit_mb = entry_size_mb * 2.5
+    deleted = cache.evict()
+
+    assert deleted == [cache.get_path(keys[1])]
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+    cache.clear()
+    assert cache.size_mb == 0
+
+
+def test_aws_grid_window() -> None:
+    """Tests that the AWS cache key window matches the 0.25 degree grid."""
+    aws_accessor = DataAccessorFactory.data_accessor_objects()[
+        'AWSDataAccessor'
+    ]
+    window = aws_accessor._get_grid_window(
+        {'west': -83.1, 'south': 41.4, 'east': -79.0, 'north': 42.9},
+    )
+    assert window['x'] == [388, 404]
+    assert window['y'] == [188, 194]
+
+
+def test_cache_expiry(test_dataset, tmp_path) -> None:
+    """Tests that entries older than max_age are expired."""
+    cache = FileCache(tmp_path / 'cache')
+    key = cache.make_key({'variable': '2m_temperature'})
+    cache.put_dataset(key, test_dataset, metadata={'dataset_name': 'test'})
+    assert cache.get_metadata(key)['dataset_name'] == 'test'
+    assert cache.get(key, max_age=timedelta(days=1)) is not None
+    assert cache.get(key, max_age=timedelta(seconds=0)) is None
+    assert not cache.get_metadata_path(key).exists()
+
+
+def test_cds_request_cache(test_dataset, tmp_path) -> None:
+    """Tests that cached CDS requests are not queued again."""
+    cds_accessor = DataAccessorFactory.get_data_accessor('CDSDataAccessor')
+    cds_accessor.dataset_name = 'reanalysis-era5-single-levels'
+    cds_accessor._cache = FileCache(tmp_path / 'cache')
+
+    input_dicts = [
+        {
+            'year': ['2019'],
+            'month': ['01'],
+            'day': [str(d).zfill(2) for d in days],
+            'time': ['00:00', '01:00'],
+            'variable': '2m_temperature',
+            'area': [41.0, -84.0, 43.0, -79.0],
+            'index': i,
+        } for i, days in enumerate([range(1, 8), range(8, 15)])
+    ]
+
+    # cache keys do not depend on the request index or list ordering
+    shuffled_dict = dict(input_dicts[0], index=5, time=['01:00', '00:00'])
+    assert (
+        cds_accessor._get_cache_key(input_dicts[0]) ==
+        cds_accessor._get_cache_key(shuffled_dict)
+    )
+
+    # ...but the bounding box order does ([N, W, S, E])
+    flipped_dict = dict(input_dicts[0], area=[43.0, -84.0, 41.0, -79.0])
+    assert (
+        cds_accessor._get_cache_key(input_dicts[0]) !=
+        cds_accessor._get_cache_key(flipped_dict)
+    )
+
+    cds_accessor._cache.put_dataset(
+        cds_accessor._get_cache_key(input_dicts[0]),
+        test_dataset,
+    )
+    var_dict = {}
+    uncached_dicts = cds_accessor._read_cached_responses(
+        input_dicts,
+        var_dict,
+    )
+    assert list(var_dict.keys()) == [0]
+    assert uncached_dicts == [input_dicts[1]]
+
+    # recent months may still be revised by ERA5T
+    assert not cds_accessor._is_era5t_request(input_dicts[0])
+    now = datetime.now()
+    assert cds_accessor._is_era5t_request(
+        dict(input_dicts[0], year=[str(now.year)], month=[str(now.month)]),
+    )
+
+
+def test_get_or_build(tmp_path) -> None:
+    """Tests that weights/arrays are built once and then read from disk."""
+    builds = []
+
+    def build_sparse():
+        builds.append('sparse')
+        return scipy.sparse.coo_matrix(np.eye(3))
+
+    def build_arrays():
+        builds.append('arrays')
+        return {'x_idxs': np.arange(3), 'y_idxs': np.zeros(3, dtype=int)}
+
+    for _ in range(2):
+        weights = get_or_build_sparse(tmp_path, {'grid': 'a'}, build_sparse)
+        assert weights.format == 'csr'
+        np.testing.assert_array_equal(weights.toarray(), np.eye(3))
+        arrays = get_or_build_arrays(tmp_path, {'grid': 'b'}, build_arrays)
+        np.testing.assert_array_equal(arrays['x_idxs'], np.arange(3))
+    assert builds == ['sparse', 'arrays']
+    assert len(list(tmp_path.glob('*.npz'))) == 2
+
+    # without a cache directory, everything is built
+    get_or_build_sparse(None, {'grid': 'a'}, build_sparse)
+    assert builds[-1] == 'sparse'
@@ -0,0 +1,245 @@
+"""Tests CDS request handling without sending requests to the CDS API."""
+import xarray as xr
+import numpy as np
+import pytest
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+from xarray_data_accessor import DataAccessorFactory
+from xarray_data_accessor.data_accessors import era5_from_cds
+
+
+class FakeResult:
+    """Mimics a CDS API Remote that completes after a few polls."""
+
+    def __init__(
+        self,
+        n_polls: int,
+        state: str = 'completed',
+        on_done: Optional[Callable] = None,
+        source: Optional[Path] = None,
+    ) -> None:
+        self.reply = {'state': 'queued'}
+        self.n_polls = n_polls
+        self.final_state = state
+        self.on_done = on_done
+        self.source = source
+
+    def download(self, target: str) -> str:
+        shutil.copyfile(self.source, target)
+        return target
+
+    def update(self) -> None:
+        self.n_polls -= 1
+        if self.n_polls <= 0:
+            self.reply = {'state': self.final_state}
+            if self.on_done:
+                self.on_done()
+
+
+@pytest.fixture
+def cds_accessor():
+    """Gets a CDS data accessor (no CDS API client is created)."""
+    accessor = DataAccessorFactory.get_data_accessor('CDSDataAccessor')
+    accessor.dataset_name = 'reanalysis-era5-single-levels'
+    return accessor
+
+
+@pytest.fixture
+def input_dicts() -> List[Dict]:
+    return [
+        {'variable': '2m_temperature', 'index': i} for i in range(7)
+    ]
+
+
+def test_request_pipeline(cds_accessor, input_dicts, monkeypatch) -> None:
+    """Tests that requests are refilled as slots free up."""
+    monkeypatch.setattr(era5_from_cds, 'CDS_POLL_INTERVAL_RANGE', (0, 0))
+
+    submitted = []
+    max_in_flight = []
+    in_flight = set()
+
+    def submit_request(input_dict):
+        submitted.append(input_dict['index'])
+        in_flight.add(input_dict['index'])
+        max_in_flight.append(len(in_flight))
+        # one request fails, one is rejected (i.e., too large), and the
+        # others take a variable number of polls
+        def on_done():
+            in_flight.discard(input_dict['index'])
+        if input_dict['index'] == 3:
+            return FakeResult(1, state='failed', on_done=on_done)
+        if input_dict['index'] == 5:
+            return FakeResult(2, state='rejected', on_done=on_done)
+        return FakeResult(input_dict['index'] % 3 + 1, on_done=on_done)
+
+    def get_api_response(input_dict, result):
+        return (input_dict['index'], xr.Dataset({'a': ('time', np.ones(1))}))
+
+    monkeypatch.setattr(cds_accessor, '_submit_request', submit_request)
+    monkeypatch.setattr(cds_accessor, '_get_api_response', get_api_response)
+    cds_accessor.max_requests_in_flight = 3
+
+    responses = cds_accessor._run_request_pipeline(input_dicts)
+
+    assert sorted(submitted) == list(range(7))
+    assert max(max_in_flight) <= 3
+    assert sorted(responses.keys()) == [0, 1, 2, 4, 6]
+    assert len(in_flight) == 0
+
+
+def test_request_plan(cds_accessor) -> None:
+    """Tests that requests are packed under the field limit."""
+    variables = [
+        '2m_temperature',
+        '100m_u_component_of_wind',
+        'total_precipitation',
+        'snow_depth',
+    ]
+    start_dt = datetime(2019, 1, 30)
+    end_dt = datetime(2019, 6, 2)
+
+    # a large limit gives one request per variable group and partial month
+    cds_accessor.field_limit = 120000
+    plan = cds_accessor._get_request_plan(variables, start_dt, end_dt)
+    assert len(plan) == 6
+    assert plan[0]['day'] == ['30', '31']
+    assert plan[1]['month'] == ['02', '03', '04', '05']
+    assert plan[2]['day'] == ['01', '02']
+    assert len(plan[0]['variable']) == 3
+    assert plan[-1]['variable'] == ['snow_depth']
+
+    # a small limit splits variables and months into day chunks
+    cds_accessor.field_limit = 24 * 10
+    plan = cds_accessor._get_request_plan(variables, start_dt, end_dt)
+    for request_dict in plan:
+        n_fields = np.prod([len(request_dict[k]) for k in request_dict])
+        assert n_fields <= cds_accessor.field_limit
+        assert len(request_dict['variable']) == 1
+
+    # every requested day is covered exactly once for each variable
+    for variable in variables:
+        days = []
+        for request_dict in plan:
+            if variable in request_dict['variable']:
+                for month in request_dict['month']:
+                    days += [f'{month}-{d}' for d in request_dict['day']]
+        assert len(days) == len(set(days))
+        assert days[0] == '01-30'
+        assert days[-1] == '06-02'
+
+
+def test_split_response(cds_accessor) -> None:
+    """Tests that multi-variable responses are split by variable."""
+    ds = xr.Dataset(
+        {
+            't2m': ('time', np.ones(2)),
+            'tp': ('time', np.zeros(2)),
+        },
+    )
+    split_dict = cds_accessor._split_response(
+        ds,
+        ['2m_temperature', 'total_precipitation'],
+    )
+    assert list(split_dict['2m_temperature'].data_vars) == ['2m_temperature']
+    assert split_dict['total_precipitation']['total_precipitation'].sum() == 0
+
+    split_dict = cds_accessor._split_response(ds[['t2m']], ['snow_depth'])
+    assert list(split_dict['snow_depth'].data_vars) == ['snow_depth']
+
+
+def test_zipped_response(cds_accessor, tmp_path) -> None:
+    """Tests that zipped (one file per stepType) responses are merged."""
+    import zipfile
+    times = np.arange('2019-01-30', '2019-01-31', dtype='datetime64[h]')
+    coords = {'time': times, 'latitude': [42.0, 41.75]}
+    members = {
+        'data_stream-oper_stepType-instant.nc': 't2m',
+        'data_stream-oper_stepType-accum.nc': 'tp',
+    }
+    zip_path = tmp_path / 'response.nc'
+    with zipfile.ZipFile(zip_path, 'w') as zip_file:
+        for i, (name, short_name) in enumerate(members.items()):
+            xr.Dataset(
+                {short_name: (('time', 'latitude'), np.full((24, 2), i))},
+                coords=coords,
+            ).to_netcdf(tmp_path / name)
+            zip_file.write(tmp_path / name, name)
+
+    cds_accessor.scratch_dir = str(tmp_path / 'scratch')
+    ds = cds_accessor._open_response(zip_path)
+    split_dict = cds_accessor._split_response(
+        ds,
+        ['2m_temperature', 'total_precipitation'],
+    )
+    assert (split_dict['2m_temperature']['2m_temperature'] == 0).all()
+    assert (split_dict['total_precipitation']['total_precipitation'] == 1).all()
+    ds.close()
+    cds_accessor._cleanup_scratch_dir()
+    assert list((tmp_path / 'scratch').iterdir()) == []
+
+
+def test_streamed_response(cds_accessor, tmp_path) -> None:
+    """Tests that results are downloaded to a managed scratch dir."""
+    test_netcdf = Path(__file__).parent / 'test_data' / 'cds_era5_dataset.nc'
+    result = FakeResult(0, source=test_netcdf)
+    cds_accessor.scratch_dir = str(tmp_path / 'scratch')
+    cds_accessor.time_chunk_size = 24
+
+    index, ds = cds_accessor._get_api_response(
+        {'variable': ['2m_temperature'], 'index': 4},
+        result,
+    )
+    assert index == 4
+    scratch_files = list((tmp_path / 'scratch').glob('cds_scratch_*/temp_data*.nc'))
+    assert len(scratch_files) == 1
+    assert ds['2m_temperature'].chunks[0][0] == 24
+    with xr.open_dataset(test_netcdf) as test_ds:
+        np.testing.assert_array_equal(
+            ds['2m_temperature'].values,
+            test_ds['2m_temperature'].values,
+        )
+
+    # assembled responses are closed and their scratch files deleted
+    cds_accessor._release_response(ds)
+    assert not scratch_files[0].exists()
+    cds_accessor._cleanup_scratch_dir()
+    assert list((tmp_path / 'scratch').iterdir()) == []
+
+
+def test_scratch_cleanup(cds_accessor, tmp_path, monkeypatch) -> None:
+    """Tests that get_data() leaves no scratch files behind."""
+    monkeypatch.setattr(era5_from_cds, 'CDS_POLL_INTERVAL_RANGE', (0, 0))
+    monkeypatch.chdir(tmp_path)
+    test_netcdf = Path(__file__).parent / 'test_data' / 'cds_era5_dataset.nc'
+    with xr.open_dataset(test_netcdf) as test_ds:
+        response_ds = test_ds[['2m_temperature']].rename(
+            {'2m_temperature': 't2m'},
+        ).drop_vars('spatial_ref', errors='ignore').load()
+    response_netcdf = tmp_path / 'response.nc'
+    response_ds.to_netcdf(response_netcdf)
+    monkeypatch.setattr(
+        cds_accessor,
+        '_submit_request',
+        lambda input_dict: FakeResult(1, source=response_netcdf),
+    )
+
+    ds = cds_accessor.get_data(
+        'reanalysis-era5-single-levels',
+        ['2m_temperature'],
+        {'west': -83.5, 'south': 41.4, 'east': -79.0, 'north': 42.9},
+        datetime(2019, 1, 30, 12),
+        datetime(2019, 1, 31, 12),
+        use_dask=False,
+    )
+    assert ds.sizes['time'] == 25
+    assert not np.isnan(ds['2m_temperature'].values).any()
+    assert sorted(f.name for f in tmp_path.iterdir()) == ['response.nc']
+    assert cds_accessor._scratch_tempdir is None
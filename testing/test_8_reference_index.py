@@ -0,0 +1,232 @@
+"""Tests byte-range reference indexes against locally generated NetCDF files.
+
+NOTE: A local directory stands in for the era5-pds S3 bucket. Any fsspec
+    url (i.e., s3://) is read the same way.
+"""
+import json
+import asyncio
+import xarray as xr
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime
+from pathlib import Path
+from xarray_data_accessor import DataAccessorFactory
+from xarray_data_accessor.caching import FileCache
+from xarray_data_accessor.multi_threading import run_coroutine
+from xarray_data_accessor.reference_index import (
+    _get_dask_array,
+    build_reference_index,
+    get_reference_index,
+    open_async_filesystem,
+    open_reference_dataset,
+    read_window_async,
+)
+
+
+@pytest.fixture
+def era5_pds_file(tmp_path) -> Path:
+    """Writes a small NetCDF file mimicking the era5-pds layout."""
+    rng = np.random.default_rng(0)
+    ds = xr.Dataset(
+        {
+            'air_temperature_at_2_metres': (
+                ('time0', 'lat', 'lon'),
+                rng.random((48, 40, 60)).astype('float32'),
+            ),
+        },
+        coords={
+            'time0': pd.date_range('2019-01-01', periods=48, freq='h'),
+            'lat': 90 - np.arange(40) * 0.25,
+            'lon': np.arange(60) * 0.25,
+        },
+    )
+    file_path = tmp_path / 'bucket' / '2019' / '01' / 'data'
+    file_path.mkdir(parents=True)
+    file_path = file_path / 'air_temperature_at_2_metres.nc'
+    ds.to_netcdf(
+        file_path,
+        engine='h5netcdf',
+        encoding={
+            'air_temperature_at_2_metres': {
+                'zlib': True,
+                'shuffle': True,
+                'chunksizes': (24, 16, 16),
+            },
+        },
+    )
+    return file_path
+
+
+def test_reference_dataset(era5_pds_file) -> None:
+    """Tests that reference datasets match the file contents."""
+    reference_index = build_reference_index(str(era5_pds_file))
+    var_ref = reference_index['variables']['air_temperature_at_2_metres']
+    assert var_ref['dims'] == ['time0', 'lat', 'lon']
+    assert len(var_ref['chunk_refs']) == 2 * 3 * 4
+
+    ds = open_reference_dataset(reference_index)
+    with xr.open_dataset(era5_pds_file) as test_ds:
+        xr.testing.assert_equal(ds.compute(), test_ds.load())
+
+    # a small window only has one dask block (one ranged read)
+    subset = ds['air_temperature_at_2_metres'].isel(
+        time0=slice(0, 3),
+        lat=slice(2, 5),
+        lon=slice(20, 30),
+    )
+    assert subset.data.npartitions == 1
+
+
+def test_unallocated_chunks(tmp_path) -> None:
+    """Tests that missing chunks are filled to match the variable dtype."""
+    import h5py
+    file_path = tmp_path / 'codes.nc'
+    with h5py.File(file_path, 'w') as h5_file:
+        codes = h5_file.create_dataset('codes', (4, 4), dtype='int16', chunks=(2, 2))
+        codes.attrs['_FillValue'] = np.int16(-999)
+        codes[:2, :2] = 7
+        values = h5_file.create_dataset('values', (4, 4), dtype='float32', chunks=(2, 2))
+        values[:2, :2] = 1.5
+
+    reference_index = build_reference_index(str(file_path))
+    var_ref = reference_index['variables']['codes']
+    assert len(var_ref['chunk_refs']) == 1
+
+    codes = _get_dask_array(str(file_path), 'codes', var_ref)
+    assert codes.dtype == np.int16
+    expected = np.full((4, 4), -999, dtype='int16')
+    expected[:2, :2] = 7
+    np.testing.assert_array_equal(codes.compute(), expected)
+
+    # tasks only carry their own chunk reference (not the whole index)
+    for task in dict(codes.dask).values():
+        assert not any(isinstance(a, dict) and 'chunk_refs' in a for a in task)
+
+    values = _get_dask_array(
+        str(file_path),
+        'values',
+        reference_index['variables']['values'],
+    ).compute()
+    assert values[0, 0] == 1.5
+    # the HDF5 default fill value of floats is 0
+    assert values[3, 3] == 0
+
+
+def test_persisted_index(era5_pds_file, tmp_path) -> None:
+    """Tests that reference indexes are stored and reused."""
+    index_dir = tmp_path / 'references'
+    reference_index = get_reference_index(str(era5_pds_file), index_dir)
+    assert len(list(index_dir.glob('*.refs'))) == 1
+
+    # NaN attributes do not compare equal, so compare the serialized index
+    reloaded_index = get_reference_index(str(era5_pds_file), index_dir)
+    assert json.dumps(reloaded_index) == json.dumps(reference_index)
+
+
+def test_aws_reference_reads(era5_pds_file, tmp_path) -> None:
+    """Tests that the AWS accessor gives identical data with an index."""
+    aws_accessor = DataAccessorFactory.get_data_accessor('AWSDataAccessor')
+    request_dict = {
+        'variable': 'air_temperature_at_2_metres',
+        'aws_endpoint': str(era5_pds_file),
+        'index': 0,
+        'bbox': {
+            'west': -178.0,
+            'south': 83.0,
+            'east': -175.5,
+            'north': 85.0,
+        },
+    }
+    ds = aws_accessor._get_aws_data(dict(request_dict))['dataset']
+
+    aws_accessor.reference_index_dir = str(tmp_path / 'references')
+    ref_ds = aws_accessor._get_aws_data(dict(request_dict))['dataset']
+    assert ref_ds['air_temperature_at_2_metres'].chunks is not None
+    assert ref_ds.sizes == {'time': 48, 'latitude': 9, 'longitude': 11}
+    xr.testing.assert_equal(ref_ds.load(), ds.load())
+
+
+def test_async_window_reads(era5_pds_file) -> None:
+    """Tests that concurrent window reads match the lazy dataset."""
+    reference_index = build_reference_index(str(era5_pds_file))
+    window = {'time0': slice(20, 30), 'lat': slice(10, 35), 'lon': slice(5, 50)}
+
+    async def read_window() -> np.ndarray:
+        async with open_async_filesystem(str(era5_pds_file)) as fs:
+            return await read_window_async(
+                reference_index,
+                'air_temperature_at_2_metres',
+                window,
+                fs,
+                asyncio.Semaphore(4),
+            )
+
+    data = run_coroutine(read_window())
+    ds = open_reference_dataset(reference_index)
+    np.testing.assert_array_equal(
+        data,
+        ds['air_temperature_at_2_metres'].isel(window).values,
+    )
+
+
+def test_aws_async_reads(era5_pds_file) -> None:
+    """Tests that the asyncio fetch mode matches the worker fetch mode."""
+    aws_accessor = DataAccessorFactory.get_data_accessor('AWSDataAccessor')
+    aws_accessor.max_concurrent_requests = 2
+    bbox = {'west': -178.0, 'south': 83.0, 'east': -175.5, 'north': 85.0}
+    request_dicts = [
+        {
+            'variable': 'air_temperature_at_2_metres',
+            'aws_endpoint': str(era5_pds_file),
+            'index': i,
+            'bbox': bbox,
+        } for i in range(2)
+    ]
+    responses = run_coroutine(
+        aws_accessor._get_aws_data_async(request_dicts),
+    )
+    assert sorted(r['index'] for r in responses) == [0, 1]
+
+    ds = aws_accessor._get_aws_data(dict(request_dicts[0]))['dataset']
+    xr.testing.assert_equal(responses[0]['dataset'], ds.load())
+
+    # no requests (i.e., everything was cached) gives no responses
+    assert run_coroutine(aws_accessor._get_aws_data_async([])) == []
+
+
+def test_aws_time_window(era5_pds_file, tmp_path) -> None:
+    """Tests that months are sliced to the time window inside the worker."""
+    aws_accessor = DataAccessorFactory.get_data_accessor('AWSDataAccessor')
+    aws_accessor._parse_kwargs({'specific_hours': [0, 6, 12, 18]})
+    assert aws_accessor.specific_hours == [0, 6, 12, 18]
+
+    request_dict = {
+        'variable': 'air_temperature_at_2_metres',
+        'aws_endpoint': str(era5_pds_file),
+        'index': 0,
+        'bbox': {'west': -178.0, 'south': 83.0, 'east': -175.5, 'north': 85.0},
+        'start_dt': datetime(2019, 1, 1, 5),
+        'end_dt': datetime(2019, 1, 2, 6),
+        'specific_hours': aws_accessor.specific_hours,
+    }
+    expected_times = pd.DatetimeIndex(
+        ['2019-01-01 06:00', '2019-01-01 12:00', '2019-01-01 18:00',
+         '2019-01-02 00:00', '2019-01-02 06:00'],
+    )
+
+    ds = aws_accessor._get_aws_data(dict(request_dict))['dataset']
+    assert (pd.DatetimeIndex(ds.time.values) == expected_times).all()
+
+    async_ds = run_coroutine(
+        aws_accessor._get_aws_data_async([dict(request_dict)]),
+    )[0]['dataset']
+    xr.testing.assert_equal(async_ds, ds.load())
+
+    # cached month tiles store the whole month, but only return the window
+    aws_accessor._cache = FileCache(tmp_path / 'cache')
+    for _ in range(2):
+        cached_ds = aws_accessor._get_aws_data(dict(request_dict))['dataset']
+        xr.testing.assert_equal(cached_ds, ds)
+    cache_key = aws_accessor._get_cache_key(request_dict)
+    assert aws_accessor._cache.get_dataset(cache_key).sizes['time'] == 48
@@ -0,0 +1,108 @@
+"""Tests assembling responses into preallocated outputs."""
+import xarray as xr
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime
+from pathlib import Path
+from xarray_data_accessor import DataAccessorFactory
+from xarray_data_accessor.info.era5 import CDS_SHORT_NAMES
+from xarray_data_accessor.data_accessors.assembly import (
+    DatasetAssembler,
+    get_hourly_time_index,
+)
+
+
+@pytest.fixture
+def test_dataset() -> xr.Dataset:
+    """Gets the test dataset."""
+    test_netcdf = Path(__file__).parent / 'test_data' / 'cds_era5_dataset.nc'
+    with xr.open_dataset(test_netcdf) as ds:
+        return ds.drop_vars('spatial_ref').load()
+
+
+def test_time_index() -> None:
+    """Tests the output time index of a request plan."""
+    times = get_hourly_time_index(
+        datetime(2019, 1, 30, 5, 30),
+        datetime(2019, 2, 1, 6),
+        specific_hours=[0, 6],
+    )
+    assert list(times.strftime('%d %H')) == [
+        '30 06', '31 00', '31 06', '01 00', '01 06',
+    ]
+
+
+@pytest.mark.parametrize('use_zarr', [False, True])
+@pytest.mark.parametrize('use_dask', [False, True])
+def test_assembler(test_dataset, tmp_path, use_zarr, use_dask) -> None:
+    """Tests that out of order responses are written into place."""
+    variable = '2m_temperature'
+    if use_dask:
+        # lazy responses are written one time chunk at a time
+        test_dataset = test_dataset.chunk({'time': 5})
+    times = pd.DatetimeIndex(test_dataset.time.values[:-1])
+    assembler = DatasetAssembler(
+        times,
+        zarr_store=str(tmp_path / 'out.zarr') if use_zarr else None,
+    )
+
+    # responses arrive out of order, one is missing, and one is reversed
+    days = test_dataset.time.dt.day.values
+    assembler.add(variable, test_dataset.isel(time=np.flatnonzero(days == 1)))
+    assembler.add(variable, test_dataset.isel(time=np.flatnonzero(days == 30)))
+    assembler.add(
+        variable,
+        test_dataset.isel(
+            time=np.flatnonzero(days == 2)[::-1],
+            latitude=slice(None, None, -1),
+        ),
+    )
+    assert assembler.variables == [variable]
+    assert assembler.get_dataset('100m_u_component_of_wind') is None
+
+    ds = assembler.get_dataset(variable)
+    assert ds.sizes['time'] == len(times)
+    expected = test_dataset[variable].sel(time=times)
+    expected = expected.where(expected.time.dt.day != 31)
+    np.testing.assert_array_equal(ds[variable].values, expected.values)
+
+
+def test_cds_assembly(test_dataset, monkeypatch) -> None:
+    """Tests that CDS responses are cropped and assembled per variable."""
+    cds_accessor = DataAccessorFactory.get_data_accessor('CDSDataAccessor')
+    variables = list(test_dataset.data_vars)
+
+    def run_request_pipeline(input_dicts):
+        responses = {}
+        for input_dict in input_dicts:
+            time = test_dataset.time
+            mask = time.dt.month.isin([int(m) for m in input_dict['month']])
+            mask &= time.dt.day.isin([int(d) for d in input_dict['day']])
+            responses[input_dict['index']] = test_dataset.isel(
+                time=np.flatnonzero(mask.values),
+            ).rename({v: CDS_SHORT_NAMES[v] for v in variables})
+        return responses
+
+    monkeypatch.setattr(
+        cds_accessor,
+        '_run_request_pipeline',
+        run_request_pipeline,
+    )
+    start_dt = datetime(2019, 1, 30, 12)
+    end_dt = datetime(2019, 2, 1, 12)
+    ds = cds_accessor.get_data(
+        'reanalysis-era5-single-levels',
+        variables,
+        {'west': -83.5, 'south': 41.4, 'east': -79.0, 'north': 42.9},
+        start_dt,
+        end_dt,
+        use_dask=False,
+    )
+    expected = test_dataset.sel(time=slice(start_dt, end_dt))
+    assert ds.sizes['time'] == 49
+    for variable in variables:
+        np.testing.assert_array_equal(
+            ds[variable].values,
+            expected[variable].values,
+        )